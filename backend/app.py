@@ -1,23 +1,75 @@
 import os
-import torch
+import numpy as np
 import io
+import time
+import asyncio
+import functools
+import secrets
+import zipfile
+from typing import List, Optional
 from prometheus_fastapi_instrumentator import Instrumentator
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
-from fastapi import FastAPI, File, UploadFile
+from fastapi import (
+    FastAPI,
+    File,
+    Header,
+    HTTPException,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from PIL import Image
-from transformers import (
-    AutoImageProcessor,
-    AutoModelForImageClassification,
-)
-from optimum.onnxruntime import ORTModelForImageClassification
 from llama_cpp import Llama
 
 
 from dotenv import load_dotenv
 
+from backend.batching import MicroBatcher
+from backend import metrics
+from backend.cache import (
+    ExplanationCache,
+    PredictionCache,
+    SemanticAnswerCache,
+    dhash,
+)
+from backend.classifier import OnnxClassifier, TorchClassifier, softmax_top1
+from backend.context_packing import ContextPacker, approx_tokens
+from backend.engine import GenerationEngine, LlamaBatchBackend
+from backend.jobs import JobStore
+from backend.live import LatestFrame, StabilityTracker
+from backend.prefix_cache import PrefixCache, common_prefix_len, prompt_tokens
+from backend.preprocessing import ImagePreprocessor
+from backend import profiling
+from backend.prompts import PROMPTS
+from backend.quantization import (
+    QUANTIZED_FILE,
+    quantized_model_ok,
+    session_options,
+)
+from backend.readiness import Readiness
+from backend.remote_llm import LLMClient, sweep_segments
+from backend.retrieval import RetrievalTable, search_chunks
+from backend.scheduler import InferenceScheduler, Lane, Overloaded, Priority
+from backend.sessions import SessionStore
+from backend.streaming import (
+    TokenStream,
+    sse_event,
+    sse_follow,
+    sse_stream,
+    sse_text,
+)
+from backend.telemetry import (
+    expose_memory,
+    read_llm_perf,
+    record_generation,
+    reset_llm_perf,
+    stage,
+    timed,
+    track_memory,
+)
+
 load_dotenv()
 
 try:
@@ -35,7 +87,7 @@ instrumentator = Instrumentator(
     should_group_status_codes=False,
     should_ignore_untemplated=True,
     should_instrument_requests_inprogress=True,
-    excluded_handlers=[".*admin.*", "/metrics"],
+    excluded_handlers=[".*admin.*", "/metrics", "/health.*"],
     inprogress_name="inprogress",
     inprogress_labels=True,
 )
@@ -52,34 +104,517 @@ app.add_middleware(
 MODEL_DIR = os.getenv("MODEL_DIR", "models")
 CV_DIR = os.path.join(MODEL_DIR, "flora_cv_model")
 ONNX_DIR = os.path.join(MODEL_DIR, "flora_cv_onnx")
+INT8_DIR = os.path.join(MODEL_DIR, "flora_cv_onnx_int8")
 RAG_DIR = os.path.join(MODEL_DIR, "flora_rag_db")
 GGUF_FILE = "tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf"
 GGUF_PATH = os.path.join(MODEL_DIR, GGUF_FILE)
 
+# The INT8 model (export_onnx.py --quantize) is served only if its report
+# shows at most this top-1 drop vs FP32. CV_QUANTIZED=off forces FP32.
+CV_QUANTIZED = os.getenv("CV_QUANTIZED", "auto")
+CV_INT8_MAX_ACCURACY_DROP = float(os.getenv("CV_INT8_MAX_ACCURACY_DROP", "0.01"))
+# ORT intra-op threads for the CV model (0 = one per core). backend/serve.py
+# sets 1 so no thread pool exists when it forks workers.
+CV_INTRA_OP_THREADS = int(os.getenv("CV_INTRA_OP_THREADS", "0"))
+
+# Micro-batching window for the CV model
+CV_MAX_BATCH_SIZE = int(os.getenv("CV_MAX_BATCH_SIZE", "8"))
+CV_MAX_WAIT_MS = float(os.getenv("CV_MAX_WAIT_MS", "10"))
+
+# Executor sizes and load-shedding thresholds for the inference scheduler.
+# The LLM lane stays at one worker: a single Llama instance is not thread-safe.
+CV_WORKERS = int(os.getenv("CV_WORKERS", "2"))
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "2"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "16"))
+LLM_MAX_WAIT_S = float(os.getenv("LLM_MAX_WAIT_S", "60"))
+
+# Few-Shot Prompting Strategy (Winner of M2_D1 Experiments).
+# Its version is part of the explanation cache key, so bump it in
+# backend/prompts.py whenever the wording changes.
+SERVING_PROMPT = PROMPTS["flora_few_shot"]
+PROMPT_VERSION = SERVING_PROMPT.version
+STOP_SEQUENCES = SERVING_PROMPT.stop
+# llama.cpp context window, and the most tokens one answer may take of it
+LLM_N_CTX = 2048
+MAX_NEW_TOKENS = 512
+
+# Prompt-lookup speculative decoding: draft tokens are copied from n-grams
+# already in the prompt (answers quote the retrieved context) and TinyLlama
+# verifies them in one batch. LLM_SPECULATIVE lists the endpoints using it
+# (e.g. "predict,chat"); empty disables it.
+LLM_SPECULATIVE = {
+    e.strip() for e in os.getenv("LLM_SPECULATIVE", "").split(",") if e.strip()
+}
+LLM_DRAFT_TOKENS = int(os.getenv("LLM_DRAFT_TOKENS", "10"))
+LLM_DRAFT_NGRAM = int(os.getenv("LLM_DRAFT_NGRAM", "2"))
+
+# Continuous batching: LLM_ENGINE=batched interleaves up to LLM_BATCH_SLOTS
+# generations in one llama.cpp context (backend/engine.py) instead of running
+# them one at a time on the LLM lane. Chat turns then re-prefill from the
+# transcript, and speculative decoding does not apply.
+LLM_ENGINE = os.getenv("LLM_ENGINE", "serial")
+LLM_BATCH_SLOTS = int(os.getenv("LLM_BATCH_SLOTS", "4"))
+
+# Split deployment: LLM_WORKERS sends generations to separate worker
+# processes (python -m backend.llm_worker) instead of loading the GGUF here.
+# A directory is scanned for *.sock on every request, so workers can be added
+# or removed while the API runs; a comma-separated list names sockets.
+LLM_WORKERS = os.getenv("LLM_WORKERS", "")
+LLM_WORKER_WAIT_S = float(os.getenv("LLM_WORKER_WAIT_S", "600"))
+# Buffers of at least IPC_SHM_MIN_KB (session KV state) are handed over
+# through a file in IPC_SHM_DIR, a tmpfs both sides mount, not the socket
+IPC_SHM_DIR = os.getenv("IPC_SHM_DIR", "/dev/shm")
+IPC_SHM_MIN_KB = int(os.getenv("IPC_SHM_MIN_KB", "64"))
+
+# Explanation cache. An empty path keeps it in memory only.
+EXPLANATION_CACHE_SIZE = int(os.getenv("EXPLANATION_CACHE_SIZE", "256"))
+EXPLANATION_CACHE_TTL_S = float(os.getenv("EXPLANATION_CACHE_TTL_S", "86400"))
+EXPLANATION_CACHE_PATH = os.getenv("EXPLANATION_CACHE_PATH", "")
+
+# /predict/batch limits: images per request (after unzipping) and total
+# uncompressed bytes accepted from zip archives
+MAX_BATCH_IMAGES = int(os.getenv("MAX_BATCH_IMAGES", "64"))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(256 * 1024 * 1024)))
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+# Prompt tokens the retrieved (or client-supplied /chat) context may use.
+# Sentences most similar to the question are kept, the rest dropped.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "256"))
+
+# Background explanation jobs (/predict?mode=async). Finished jobs are kept
+# for JOB_TTL_S; JOB_WORKERS jobs feed the LLM lane at a time.
+JOB_STORE_SIZE = int(os.getenv("JOB_STORE_SIZE", "1024"))
+JOB_TTL_S = float(os.getenv("JOB_TTL_S", "3600"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Chat sessions opened by /predict. Their saved llama.cpp states are dropped
+# least recently used first beyond SESSION_MEMORY_MB; idle sessions expire
+# after SESSION_TTL_S.
+SESSION_MEMORY_MB = float(os.getenv("SESSION_MEMORY_MB", "256"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "4096"))
+SESSION_TTL_S = float(os.getenv("SESSION_TTL_S", "3600"))
+
+# Upload cache. Set PREDICTION_CACHE_PHASH_DISTANCE (e.g. 6) to also match
+# re-encoded or resized copies of a photo by perceptual hash.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "1024"))
+PREDICTION_CACHE_PHASH_DISTANCE = os.getenv("PREDICTION_CACHE_PHASH_DISTANCE", "")
+
+# First /chat follow-ups of /predict sessions with the same diagnosis and
+# context reuse a cached answer when their MiniLM embedding is at least
+# SEMANTIC_CACHE_THRESHOLD cosine-similar. An empty threshold turns it off.
+SEMANTIC_CACHE_THRESHOLD = os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2048"))
+SEMANTIC_CACHE_TTL_S = float(os.getenv("SEMANTIC_CACHE_TTL_S", "86400"))
+
+# /ws/stream: a camera diagnosis is reported (and explained) once the last
+# STREAM_STABLE_FRAMES classified frames agree on it, each with at least
+# STREAM_MIN_CONFIDENCE
+STREAM_STABLE_FRAMES = int(os.getenv("STREAM_STABLE_FRAMES", "3"))
+STREAM_MIN_CONFIDENCE = float(os.getenv("STREAM_MIN_CONFIDENCE", "0.6"))
+
+# Bearer token for /admin/* endpoints; they are disabled while it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = 60.0
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 
 sys_comps = {}
 
 
-@app.on_event("startup")
-async def startup_event():
-    print("⚙️ Initializing Free Tier Mode (CPU)...")
+def classify_images(images):
+    """
+    Run one batch of decoded images through the CV model.
+    Returns a (diagnosis, confidence) pair per image, in input order.
+    """
+    with stage("preprocess"):
+        pixel_values = sys_comps["preprocessor"].batch(images)
+    with stage("cv_forward"):
+        logits = sys_comps["cv_model"](pixel_values)
+    pred_idx, conf = softmax_top1(logits)
+
+    id2label = sys_comps["cv_model"].config.id2label
+    return [(id2label[i], c) for i, c in zip(pred_idx.tolist(), conf.tolist())]
+
+
+@timed("decode")
+def decode_image(data):
+    # JPEG draft decode + resize to the model input size, on the cv lane
+    return sys_comps["preprocessor"].load(data)
+
+
+def expand_upload(
+    filename, data, max_images=MAX_BATCH_IMAGES, max_bytes=MAX_BATCH_BYTES
+):
+    """
+    One upload as a list of (filename, bytes) images: zip archives are
+    unpacked, anything else is passed through as a single image. Archives
+    with more than ``max_images`` images, or more than ``max_bytes`` once
+    extracted, are rejected before any is read.
+    """
+    if not zipfile.is_zipfile(io.BytesIO(data)):
+        return [(filename, data)]
+
+    images = []
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        members = [
+            info
+            for info in archive.infolist()
+            if not info.is_dir()
+            and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+            and not os.path.basename(info.filename).startswith(".")
+            and not info.filename.startswith("__MACOSX/")
+        ]
+        if len(members) > max_images:
+            raise HTTPException(
+                413, f"At most {max_images} more images fit in this batch request."
+            )
+        if sum(info.file_size for info in members) > max_bytes:
+            raise HTTPException(413, "Zip archive is too large once extracted.")
+        for info in members:
+            images.append((info.filename, archive.read(info)))
+    return images
+
+
+def image_fingerprint(data):
+    # Draft mode lets the JPEG decoder skip straight to a tiny thumbnail
+    img = Image.open(io.BytesIO(data))
+    img.draft("L", (64, 64))
+    return dhash(img)
+
+
+@timed("retrieval")
+def retrieve_context(diagnosis):
+    # Precomputed per-class chunks; live Chroma search only on a miss
+    table = sys_comps.get("retrieval_table")
+    chunks = table.get(diagnosis) if table is not None else None
+    if chunks is None:
+        chunks = search_chunks(sys_comps["rag"], diagnosis)
+        if table is not None and table.fingerprint is None:
+            table.refresh(sys_comps["rag"])  # the RAG index changed on disk
+    # Keep the sentences most relevant to the /predict question, within budget
+    return context_packer.pack(chunks, explain_question(diagnosis))
+
+
+def explain_question(diagnosis):
+    return f"Explain {diagnosis} and how to treat it."
+
+
+def count_tokens(text):
+    llm = sys_comps.get("llm")
+    if llm is None:
+        return approx_tokens(text)
+    return len(llm.tokenize(text.encode("utf-8"), add_bos=False))
+
+
+def embed_texts(texts):
+    embed_fn = sys_comps.get("embed_fn")
+    return None if embed_fn is None else embed_fn.embed_documents(texts)
+
+
+context_packer = ContextPacker(embed_texts, count_tokens, budget=CONTEXT_TOKEN_BUDGET)
+
+
+def build_prompt(context, question):
+    return SERVING_PROMPT.render(context=context, question=question)
+
+
+def select_decoding(endpoint):
+    """Attach the prompt-lookup draft model for endpoints configured to use it."""
+    draft_model = sys_comps.get("draft_model")
+    if draft_model is not None:
+        use = endpoint in LLM_SPECULATIVE
+        sys_comps["llm"].draft_model = draft_model if use else None
+
+
+def restore_prefix(prompt, endpoint):
+    """
+    Runs on the LLM lane right before generation: load the KV snapshot of the
+    static prompt prefix so only the context and question are prefilled, and
+    zero llama.cpp's perf counters so they cover this generation only.
+    """
+    select_decoding(endpoint)
+    reset_llm_perf(sys_comps["llm"])
+    prefix_cache = sys_comps.get("prefix_cache")
+    if prefix_cache is None:
+        return
+    saved = prefix_cache.restore(SERVING_PROMPT, prompt)
+    metrics.PREFILL_TOKENS_SAVED.labels(endpoint).observe(saved)
+
+
+def restore_session(session, prompt):
+    """
+    restore_prefix for a chat turn: continue from the state the session's
+    previous turn left, so only the new question is prefilled.
+    """
+    state = session.state
+    if state is None:
+        metrics.SESSION_TURNS.labels("prefilled").inc()
+        restore_prefix(prompt, "chat")
+        return
+    select_decoding("chat")
+    reset_llm_perf(sys_comps["llm"])
+    llm = sys_comps["llm"]
+    llm.load_state(state)
+    metrics.SESSION_TURNS.labels("continued").inc()
+    # llama.cpp only keeps the saved tokens the new prompt starts with, which
+    # is fewer than n_tokens once packing or truncation rewrote the transcript
+    saved = common_prefix_len(state.input_ids, prompt_tokens(llm, prompt))
+    metrics.PREFILL_TOKENS_SAVED.labels("chat").observe(saved)
+
+
+def generate(prompt, endpoint="predict", session=None):
+    if session is None:
+        restore_prefix(prompt, endpoint)
+    else:
+        restore_session(session, prompt)
+    start = time.perf_counter()
+    output = sys_comps["llm"](
+        prompt, max_tokens=MAX_NEW_TOKENS, stop=STOP_SEQUENCES, echo=False
+    )
+    record_generation(
+        endpoint,
+        read_llm_perf(sys_comps["llm"]),
+        output.get("usage"),
+        time.perf_counter() - start,
+    )
+    if session is not None:
+        sessions.save_state(session, sys_comps["llm"].save_state())
+    return output["choices"][0]["text"].strip()
 
-    # 1. Load Computer Vision Model (Prefer ONNX)
-    if os.path.exists(ONNX_DIR):
+
+def finish_stream(endpoint, session=None):
+    """Runs on the LLM lane once a streamed generation stops."""
+    record_generation(endpoint, read_llm_perf(sys_comps["llm"]))
+    if session is not None:
+        sessions.save_state(session, sys_comps["llm"].save_state())
+
+
+def engine_generation(prompt, endpoint, priority):
+    engine = sys_comps["engine"]
+    return engine.submit(
+        engine.backend.tokenize(prompt),
+        endpoint=endpoint,
+        priority=priority,
+        max_tokens=MAX_NEW_TOKENS,
+        stop=STOP_SEQUENCES,
+    )
+
+
+def remote_generation(prompt, endpoint, session, priority):
+    """A generation on an LLM worker process; session state travels with it."""
+    return sys_comps["llm_client"].generate(
+        prompt,
+        endpoint=endpoint,
+        priority=priority,
+        state=None if session is None else session.state,
+        on_state=(
+            None if session is None else functools.partial(sessions.save_state, session)
+        ),
+    )
+
+
+async def complete(prompt, endpoint="predict", session=None, priority=Priority.PREDICT):
+    """
+    A whole completion, from an LLM worker, the batching engine or the serial
+    LLM lane.
+    """
+    if "llm_client" in sys_comps:
+        return await remote_generation(prompt, endpoint, session, priority).text()
+    if "engine" in sys_comps:
+        return await engine_generation(prompt, endpoint, priority).text()
+    return await scheduler.run(
+        "llm", generate, prompt, endpoint, session, priority=priority
+    )
+
+
+def stream_completion(prompt, endpoint, session=None, priority=Priority.PREDICT):
+    """A started token stream (see sse_stream) for ``prompt``."""
+    if "llm_client" in sys_comps:
+        return remote_generation(prompt, endpoint, session, priority)
+    if "engine" in sys_comps:
+        return engine_generation(prompt, endpoint, priority)
+    return TokenStream(
+        sys_comps["llm"],
+        prompt,
+        prepare=(
+            (lambda: restore_prefix(prompt, endpoint))
+            if session is None
+            else (lambda: restore_session(session, prompt))
+        ),
+        finish=lambda: finish_stream(endpoint, session),
+        max_tokens=MAX_NEW_TOKENS,
+        stop=STOP_SEQUENCES,
+    ).start(lambda fn: scheduler.submit("llm", fn, priority=priority))
+
+
+def add_explanation_turn(session):
+    """Make the /predict explanation the session's first turn once it exists."""
+    if not session.turns and session.explanation_key is not None:
+        explanation = explanation_cache.get(session.explanation_key)
+        if explanation is not None:
+            session.turns.append((explain_question(session.diagnosis), explanation))
+
+
+def session_prompt(session, question):
+    """
+    Prompt for the next turn of ``session``: the previous turn's prompt and
+    answer plus the new question. The first turn is the /predict explanation
+    once it exists. The oldest turns are dropped when the answer would no
+    longer fit in the context window.
+    """
+    add_explanation_turn(session)
+    while True:
+        prompt = SERVING_PROMPT.render_conversation(
+            session.context, session.turns, question
+        )
+        if not session.turns or count_tokens(prompt) + MAX_NEW_TOKENS <= LLM_N_CTX:
+            return prompt
+        session.turns.pop(0)
+
+
+scheduler = InferenceScheduler(
+    Lane("cv", workers=CV_WORKERS, max_queue=4 * MAX_BATCH_IMAGES, max_wait_s=10),
+    Lane("retrieval", workers=RETRIEVAL_WORKERS, max_queue=64, max_wait_s=10),
+    Lane(
+        "llm",
+        workers=1,
+        max_queue=LLM_MAX_QUEUE,
+        max_wait_s=LLM_MAX_WAIT_S,
+        initial_service_s=5.0,
+    ),
+)
+
+explanation_cache = ExplanationCache(
+    maxsize=EXPLANATION_CACHE_SIZE,
+    ttl=EXPLANATION_CACHE_TTL_S,
+    path=EXPLANATION_CACHE_PATH or None,
+)
+
+prediction_cache = PredictionCache(
+    maxsize=PREDICTION_CACHE_SIZE,
+    phash_distance=(
+        int(PREDICTION_CACHE_PHASH_DISTANCE)
+        if PREDICTION_CACHE_PHASH_DISTANCE
+        else None
+    ),
+)
+
+answer_cache = (
+    SemanticAnswerCache(
+        threshold=float(SEMANTIC_CACHE_THRESHOLD),
+        maxsize=SEMANTIC_CACHE_SIZE,
+        ttl=SEMANTIC_CACHE_TTL_S,
+    )
+    if SEMANTIC_CACHE_THRESHOLD
+    else None
+)
+
+jobs = JobStore(maxsize=JOB_STORE_SIZE, ttl=JOB_TTL_S, workers=JOB_WORKERS)
+
+sessions = SessionStore(
+    max_state_bytes=int(SESSION_MEMORY_MB * 1024 * 1024),
+    max_sessions=SESSION_MAX,
+    ttl=SESSION_TTL_S,
+)
+
+cv_batcher = MicroBatcher(
+    classify_images,
+    max_batch_size=CV_MAX_BATCH_SIZE,
+    max_wait_ms=CV_MAX_WAIT_MS,
+    run=lambda fn, items: scheduler.run("cv", fn, items),
+)
+
+
+def load_cv():
+    # Prefer INT8 ONNX, then ONNX, then PyTorch. The ONNX models run on
+    # onnxruntime + NumPy only; torch is imported for the last fallback alone.
+    if CV_QUANTIZED != "off" and quantized_model_ok(
+        INT8_DIR, CV_INT8_MAX_ACCURACY_DROP
+    ):
+        print("🚀 Loading INT8 Quantized ONNX CV Model...")
+        model_dir = INT8_DIR
+        cv_model = OnnxClassifier(
+            INT8_DIR,
+            file_name=QUANTIZED_FILE,
+            session_options=session_options(True, CV_INTRA_OP_THREADS),
+        )
+    elif os.path.exists(ONNX_DIR):
         print("🚀 Loading ONNX Optimized CV Model...")
-        sys_comps["cv_model"] = ORTModelForImageClassification.from_pretrained(ONNX_DIR)
-        sys_comps["cv_proc"] = AutoImageProcessor.from_pretrained(ONNX_DIR)
+        model_dir = ONNX_DIR
+        cv_model = OnnxClassifier(
+            ONNX_DIR, session_options=session_options(False, CV_INTRA_OP_THREADS)
+        )
     elif os.path.exists(CV_DIR):
         print("⚠️ ONNX model not found. Loading standard PyTorch model...")
-        sys_comps["cv_model"] = AutoModelForImageClassification.from_pretrained(CV_DIR)
-        sys_comps["cv_proc"] = AutoImageProcessor.from_pretrained(CV_DIR)
+        model_dir = CV_DIR
+        cv_model = TorchClassifier(CV_DIR)
     else:
         raise RuntimeError("❌ CV Models missing! Run download_models.py")
+    sys_comps["preprocessor"] = ImagePreprocessor.from_pretrained(model_dir)
+    sys_comps["cv_model"] = cv_model
+
 
-    embed_fn = HuggingFaceEmbeddings(
+def warm_cv():
+    # First runs pay for kernel selection and allocator growth; do both the
+    # single-image and the full micro-batch shape before taking traffic
+    height, width = sys_comps["preprocessor"].size
+    blank = np.zeros((height, width, 3), dtype=np.uint8)
+    # Calls the model directly so these passes stay out of the stage histograms
+    for n in sorted({1, CV_MAX_BATCH_SIZE}):
+        sys_comps["cv_model"](sys_comps["preprocessor"].batch([blank] * n))
+
+
+def load_embeddings():
+    # langchain (and sentence-transformers' torch) load with the RAG
+    # component, not when the app module is imported
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    sys_comps["embed_fn"] = HuggingFaceEmbeddings(
         model_name="sentence-transformers/all-MiniLM-L6-v2"
     )
-    sys_comps["rag"] = Chroma(persist_directory=RAG_DIR, embedding_function=embed_fn)
+
+
+def load_rag():
+    from langchain_community.vectorstores import Chroma
+
+    if "embed_fn" not in sys_comps:
+        load_embeddings()
+    sys_comps["rag"] = Chroma(
+        persist_directory=RAG_DIR, embedding_function=sys_comps["embed_fn"]
+    )
+
+
+def warm_rag():
+    # Embeds one query and pages in the index
+    sys_comps["rag"].similarity_search("leaf disease treatment", k=1)
+
+
+def load_retrieval_table():
+    # The /predict query only depends on the class: answer all of them up front
+    labels = list(sys_comps["cv_model"].config.id2label.values())
+    table = RetrievalTable(RAG_DIR)
+    if not table.load() or not set(labels) <= set(table.labels):
+        print(f"📚 Building retrieval table for {len(labels)} classes...")
+        table.build(sys_comps["rag"], labels)
+        try:
+            table.save()
+        except OSError as e:
+            print(f"⚠️ Warning: Could not save retrieval table: {e}")
+    sys_comps["retrieval_table"] = table
+
+
+def load_llm():
+    if LLM_WORKERS:
+        if os.path.isdir(IPC_SHM_DIR):
+            sweep_segments(IPC_SHM_DIR)  # left by crashed processes
+        client = LLMClient(
+            LLM_WORKERS, shm_dir=IPC_SHM_DIR, min_bytes=IPC_SHM_MIN_KB * 1024
+        )
+        print(f"🔌 Waiting for LLM workers at {LLM_WORKERS}...")
+        print(f"   {client.wait_ready(LLM_WORKER_WAIT_S)} LLM worker(s) ready.")
+        sys_comps["llm_client"] = client
+        return
 
     print(f"🚀 Loading GGUF Optimized LLM: {GGUF_FILE}...")
     if not os.path.exists(GGUF_PATH):
@@ -87,89 +622,691 @@ async def startup_event():
             f"❌ GGUF Model missing at {GGUF_PATH}! Run download_models.py"
         )
 
+    draft_model = None
+    if LLM_SPECULATIVE:
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+
+        draft_model = LlamaPromptLookupDecoding(
+            max_ngram_size=LLM_DRAFT_NGRAM, num_pred_tokens=LLM_DRAFT_TOKENS
+        )
+        print(f"   Prompt-lookup decoding for: {', '.join(sorted(LLM_SPECULATIVE))}")
+
     sys_comps["llm"] = Llama(
         model_path=GGUF_PATH,
-        n_ctx=2048,  # Context window
+        n_ctx=LLM_N_CTX,  # Context window
         n_threads=4,  # Number of CPU threads to use
+        use_mmap=True,  # Weights stay in the page cache, shared across workers
+        # Passing a draft model makes llama-cpp-python turn on logits_all (logits
+        # for every position, needed to verify drafts). That is a property of the
+        # context, so it costs every endpoint, not only those in LLM_SPECULATIVE.
+        draft_model=draft_model,
         verbose=False,
     )
-    print("API READY.")
+    if draft_model is not None:
+        sys_comps["draft_model"] = draft_model
+    if LLM_ENGINE == "batched":
+        # A second context on the same weights, one KV sequence per slot plus
+        # one for the cached prompt prefix
+        backend = LlamaBatchBackend(
+            sys_comps["llm"], n_seq=LLM_BATCH_SLOTS + 1, n_ctx_per_seq=LLM_N_CTX
+        )
+        sys_comps["engine"] = GenerationEngine(
+            backend, slots=LLM_BATCH_SLOTS, max_queue=LLM_MAX_QUEUE
+        )
+        print(f"   Continuous batching over {LLM_BATCH_SLOTS} sequences.")
 
 
-@app.post("/predict")
-async def predict(file: UploadFile = File(...)):
-    try:
+def warm_llm():
+    # Evaluate the static system + few-shot prefix once and keep its KV state.
+    # This is a full forward pass, so it also faults in the mmapped weights.
+    if "llm_client" in sys_comps:
+        return  # the workers warm their own
+    engine = sys_comps.get("engine")
+    if engine is not None:
+        n_prefix = engine.cache_prefix(engine.backend.tokenize(SERVING_PROMPT.prefix))
+        print(f"   Cached KV for {n_prefix} prompt prefix tokens in the engine.")
+        return
+    prefix_cache = PrefixCache(sys_comps["llm"])
+    n_prefix = prefix_cache.warm(SERVING_PROMPT)
+    sys_comps["prefix_cache"] = prefix_cache
+    print(f"   Cached KV state for {n_prefix} prompt prefix tokens.")
 
-        img = Image.open(io.BytesIO(await file.read())).convert("RGB")
-        inputs = sys_comps["cv_proc"](img, return_tensors="pt")
-        with torch.no_grad():
-            outputs = sys_comps["cv_model"](**inputs)
-            probs = torch.softmax(outputs.logits, dim=-1)
-            conf, pred_idx = torch.max(probs, dim=-1)
-            diagnosis = sys_comps["cv_model"].config.id2label[pred_idx.item()]
 
-        docs = sys_comps["rag"].similarity_search(
-            query=f"{diagnosis} treatment", k=2, filter={"disease": diagnosis}
-        )
+readiness = Readiness()
+
+# (name, load, warm-up, dependencies) of everything startup brings up
+COMPONENTS = [
+    ("cv", load_cv, warm_cv, ()),
+    ("rag", load_rag, warm_rag, ()),
+    ("retrieval_table", load_retrieval_table, None, ("cv", "rag")),
+    ("llm", load_llm, warm_llm, ()),
+]
+
+# What each endpoint needs before it can serve (the retrieval table is an
+# optimisation: /predict falls back to live Chroma searches without it)
+PREDICT_COMPONENTS = ("cv", "rag", "llm")
+CHAT_COMPONENTS = ("llm",)
+
+# Components already loaded by preload_components() before the worker forked
+PRELOADED = set()
 
-        if not docs:
-            docs = sys_comps["rag"].similarity_search(f"{diagnosis} treatment", k=2)
-        context_text = "\n".join([d.page_content[:500] for d in docs])
 
-        # Few-Shot Prompting Strategy (Winner of M2_D1 Experiments)
-        examples = """
-Example 1:
-Context: Apple___Apple_scab
-Question: My apple tree leaves have olive-green spots. What should I do?
-Answer: This is Apple Scab. Remove fallen leaves to reduce spores and apply fungicides like captan early in the season.
+def preload_components():
+    """
+    Used by backend/serve.py: load the large read-only weights once in the
+    master process, so forked workers share their pages copy-on-write.
+    Chroma (sqlite handles) and every warm-up (thread pools) are left to the
+    workers, since neither survives a fork.
+    """
+    load_cv()
+    load_embeddings()
+    PRELOADED.add("cv")
+    if not LLM_WORKERS:  # otherwise every worker connects on its own
+        load_llm()
+        PRELOADED.add("llm")
 
-Example 2:
-Context: Tomato___Early_blight
-Question: I see dark rings on my tomato leaves. How do I fix it?
-Answer: This is Tomato Early Blight. Improve air circulation, avoid overhead watering, and apply copper-based fungicides.
-"""
-        prompt = f"<|system|>\nYou are a plant disease expert. Answer the question based on the context.\n{examples}\n<|user|>\nContext: {context_text}\nQuestion: Explain {diagnosis} and how to treat it.\n<|assistant|>\n"
 
-        # GGUF Inference
-        output = sys_comps["llm"](
-            prompt, max_tokens=512, stop=["<|user|>", "<|system|>"], echo=False
+def skip_load():
+    pass
+
+
+async def load_components():
+    await asyncio.gather(
+        *(
+            readiness.load(
+                name,
+                skip_load if name in PRELOADED else track_memory(name, load_fn),
+                warm_fn,
+            )
+            for name, load_fn, warm_fn, _ in COMPONENTS
         )
-        response = output["choices"][0]["text"].strip()
+    )
+    status = "API READY." if readiness.ready else "⚠️ API started with failures."
+    print(status)
+
+
+@app.on_event("startup")
+async def startup_event():
+    print("⚙️ Initializing Free Tier Mode (CPU)...")
+    for name, _, _, requires in COMPONENTS:
+        readiness.register(name, requires=requires)
+    expose_memory(GGUF_PATH)
+    # Load in the background so the server answers /health/live right away
+    app.state.loader = asyncio.create_task(load_components())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Explanation cache saves are debounced: write the last changes
+    await explanation_cache.save()
+
+
+@app.get("/health/live")
+async def health_live():
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """200 once every component is ready, else 503; per-component detail."""
+    body = health_report()
+    return JSONResponse(body, status_code=200 if body["status"] == "ready" else 503)
+
+
+@app.get("/health")
+async def health():
+    """Healthy while loading or ready; unhealthy once a component failed."""
+    body = health_report()
+    return JSONResponse(body, status_code=503 if body["status"] == "failed" else 200)
+
+
+def health_report():
+    components = readiness.snapshot()
+    statuses = {c["status"] for c in components.values()}
+    if "failed" in statuses:
+        status = "failed"
+    elif readiness.ready:
+        status = "ready"
+    else:
+        status = "loading"
+    return {
+        "status": status,
+        "components": components,
+        "endpoints": {
+            "predict": all(map(readiness.is_ready, PREDICT_COMPONENTS)),
+            "chat": all(map(readiness.is_ready, CHAT_COMPONENTS)),
+        },
+    }
+
+
+async def diagnose(file: UploadFile):
+    """Decode, classify and retrieve context for one uploaded image."""
+    with stage("upload_read"):
+        data = await file.read()
+    return await diagnose_bytes(data)
+
+
+def retrieval_version():
+    """Fingerprint of the index the retrieval table answers from (None while stale)."""
+    table = sys_comps.get("retrieval_table")
+    return table.fingerprint if table is not None else None
+
+
+async def diagnose_bytes(data: bytes):
+    # Cached predictions carry their retrieval context: drop them once the
+    # retrieval table is rebuilt for a changed index
+    version = retrieval_version()
+    if version != prediction_cache.version:
+        prediction_cache.clear(version)
 
-        return {
+    # Retried uploads are answered before anything gets decoded
+    key = PredictionCache.content_key(data)
+    cached = prediction_cache.get(key)
+    phash = None
+    if cached is None and prediction_cache.phash_distance is not None:
+        phash = await scheduler.run("cv", image_fingerprint, data)
+        cached = prediction_cache.get_similar(phash)
+    if cached is not None:
+        prediction_cache.put(key, cached)
+        return cached
+
+    img = await scheduler.run("cv", decode_image, data)
+    diagnosis, conf = await cv_batcher.submit(img)
+    context_text = await scheduler.run("retrieval", retrieve_context, diagnosis)
+    if retrieval_version() == prediction_cache.version:
+        prediction_cache.put(key, (diagnosis, conf, context_text), phash=phash)
+    return diagnosis, conf, context_text
+
+
+@app.post("/predict")
+async def predict(file: UploadFile = File(...), mode: str = "sync"):
+    """
+    Diagnose one leaf photo and explain it. With ``mode=async`` the diagnosis
+    comes back at once (202) with a ``job_id``; poll ``/jobs/{job_id}`` for
+    the explanation.
+    """
+    readiness.require(*PREDICT_COMPONENTS)
+    if mode not in ("sync", "async"):
+        raise HTTPException(422, "mode must be 'sync' or 'async'.")
+    try:
+        diagnosis, conf, context_text = await diagnose(file)
+        prompt = build_prompt(context_text, explain_question(diagnosis))
+        key = ExplanationCache.make_key(
+            diagnosis, context_text, PROMPT_VERSION, GGUF_FILE
+        )
+        session = sessions.create(diagnosis, context_text, explanation_key=key)
+        result = {
             "diagnosis": diagnosis,
-            "confidence": f"{conf.item()*100:.1f}%",
-            "explanation": response,
+            "confidence": f"{conf*100:.1f}%",
             "chat_context": context_text,
+            "session_id": session.id,
         }
+
+        if mode == "async":
+            cached = explanation_cache.get(key)
+            if cached is not None:
+                job = jobs.completed(cached, diagnosis=diagnosis)
+            else:
+                job = jobs.submit(
+                    lambda job: explanation_job(job, key, prompt), diagnosis=diagnosis
+                )
+            result.update(
+                job_id=job.id, status=job.status, status_url=f"/jobs/{job.id}"
+            )
+            return JSONResponse(result, status_code=202)
+
+        # GGUF Inference (once per diagnosis/context, shared by concurrent misses)
+        response = await explanation_cache.get_or_create(key, lambda: complete(prompt))
+        result["explanation"] = response
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         return {"error": str(e)}
 
 
+async def explanation_job(job, key, prompt):
+    """
+    Background /predict explanation. Streams tokens so pollers see progress.
+    A cancelled job frees the LLM at the next token unless other requests
+    wait for the same explanation.
+    """
+    if (
+        explanation_cache.get(key) is not None
+        or explanation_cache.pending(key) is not None
+    ):
+        return await explanation_cache.get_or_create(key, lambda: complete(prompt))
+
+    stream = stream_completion(prompt, "predict")
+
+    def on_token(text):
+        job.partial += text
+
+    generation = explanation_cache.stream(key, stream, on_token=on_token)
+    try:
+        return await asyncio.shield(generation)
+    finally:
+        # A cancelled job only stops the generation if nobody else waits on it
+        explanation_cache.leave(generation)
+
+
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown or expired job.")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, wait: float = 0):
+    """
+    Job status, with the explanation so far while it runs. ``wait`` long-polls
+    for up to 30 s until the job finishes.
+    """
+    job = get_job(job_id)
+    if wait > 0 and not job.finished:
+        await job.wait(min(wait, 30.0))
+    return job.as_dict()
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str, wait: float = 0):
+    """The finished explanation (200), or 202 with the status while pending."""
+    job = get_job(job_id)
+    if wait > 0 and not job.finished:
+        await job.wait(min(wait, 30.0))
+    if job.status == "done":
+        return {"job_id": job.id, "explanation": job.result, **job.meta}
+    if job.finished:
+        raise HTTPException(409, f"Job {job.status}: {job.error or 'no result'}")
+    return JSONResponse(job.as_dict(), status_code=202)
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown or expired job.")
+    return job.as_dict()
+
+
+@app.post("/predict/stream")
+async def predict_stream(file: UploadFile = File(...)):
+    """
+    Same as /predict, but as Server-Sent Events: a ``diagnosis`` event first,
+    then ``token`` events for the explanation and a final ``done`` event.
+    """
+    readiness.require(*PREDICT_COMPONENTS)
+    try:
+        diagnosis, conf, context_text = await diagnose(file)
+    except HTTPException:
+        raise
+    except Exception as e:
+        return {"error": str(e)}
+
+    prompt = build_prompt(context_text, explain_question(diagnosis))
+    key = ExplanationCache.make_key(diagnosis, context_text, PROMPT_VERSION, GGUF_FILE)
+    session = sessions.create(diagnosis, context_text, explanation_key=key)
+    head = sse_event(
+        "diagnosis",
+        {
+            "diagnosis": diagnosis,
+            "confidence": f"{conf*100:.1f}%",
+            "chat_context": context_text,
+            "session_id": session.id,
+        },
+    )
+
+    # Cached, or already being generated for someone else: no need to stream
+    if (
+        explanation_cache.get(key) is not None
+        or explanation_cache.pending(key) is not None
+    ):
+        body = sse_text(
+            [head],
+            lambda: explanation_cache.get_or_create(key, lambda: complete(prompt)),
+            "explanation",
+        )
+    else:
+        # The generation belongs to the cache, not to this response: if the
+        # client leaves, requests coalesced on the key still get the result
+        stream = stream_completion(prompt, "predict")
+        tokens = asyncio.Queue()
+        generation = explanation_cache.stream(key, stream, on_token=tokens.put_nowait)
+        body = sse_follow(
+            [head],
+            generation,
+            tokens,
+            "explanation",
+            on_close=lambda: explanation_cache.leave(generation),
+        )
+
+    return StreamingResponse(body, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.post("/predict/batch")
+async def predict_batch(files: List[UploadFile] = File(...)):
+    """
+    Diagnose many leaf photos (or one zip of them) in one request. Images are
+    decoded in parallel and classified in CV batches; one explanation is
+    generated per distinct diagnosis instead of one per image.
+    """
+    readiness.require(*PREDICT_COMPONENTS)
+    uploads = []
+    size = 0  # image bytes so far; the archives share one budget
+    for file in files:
+        with stage("upload_read"):
+            data = await file.read()
+        images = await scheduler.run(
+            "cv",
+            expand_upload,
+            file.filename,
+            data,
+            MAX_BATCH_IMAGES - len(uploads),
+            MAX_BATCH_BYTES - size,
+        )
+        uploads.extend(images)
+        size += sum(len(image) for _, image in images)
+        if len(uploads) > MAX_BATCH_IMAGES:
+            raise HTTPException(
+                413, f"At most {MAX_BATCH_IMAGES} images per batch request."
+            )
+    if not uploads:
+        raise HTTPException(400, "No images found in the upload.")
+
+    results = await asyncio.gather(
+        *(diagnose_bytes(data) for _, data in uploads), return_exceptions=True
+    )
+
+    predictions = []
+    by_class = {}
+    for (filename, _), result in zip(uploads, results):
+        if isinstance(result, HTTPException):
+            raise result
+        if isinstance(result, Exception):
+            predictions.append({"filename": filename, "error": str(result)})
+            continue
+        diagnosis, conf, context_text = result
+        predictions.append(
+            {
+                "filename": filename,
+                "diagnosis": diagnosis,
+                "confidence": f"{conf*100:.1f}%",
+            }
+        )
+        group = by_class.setdefault(
+            diagnosis, {"confidences": [], "context": context_text}
+        )
+        group["confidences"].append(conf)
+
+    summary = []
+    for diagnosis, group in sorted(
+        by_class.items(), key=lambda item: -len(item[1]["confidences"])
+    ):
+        prompt = build_prompt(group["context"], explain_question(diagnosis))
+        key = ExplanationCache.make_key(
+            diagnosis, group["context"], PROMPT_VERSION, GGUF_FILE
+        )
+        session = sessions.create(diagnosis, group["context"], explanation_key=key)
+        confidences = group["confidences"]
+        entry = {
+            "diagnosis": diagnosis,
+            "count": len(confidences),
+            "mean_confidence": f"{sum(confidences) / len(confidences) * 100:.1f}%",
+            "chat_context": group["context"],
+            "session_id": session.id,
+        }
+        # One at a time: a big batch should not flood the LLM queue. A failed
+        # or shed explanation must not throw away the classified images.
+        try:
+            entry["explanation"] = await explanation_cache.get_or_create(
+                key, lambda prompt=prompt: complete(prompt)
+            )
+        except HTTPException as e:
+            entry["error"] = e.detail
+        except Exception as e:
+            entry["error"] = str(e)
+        summary.append(entry)
+
+    return {"predictions": predictions, "summary": summary}
+
+
 class ChatPayload(BaseModel):
+    """
+    A follow-up question. Clients send the ``session_id`` returned by
+    /predict; ``context`` (and ``diagnosis``) are only needed to start a
+    conversation without one.
+    """
+
     question: str
-    context: str
-    diagnosis: str
+    session_id: Optional[str] = None
+    context: Optional[str] = None
+    diagnosis: Optional[str] = None
+
+
+async def chat_session(payload: ChatPayload):
+    """The payload's session, or a new one built from its context."""
+    if payload.session_id is not None:
+        session = sessions.get(payload.session_id)
+        if session is not None:
+            return session
+        if payload.context is None:
+            raise HTTPException(404, "Unknown or expired session_id.")
+    if payload.context is None:
+        raise HTTPException(422, "Send the session_id from /predict, or a context.")
+    context = await scheduler.run(
+        "retrieval", context_packer.pack, payload.context, payload.question
+    )
+    return sessions.create(payload.diagnosis or "", context)
+
+
+async def embed_question(session, question):
+    """
+    The question's embedding for the semantic answer cache, or None when the
+    cache does not apply. Answers are keyed on the session's explanation
+    cache key, so only sessions opened by /predict (server-side diagnosis
+    and context) use it, and only for their first follow-up: later questions
+    depend on the conversation so far.
+    """
+    embed_fn = sys_comps.get("embed_fn")
+    if answer_cache is None or embed_fn is None or session.explanation_key is None:
+        return None
+    add_explanation_turn(session)
+    explained = explain_question(session.diagnosis)
+    if any(question != explained for question, _ in session.turns):
+        return None
+    return await scheduler.run("retrieval", embed_fn.embed_query, question)
 
 
 @app.post("/chat")
 async def chat(payload: ChatPayload):
-    # Few-Shot Prompting Strategy (Winner of M2_D1 Experiments)
-    examples = """
-Example 1:
-Context: Apple___Apple_scab
-Question: My apple tree leaves have olive-green spots. What should I do?
-Answer: This is Apple Scab. Remove fallen leaves to reduce spores and apply fungicides like captan early in the season.
-
-Example 2:
-Context: Tomato___Early_blight
-Question: I see dark rings on my tomato leaves. How do I fix it?
-Answer: This is Tomato Early Blight. Improve air circulation, avoid overhead watering, and apply copper-based fungicides.
-"""
-    prompt = f"<|system|>\nYou are a plant disease expert. Answer the question based on the context.\n{examples}\n<|user|>\nContext: {payload.context}\nQuestion: {payload.question}\n<|assistant|>\n"
-
-    # GGUF Inference
-    output = sys_comps["llm"](
-        prompt, max_tokens=512, stop=["<|user|>", "<|system|>"], echo=False
+    readiness.require(*CHAT_COMPONENTS)
+    session = await chat_session(payload)
+    embedding = await embed_question(session, payload.question)
+    answer = None
+    if embedding is not None:
+        answer = answer_cache.get(session.explanation_key, embedding)
+
+    if answer is None:
+        prompt = await scheduler.run(
+            "retrieval", session_prompt, session, payload.question
+        )
+        # GGUF Inference, continuing from the session's previous turn
+        answer = await complete(prompt, "chat", session, priority=Priority.CHAT)
+        if embedding is not None:
+            answer_cache.put(session.explanation_key, embedding, answer)
+    session.turns.append((payload.question, answer))
+    return {"answer": answer, "session_id": session.id}
+
+
+@app.post("/chat/stream")
+async def chat_stream(payload: ChatPayload):
+    """Same as /chat, streamed as ``token`` events and a final ``done`` event."""
+    readiness.require(*CHAT_COMPONENTS)
+    session = await chat_session(payload)
+    headers = {**SSE_HEADERS, "X-Session-Id": session.id}
+    embedding = await embed_question(session, payload.question)
+    if embedding is not None:
+        answer = answer_cache.get(session.explanation_key, embedding)
+        if answer is not None:
+            session.turns.append((payload.question, answer))
+            # sse_text awaits its text: wrap the cached answer in an awaitable
+            body = sse_text([], lambda: asyncio.sleep(0, answer), "answer")
+            return StreamingResponse(
+                body, media_type="text/event-stream", headers=headers
+            )
+
+    prompt = await scheduler.run("retrieval", session_prompt, session, payload.question)
+    stream = stream_completion(prompt, "chat", session, priority=Priority.CHAT)
+
+    def add_turn(answer):
+        if answer is not None:
+            session.turns.append((payload.question, answer))
+            if embedding is not None:
+                answer_cache.put(session.explanation_key, embedding, answer)
+
+    return StreamingResponse(
+        sse_stream(stream, [], "answer", on_finish=add_turn),
+        media_type="text/event-stream",
+        headers=headers,
     )
-    return {"answer": output["choices"][0]["text"].strip()}
+
+
+async def receive_frames(websocket: WebSocket, frames: LatestFrame):
+    """Feed binary messages into ``frames`` until the client disconnects."""
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                frames.put(message["bytes"])
+    finally:
+        frames.close()
+
+
+async def explain_stable(websocket: WebSocket, diagnosis, conf):
+    """Send a newly stable diagnosis with its session, then its explanation."""
+    try:
+        context_text = await scheduler.run("retrieval", retrieve_context, diagnosis)
+        key = ExplanationCache.make_key(
+            diagnosis, context_text, PROMPT_VERSION, GGUF_FILE
+        )
+        session = sessions.create(diagnosis, context_text, explanation_key=key)
+        await websocket.send_json(
+            {
+                "type": "diagnosis",
+                "diagnosis": diagnosis,
+                "confidence": f"{conf*100:.1f}%",
+                "chat_context": context_text,
+                "session_id": session.id,
+            }
+        )
+        prompt = build_prompt(context_text, explain_question(diagnosis))
+        explanation = await explanation_cache.get_or_create(
+            key, lambda: complete(prompt)
+        )
+        await websocket.send_json(
+            {
+                "type": "explanation",
+                "diagnosis": diagnosis,
+                "session_id": session.id,
+                "explanation": explanation,
+            }
+        )
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "error": e.detail})
+    except Exception as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+
+
+@app.websocket("/ws/stream")
+async def ws_stream(websocket: WebSocket):
+    """
+    Live diagnosis from a camera. The client sends binary JPEG frames; only
+    the newest frame waiting is classified (through the same micro-batcher as
+    /predict), older ones are dropped. JSON messages come back: ``diagnosis``
+    when the predicted class becomes stable, then ``explanation`` for it, and
+    ``error`` for frames or explanations that failed.
+    """
+    await websocket.accept()
+    try:
+        readiness.require(*PREDICT_COMPONENTS)
+    except HTTPException as e:
+        await websocket.close(code=1013, reason=e.detail)  # try again later
+        return
+
+    frames = LatestFrame()
+    tracker = StabilityTracker(STREAM_STABLE_FRAMES, STREAM_MIN_CONFIDENCE)
+    receiver = asyncio.create_task(receive_frames(websocket, frames))
+    explaining = set()
+    metrics.STREAM_CONNECTIONS.inc()
+    try:
+        while True:
+            data = await frames.get()
+            if data is None:
+                break
+            try:
+                img = await scheduler.run("cv", decode_image, data)
+                diagnosis, conf = await cv_batcher.submit(img)
+            except Overloaded:
+                metrics.STREAM_FRAMES.labels("dropped").inc()
+                continue
+            except Exception as e:
+                metrics.STREAM_FRAMES.labels("failed").inc()
+                await websocket.send_json({"type": "error", "error": str(e)})
+                continue
+            metrics.STREAM_FRAMES.labels("classified").inc()
+
+            if tracker.update(diagnosis, conf) is not None:
+                task = asyncio.create_task(explain_stable(websocket, diagnosis, conf))
+                explaining.add(task)
+                task.add_done_callback(explaining.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        metrics.STREAM_CONNECTIONS.dec()
+        receiver.cancel()
+        for task in explaining:
+            task.cancel()
+
+
+def require_admin(authorization):
+    if not ADMIN_TOKEN:
+        raise HTTPException(403, "Admin endpoints are disabled (ADMIN_TOKEN unset).")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(
+        token.strip().encode(), ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(
+            401, "Invalid admin token.", headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+@app.post("/admin/profile")
+async def admin_profile(
+    seconds: float = 10,
+    interval_ms: float = 5,
+    top: int = 25,
+    format: str = "json",
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Sample every thread's stack for ``seconds`` and trace allocations over the
+    same window. ``format=collapsed`` returns only the collapsed stacks, ready
+    for flamegraph.pl or speedscope.
+    """
+    require_admin(authorization)
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(422, f"seconds must be in (0, {PROFILE_MAX_SECONDS:g}].")
+    if format not in ("json", "collapsed"):
+        raise HTTPException(422, "format must be 'json' or 'collapsed'.")
+    try:
+        result = await profiling.profile(
+            seconds, interval=max(interval_ms, 1) / 1000, top=top
+        )
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(409, str(e))
+    if format == "collapsed":
+        return PlainTextResponse(result["collapsed"])
+    return result
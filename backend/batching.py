@@ -0,0 +1,103 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+
+from backend import metrics
+
+BatchFn = Callable[[List[Any]], List[Any]]
+Runner = Callable[[BatchFn, List[Any]], Awaitable[List[Any]]]
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching in front of a blocking batch function.
+
+    Items submitted within ``max_wait_ms`` of the first queued item (or until
+    ``max_batch_size`` items are waiting) are passed to ``batch_fn`` as one
+    list, and every caller gets back the result at its own position.
+    """
+
+    def __init__(
+        self,
+        batch_fn: BatchFn,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        name: str = "cv",
+        run: Optional[Runner] = None,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self._run = run
+        self._loop = None
+        self._pending = []
+        self._has_items = None
+        self._full = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        # Bind to whichever loop is running; a new loop (e.g. a fresh
+        # TestClient portal) gets a fresh collector task.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._pending = []
+            self._has_items = asyncio.Event()
+            self._full = asyncio.Event()
+            self._worker = loop.create_task(self._collect())
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result from the next batch."""
+        self._ensure_worker()
+        fut = self._loop.create_future()
+        self._pending.append((item, fut, time.perf_counter()))
+        self._has_items.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        return await fut
+
+    async def _collect(self):
+        while True:
+            await self._has_items.wait()
+            if len(self._pending) < self.max_batch_size and self.max_wait > 0:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[: self.max_batch_size]
+            del self._pending[: self.max_batch_size]
+            if not self._pending:
+                self._has_items.clear()
+            if len(self._pending) < self.max_batch_size:
+                self._full.clear()
+
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        # Callers that gave up while queued don't need a forward pass.
+        batch = [entry for entry in batch if not entry[1].cancelled()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        metrics.BATCH_SIZE.labels(self.name).observe(len(batch))
+        for _, _, enqueued in batch:
+            metrics.BATCH_QUEUE_WAIT.labels(self.name).observe(started - enqueued)
+
+        items = [item for item, _, _ in batch]
+        try:
+            if self._run is not None:
+                results = await self._run(self.batch_fn, items)
+            else:
+                results = await self._loop.run_in_executor(None, self.batch_fn, items)
+        except Exception as e:
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for (_, fut, _), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
@@ -0,0 +1,447 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from backend import metrics
+
+
+class TTLCache:
+    """
+    LRU cache with a per-entry time-to-live.
+    Timestamps are wall-clock so entries can be persisted across restarts.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = None, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and self.clock() - stored_at > self.ttl
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        value, stored_at = entry
+        if self._expired(stored_at):
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value, stored_at: float = None):
+        self._data[key] = (value, self.clock() if stored_at is None else stored_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def items(self):
+        """Live (key, value, stored_at) entries, oldest first."""
+        return [
+            (key, value, stored_at)
+            for key, (value, stored_at) in self._data.items()
+            if not self._expired(stored_at)
+        ]
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent async calls for the same key: the first caller runs
+    the work, everyone else arriving before it finishes awaits the same result.
+
+    The work runs in a task of its own. One impatient caller leaving does not
+    affect the others; only when the last interested caller has left is the
+    work cancelled, which frees the key for the next request.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._waiters = {}  # future -> callers still interested in it
+
+    def pending(self, key):
+        return self._inflight.get(key)
+
+    def start(self, key, fn):
+        """Run ``fn()`` for ``key`` in the background; nobody waits on it yet."""
+        fut = asyncio.ensure_future(fn())
+        self._inflight[key] = fut
+        self._waiters[fut] = 0
+
+        def done(_):
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+            self._waiters.pop(fut, None)
+            if not fut.cancelled():
+                fut.exception()  # waiters get the error; don't log it as unretrieved
+
+        fut.add_done_callback(done)
+        return fut
+
+    def join(self, fut):
+        """Count the caller as waiting on ``fut`` until it calls ``leave``."""
+        self._waiters[fut] = self._waiters.get(fut, 0) + 1
+
+    def leave(self, fut):
+        if fut.done():
+            return
+        self._waiters[fut] -= 1
+        if self._waiters[fut] <= 0:
+            fut.cancel()  # nobody wants the result any more
+
+    async def wait(self, fut):
+        self.join(fut)
+        try:
+            return await asyncio.shield(fut)
+        finally:
+            self.leave(fut)
+
+    async def do(self, key, fn):
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = self.start(key, fn)
+        return await self.wait(fut)
+
+
+class ExplanationCache:
+    """
+    Explanations keyed by (diagnosis, context hash, prompt version, model file).
+
+    Entries are evicted LRU-first once ``maxsize`` is reached or after ``ttl``
+    seconds. When ``path`` is set, the cache is loaded from and saved to that
+    JSON file so explanations survive restarts. On the event loop, saves are
+    debounced by ``save_delay`` seconds and written from a thread; call
+    ``save()`` at shutdown to write the last changes.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        ttl: float = None,
+        path: str = None,
+        save_delay: float = 5.0,
+    ):
+        self.path = path
+        self.save_delay = save_delay
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._flight = SingleFlight()
+        self._dirty = False
+        self._save_task = None
+        self._write_lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def make_key(diagnosis, context, prompt_version, model_file) -> str:
+        context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()[:16]
+        return f"{model_file}|{prompt_version}|{diagnosis}|{context_hash}"
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def put(self, key, explanation: str):
+        if not explanation:
+            return
+        self._entries.put(key, explanation)
+        self._schedule_save()
+
+    def pending(self, key):
+        """The in-flight generation for ``key``, if one is running."""
+        return self._flight.pending(key)
+
+    def stream(self, key, stream, on_token=None):
+        """
+        Fill ``key`` from a started token stream, so concurrent requests wait
+        for it instead of generating again. The stream is drained by a task of
+        its own and ``on_token`` sees each chunk. The caller counts as waiting
+        on the returned future until it calls ``leave``; the generation is
+        only cancelled once every waiter has left.
+        """
+        metrics.EXPLANATION_CACHE_REQUESTS.labels("miss").inc()
+
+        async def fill():
+            parts = []
+            async for text in stream.tokens():
+                parts.append(text)
+                if on_token is not None:
+                    on_token(text)
+            explanation = "".join(parts).strip()
+            if not explanation:
+                raise RuntimeError("Explanation generation produced no text.")
+            self.put(key, explanation)
+            return explanation
+
+        fut = self._flight.start(key, fill)
+        self._flight.join(fut)
+        return fut
+
+    def leave(self, fut):
+        """The caller of ``stream`` no longer waits for ``fut``."""
+        self._flight.leave(fut)
+
+    async def get_or_create(self, key, generate):
+        """
+        Return the cached explanation for ``key`` or run ``generate()`` (an
+        async callable) once, sharing its result with concurrent callers.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            metrics.EXPLANATION_CACHE_REQUESTS.labels("hit").inc()
+            return cached
+
+        if self.pending(key) is not None:
+            metrics.EXPLANATION_CACHE_REQUESTS.labels("coalesced").inc()
+        else:
+            metrics.EXPLANATION_CACHE_REQUESTS.labels("miss").inc()
+
+        async def fill():
+            explanation = await generate()
+            self.put(key, explanation)
+            return explanation
+
+        return await self._flight.do(key, fill)
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Warning: Ignoring unreadable explanation cache {self.path}: {e}")
+            return
+        for key, value, stored_at in entries:
+            self._entries.put(key, value, stored_at=stored_at)
+
+    def _schedule_save(self):
+        if not self.path:
+            return
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # no event loop to hold up (scripts, tests)
+            self._dirty = False
+            self._write(self._entries.items())
+            return
+        if self._save_task is None or self._save_task.done():
+            self._save_task = loop.create_task(self._save_later())
+
+    async def _save_later(self):
+        await asyncio.sleep(self.save_delay)
+        await self.save()
+
+    async def save(self):
+        """Write unsaved changes to ``path`` from a thread."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        await asyncio.to_thread(self._write, self._entries.items())
+
+    def _write(self, entries):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._write_lock:  # one snapshot at a time, in the order taken
+            # Write-then-rename so a crash never leaves a half-written file behind
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+
+
+def dhash(image, size: int = 8) -> int:
+    """
+    64-bit difference hash of a PIL image. Re-encoded or resized copies of the
+    same photo land within a few bits of each other.
+    """
+    small = image.convert("L").resize((size + 1, size))
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+class PredictionCache:
+    """
+    (diagnosis, confidence, context) for recently seen uploads.
+
+    Lookups are by SHA-256 of the raw upload bytes, so a retried upload never
+    gets decoded again. With ``phash_distance`` set, uploads whose perceptual
+    hash is within that many bits of a cached one are treated as the same photo.
+
+    ``version`` names what the cached contexts were retrieved from; ``clear``
+    drops them all when that changes.
+    """
+
+    def __init__(self, maxsize: int = 1024, phash_distance: int = None):
+        self.maxsize = maxsize
+        self.phash_distance = phash_distance
+        self.clear()
+
+    def clear(self, version=None):
+        """Drop every entry; entries put from now on belong to ``version``."""
+        self.version = version
+        self._entries = OrderedDict()  # content key -> (entry, slot)
+        self._hashes = np.zeros(self.maxsize, dtype=np.uint64)
+        self._used = np.zeros(self.maxsize, dtype=bool)
+        self._slot_keys = [None] * self.maxsize
+        self._free = list(range(self.maxsize - 1, -1, -1))
+
+    @staticmethod
+    def content_key(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Exact lookup by content key. Counts a miss only in exact-only mode."""
+        found = self._entries.get(key)
+        if found is not None:
+            self._entries.move_to_end(key)
+            metrics.PREDICTION_CACHE_REQUESTS.labels("exact_hit").inc()
+            return found[0]
+        if self.phash_distance is None:
+            metrics.PREDICTION_CACHE_REQUESTS.labels("miss").inc()
+        return None
+
+    def get_similar(self, phash: int):
+        """Closest cached upload within ``phash_distance`` bits, if any."""
+        if self.phash_distance is not None and self._used.any():
+            diff = self._hashes ^ np.uint64(phash)
+            distance = np.unpackbits(diff.view(np.uint8).reshape(-1, 8), axis=1).sum(
+                axis=1
+            )
+            distance[~self._used] = 65
+            slot = int(distance.argmin())
+            if distance[slot] <= self.phash_distance:
+                key = self._slot_keys[slot]
+                self._entries.move_to_end(key)
+                metrics.PREDICTION_CACHE_REQUESTS.labels("perceptual_hit").inc()
+                return self._entries[key][0]
+
+        metrics.PREDICTION_CACHE_REQUESTS.labels("miss").inc()
+        return None
+
+    def put(self, key, entry, phash: int = None):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        if len(self._entries) >= self.maxsize:
+            _, (_, old_slot) = self._entries.popitem(last=False)
+            if old_slot is not None:
+                self._used[old_slot] = False
+                self._slot_keys[old_slot] = None
+                self._free.append(old_slot)
+
+        slot = None
+        if phash is not None and self.phash_distance is not None:
+            slot = self._free.pop()
+            self._hashes[slot] = phash
+            self._used[slot] = True
+            self._slot_keys[slot] = key
+        self._entries[key] = (entry, slot)
+
+
+class SemanticAnswerCache:
+    """
+    /chat answers, found again for questions that mean the same thing.
+
+    Answers are grouped by ``key``: the explanation cache key of the
+    session, so only sessions with the same diagnosis, context, prompt
+    version and model share answers. Questions are kept as unit-length
+    embeddings in one matrix, so a lookup is a single matrix-vector product
+    over the rows of the same key; the closest row is a hit when its cosine
+    similarity reaches ``threshold``. Entries are evicted LRU-first beyond
+    ``maxsize`` and expire after ``ttl`` seconds.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        maxsize: int = 2048,
+        ttl: float = None,
+        clock=time.monotonic,
+    ):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._vectors = None  # (maxsize, dim), allocated by the first put
+        self._labels = np.full(maxsize, -1, dtype=np.int32)  # -1 = free slot
+        self._stored_at = np.zeros(maxsize)
+        self._label_ids = {}  # key -> label, while any slot uses it
+        self._next_label = 0
+        self._answers = OrderedDict()  # slot -> answer, least recently used first
+        self._free = list(range(maxsize - 1, -1, -1))
+
+    def __len__(self):
+        return len(self._answers)
+
+    @staticmethod
+    def _unit(embedding):
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _evict(self, slot):
+        del self._answers[slot]
+        label, self._labels[slot] = self._labels[slot], -1
+        self._free.append(slot)
+        if not (self._labels == label).any():
+            self._label_ids = {k: v for k, v in self._label_ids.items() if v != label}
+
+    def _expire(self):
+        if self.ttl is None:
+            return
+        expired = (self._labels >= 0) & (self._stored_at < self.clock() - self.ttl)
+        for slot in np.flatnonzero(expired).tolist():
+            self._evict(slot)
+
+    def get(self, key, embedding):
+        """The answer to the closest cached question under ``key``, if any."""
+        label = self._label_ids.get(key)
+        if label is not None and self._answers:
+            self._expire()
+            scores = self._vectors @ self._unit(embedding)
+            scores[self._labels != label] = -np.inf
+            slot = int(scores.argmax())
+            if np.isfinite(scores[slot]):
+                metrics.SEMANTIC_CACHE_SIMILARITY.observe(float(scores[slot]))
+                if scores[slot] >= self.threshold:
+                    self._answers.move_to_end(slot)
+                    metrics.SEMANTIC_CACHE_REQUESTS.labels("hit").inc()
+                    return self._answers[slot]
+
+        metrics.SEMANTIC_CACHE_REQUESTS.labels("miss").inc()
+        return None
+
+    def put(self, key, embedding, answer: str):
+        if not answer:
+            return
+        vector = self._unit(embedding)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.maxsize, vector.size), dtype=np.float32)
+        self._expire()
+        if not self._free:
+            self._evict(next(iter(self._answers)))
+
+        slot = self._free.pop()
+        self._vectors[slot] = vector
+        if key not in self._label_ids:
+            self._label_ids[key] = self._next_label
+            self._next_label += 1
+        self._labels[slot] = self._label_ids[key]
+        self._stored_at[slot] = self.clock()
+        self._answers[slot] = answer
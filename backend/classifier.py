@@ -0,0 +1,72 @@
+"""
+CV classifiers behind one NumPy interface: ``model(pixel_values) -> logits``.
+
+The exported ONNX models are served by ``OnnxClassifier``, which needs only
+onnxruntime and the JSON files ``save_pretrained`` writes next to the graph.
+Importing torch, transformers or optimum just to run an ORT session cost
+seconds of startup and hundreds of MB of RSS per worker. torch is imported
+only by ``TorchClassifier``, the fallback used when no ONNX export exists.
+"""
+
+import json
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+MODEL_FILE = "model.onnx"
+
+
+def load_id2label(model_dir):
+    """``id2label`` from a Hugging Face ``config.json``, with int keys."""
+    with open(os.path.join(model_dir, "config.json")) as f:
+        config = json.load(f)
+    return {int(k): v for k, v in config["id2label"].items()}
+
+
+def softmax_top1(logits):
+    """Index and probability of the top class for each row of ``logits``."""
+    logits = np.asarray(logits, dtype=np.float32)
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    probs = exp / exp.sum(axis=-1, keepdims=True)
+    pred_idx = probs.argmax(axis=-1)
+    return pred_idx, probs[np.arange(len(probs)), pred_idx]
+
+
+class OnnxClassifier:
+    """An exported classifier run with onnxruntime alone."""
+
+    def __init__(self, model_dir, file_name=MODEL_FILE, session_options=None):
+        import onnxruntime as ort
+
+        self.config = SimpleNamespace(id2label=load_id2label(model_dir))
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, file_name),
+            session_options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_name = self.session.get_outputs()[0].name
+
+    def __call__(self, pixel_values):
+        (logits,) = self.session.run(
+            [self.output_name], {self.input_name: pixel_values}
+        )
+        return logits
+
+
+class TorchClassifier:
+    """The PyTorch checkpoint, for trees without an ONNX export."""
+
+    def __init__(self, model_dir):
+        import torch
+        from transformers import AutoModelForImageClassification
+
+        self._torch = torch
+        self.model = AutoModelForImageClassification.from_pretrained(model_dir).eval()
+        self.config = self.model.config
+
+    def __call__(self, pixel_values):
+        with self._torch.no_grad():
+            outputs = self.model(pixel_values=self._torch.from_numpy(pixel_values))
+        return outputs.logits.numpy()
@@ -0,0 +1,148 @@
+"""
+Token-budgeted, question-aware context for the LLM prompt.
+
+Retrieved chunks are split into sentences, every sentence is scored by cosine
+similarity to the question, and the best ones are kept until the token budget
+(counted with the LLM's own tokenizer) is spent. Kept sentences are emitted in
+their original order so the context still reads naturally.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence, Union
+
+import numpy as np
+
+# Sentence ends, plus line breaks (list items, headings in the JSON corpus)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\s*\n+\s*")
+# Fragments shorter than this are headings/bullets without content
+MIN_SENTENCE_CHARS = 12
+
+
+def split_sentences(text: str) -> List[str]:
+    return [
+        s.strip()
+        for s in _SENTENCE_END.split(text)
+        if len(s.strip()) >= MIN_SENTENCE_CHARS
+    ]
+
+
+def approx_tokens(text: str) -> int:
+    """~4 characters per token, used when no tokenizer is available."""
+    return max(1, len(text) // 4)
+
+
+class ContextPacker:
+    """
+    ``embed(texts)`` returns one vector per text (or None when the embedding
+    model is not available, in which case sentences are kept in order).
+    ``count_tokens(text)`` should be the LLM tokenizer.
+
+    Sentence embeddings and token counts are memoized: /predict contexts come
+    from a fixed per-class table, so after warm-up packing is a dot product.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], Optional[Sequence[Sequence[float]]]],
+        count_tokens: Callable[[str], int] = approx_tokens,
+        budget: int = 256,
+        cache_size: int = 8192,
+    ):
+        self.embed = embed
+        self.count_tokens = count_tokens
+        self.budget = budget
+        self.cache_size = cache_size
+        self._vectors = OrderedDict()
+        self._tokens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _memo(self, cache, keys, compute):
+        with self._lock:
+            missing = [k for k in dict.fromkeys(keys) if k not in cache]
+        if missing:
+            values = compute(missing)
+            if values is None:
+                return None
+            with self._lock:
+                for k, v in zip(missing, values):
+                    cache[k] = v
+                while len(cache) > self.cache_size:
+                    cache.popitem(last=False)
+        with self._lock:
+            found = [cache.get(k) for k in keys]
+        # Evicted by a concurrent call in between: compute directly
+        if any(v is None for v in found):
+            return compute(list(keys))
+        return found
+
+    def _vectors_for(self, texts):
+        def compute(batch):
+            vectors = self.embed(batch)
+            if vectors is None:
+                return None
+            vectors = np.asarray(vectors, dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            return list(vectors / np.maximum(norms, 1e-12))
+
+        found = self._memo(self._vectors, texts, compute)
+        return None if found is None else np.stack(found)
+
+    def _tokens_for(self, texts):
+        return self._memo(
+            self._tokens, texts, lambda batch: [self.count_tokens(t) for t in batch]
+        )
+
+    def pack(
+        self,
+        chunks: Union[str, Sequence[str]],
+        question: str,
+        budget: Optional[int] = None,
+    ) -> str:
+        """
+        The most question-relevant sentences of ``chunks`` that fit in
+        ``budget`` tokens. Context that already fits is returned unchanged.
+        """
+        budget = self.budget if budget is None else budget
+        if isinstance(chunks, str):
+            chunks = [chunks]
+        text = "\n".join(c.strip() for c in chunks if c and c.strip())
+        if not text or self.count_tokens(text) <= budget:
+            return text
+
+        # (chunk index, sentence), duplicates across chunks dropped
+        seen = set()
+        sentences = []
+        for i, chunk in enumerate(chunks):
+            for sentence in split_sentences(chunk):
+                if sentence not in seen:
+                    seen.add(sentence)
+                    sentences.append((i, sentence))
+        if not sentences:
+            return ""
+
+        texts = [s for _, s in sentences]
+        costs = self._tokens_for(texts)
+        vectors = self._vectors_for(texts)
+        if vectors is None:
+            order = range(len(texts))
+        else:
+            query = self._vectors_for([question])[0]
+            order = np.argsort(-(vectors @ query), kind="stable")
+
+        kept, used = [], 0
+        for idx in order:
+            cost = costs[idx] + 1  # joining space/newline
+            if used + cost <= budget:
+                kept.append(int(idx))
+                used += cost
+
+        lines = []
+        for idx in sorted(kept):
+            chunk, sentence = sentences[idx]
+            if lines and lines[-1][0] == chunk:
+                lines[-1][1].append(sentence)
+            else:
+                lines.append((chunk, [sentence]))
+        return "\n".join(" ".join(parts) for _, parts in lines)
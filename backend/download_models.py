@@ -6,6 +6,8 @@ from huggingface_hub import hf_hub_download
 from optimum.onnxruntime import ORTModelForImageClassification
 from transformers import AutoImageProcessor
 
+from backend.quantization import quantize_cv_model
+
 load_dotenv()
 
 BUCKET_NAME = "mlopsmodel"
@@ -36,12 +38,13 @@ def download_and_unzip(s3_client, bucket, zip_name, extract_to):
     print(f"✅ {zip_name} extracted.")
 
 
-def convert_to_onnx():
+def convert_to_onnx(quantize=None, dataset_dir=None):
     cv_dir = os.path.join(MODEL_DIR, "flora_cv_model")
     onnx_dir = os.path.join(MODEL_DIR, "flora_cv_onnx")
 
     if os.path.exists(onnx_dir):
         print("✅ ONNX model already exists.")
+        quantize_onnx(onnx_dir, quantize, dataset_dir)
         return
 
     if not os.path.exists(cv_dir):
@@ -61,6 +64,28 @@ def convert_to_onnx():
     except Exception as e:
         print(f"❌ ONNX Conversion failed: {e}")
         print("⚠️ The app will fallback to the slower PyTorch model.")
+        return
+
+    quantize_onnx(onnx_dir, quantize, dataset_dir)
+
+
+def quantize_onnx(onnx_dir, mode, dataset_dir):
+    int8_dir = os.path.join(MODEL_DIR, "flora_cv_onnx_int8")
+    if not mode or os.path.exists(int8_dir):
+        return
+    if not dataset_dir or not os.path.exists(dataset_dir):
+        print("⚠️ No PlantVillage data for calibration, skipping INT8 export.")
+        return
+
+    print(f"🔄 Quantizing ONNX model to INT8 ({mode})...")
+    try:
+        report = quantize_cv_model(onnx_dir, int8_dir, dataset_dir, mode)
+        print(
+            f"✅ INT8 model saved. Top-1 drop: {report['accuracy_drop']:.4f}, "
+            f"speedup: {report['speedup']}x"
+        )
+    except Exception as e:
+        print(f"❌ Quantization failed: {e}")
 
 
 def setup_models():
@@ -83,8 +108,10 @@ def setup_models():
             print(f"❌ Error downloading from S3: {e}")
             print("⚠️ Check your AWS credentials.")
 
-    # 2. Convert CV Model to ONNX (Optimization)
-    convert_to_onnx()
+    # 2. Convert CV Model to ONNX (Optimization), optionally INT8 as well
+    convert_to_onnx(
+        quantize=os.getenv("CV_QUANTIZE"), dataset_dir=os.getenv("PLANTVILLAGE_DIR")
+    )
 
     # Cleanup: Remove the heavy PyTorch model after conversion to save space
     if os.path.exists(cv_path) and os.path.exists(
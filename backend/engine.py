@@ -0,0 +1,465 @@
+"""
+Continuous batching for llama.cpp generations.
+
+The serial path runs one completion at a time on the LLM lane. The engine
+keeps up to ``slots`` generations in one llama.cpp context instead, each on
+its own KV sequence id, and advances them together. Every step is a single
+``llama_decode`` over the next token of each generating sequence, plus prompt
+chunks of newly admitted ones. Decoding is memory-bandwidth bound (the weights
+are read once per step however many sequences it holds), so a step over four
+sequences costs little more than a step over one.
+
+Requests join and leave at token boundaries: a finished or cancelled
+generation frees its slot for the next queued request on the following step.
+The static prompt prefix is prefilled once into a reserved sequence and
+copied (``seq_cp``) into each new sequence, like PrefixCache does for the
+serial path.
+"""
+
+import asyncio
+import codecs
+import functools
+import heapq
+import itertools
+import threading
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from backend import metrics
+from backend.scheduler import Overloaded, Priority
+from backend.telemetry import record_generation
+
+_DONE = object()
+
+
+def sample_token(logits, temperature, top_k, top_p, rng) -> int:
+    """Temperature / top-k / top-p sampling; greedy when ``temperature <= 0``."""
+    if temperature <= 0:
+        return int(np.argmax(logits))
+    scores = np.asarray(logits, dtype=np.float64) / temperature
+    if 0 < top_k < len(scores):
+        keep = np.argpartition(scores, -top_k)[-top_k:]
+    else:
+        keep = np.arange(len(scores))
+    probs = np.exp(scores[keep] - scores[keep].max())
+    probs /= probs.sum()
+    if top_p < 1.0:
+        order = np.argsort(-probs)
+        cutoff = int(np.searchsorted(np.cumsum(probs[order]), top_p)) + 1
+        order = order[:cutoff]
+        keep, probs = keep[order], probs[order] / probs[order].sum()
+    return int(keep[rng.choice(len(keep), p=probs)])
+
+
+def stop_prefix_len(text: str, stops: Sequence[str]) -> int:
+    """Length of the longest suffix of ``text`` that could begin a stop string."""
+    longest = 0
+    for stop in stops:
+        for k in range(min(len(stop) - 1, len(text)), longest, -1):
+            if text.endswith(stop[:k]):
+                longest = k
+                break
+    return longest
+
+
+class Generation:
+    """
+    One request in the engine. Exposes the same ``tokens()`` / ``cancel()``
+    interface as streaming.TokenStream, so sse_stream can consume either.
+    """
+
+    def __init__(
+        self,
+        prompt_tokens: List[int],
+        endpoint: str,
+        max_tokens: int,
+        stop: Sequence[str],
+        temperature: float,
+        top_k: int,
+        top_p: float,
+    ):
+        self.prompt_tokens = list(prompt_tokens)
+        self.endpoint = endpoint
+        self.max_tokens = max_tokens
+        self.stop = list(stop)
+        self.temperature = temperature
+        self.top_k = top_k
+        self.top_p = top_p
+        self.finish_reason = None
+        self.n_generated = 0
+        self.n_prefix = 0
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.first_token_at = None
+        self.finished_at = None
+        # Engine-thread state
+        self.slot = None
+        self.n_past = 0
+        self.pending = []
+        self.last_token = None
+        self.logit_index = None
+        self.advance = 0
+        self.buffer = ""
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._cancel = threading.Event()
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Stop at the next token boundary (or skip, if still queued)."""
+        self._cancel.set()
+
+    def _put(self, item):
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        except RuntimeError:  # event loop already closed
+            self._cancel.set()
+
+    async def tokens(self):
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.cancel()
+
+    async def text(self) -> str:
+        return "".join([t async for t in self.tokens()]).strip()
+
+
+class LlamaBatchBackend:
+    """
+    A multi-sequence llama.cpp context over an already loaded ``Llama``'s
+    model (the weights are shared, only the KV cache is new).
+    """
+
+    def __init__(self, llm, n_seq: int, n_ctx_per_seq: int = 2048, n_batch=512):
+        import llama_cpp
+
+        self.lib = llama_cpp
+        self.llm = llm
+        self.n_ctx_per_seq = n_ctx_per_seq
+        self.n_batch = n_batch
+        params = llama_cpp.llama_context_default_params()
+        params.n_ctx = n_ctx_per_seq * n_seq
+        params.n_batch = n_batch
+        params.n_seq_max = n_seq
+        params.n_threads = params.n_threads_batch = llm.n_threads
+        if hasattr(params, "kv_unified"):
+            params.kv_unified = True  # seq_cp of the shared prefix across sequences
+        new_context = getattr(llama_cpp, "llama_init_from_model", None)
+        if new_context is None:
+            new_context = llama_cpp.llama_new_context_with_model
+        self.ctx = new_context(llm.model, params)
+        if not self.ctx:
+            raise RuntimeError("Could not create the batched llama.cpp context")
+        self.batch = llama_cpp.llama_batch_init(n_batch, 0, 1)
+        self.n_vocab = llm.n_vocab()
+        self.eos = llm.token_eos()
+        self.seq_rm, self.seq_cp = self._kv_functions()
+
+    def _kv_functions(self):
+        # Renamed twice across llama.cpp versions
+        lib = self.lib
+        if hasattr(lib, "llama_memory_seq_rm"):
+            memory = lib.llama_get_memory(self.ctx)
+            return (
+                functools.partial(lib.llama_memory_seq_rm, memory),
+                functools.partial(lib.llama_memory_seq_cp, memory),
+            )
+        for prefix in ("llama_kv_self_", "llama_kv_cache_"):
+            if hasattr(lib, prefix + "seq_rm"):
+                return (
+                    functools.partial(getattr(lib, prefix + "seq_rm"), self.ctx),
+                    functools.partial(getattr(lib, prefix + "seq_cp"), self.ctx),
+                )
+        raise RuntimeError("llama-cpp-python without a KV sequence API")
+
+    def tokenize(self, text: str) -> List[int]:
+        return self.llm.tokenize(text.encode("utf-8"), special=True)
+
+    def detokenize(self, tokens) -> bytes:
+        return self.llm.detokenize(tokens)
+
+    def decode(self, entries):
+        """``entries``: (token, position, sequence id, wants logits) tuples."""
+        batch = self.batch
+        for i, (token, pos, seq, logits) in enumerate(entries):
+            batch.token[i] = token
+            batch.pos[i] = pos
+            batch.n_seq_id[i] = 1
+            batch.seq_id[i][0] = seq
+            batch.logits[i] = logits
+        batch.n_tokens = len(entries)
+        status = self.lib.llama_decode(self.ctx, batch)
+        if status != 0:
+            raise RuntimeError(f"llama_decode failed with status {status}")
+
+    def logits(self, index: int):
+        ptr = self.lib.llama_get_logits_ith(self.ctx, index)
+        return np.ctypeslib.as_array(ptr, shape=(self.n_vocab,))
+
+    def close(self):
+        self.lib.llama_batch_free(self.batch)
+        self.lib.llama_free(self.ctx)
+
+
+class GenerationEngine:
+    """
+    Continuous batching scheduler on its own thread.
+
+    Queued requests are admitted in priority order (chat before predict)
+    whenever a slot is free. Sequence id ``slots`` holds the cached prompt
+    prefix, so the backend needs ``slots + 1`` sequences.
+    """
+
+    def __init__(self, backend, slots: int = 4, max_queue: int = 64, seed=None):
+        self.backend = backend
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.prefix_seq = self.slots
+        self._prefix = []
+        self._free = list(range(self.slots))
+        self._pending = []
+        self._active = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        # Held for every admission + decode step; cache_prefix takes it too
+        self._step_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    @property
+    def queued(self) -> int:
+        return len(self._pending)
+
+    def cache_prefix(self, tokens: List[int]) -> int:
+        """Prefill ``tokens`` once; prompts starting with them skip that part."""
+        with self._step_lock:
+            self.backend.seq_rm(self.prefix_seq, -1, -1)
+            for start in range(0, len(tokens), self.backend.n_batch):
+                chunk = tokens[start : start + self.backend.n_batch]
+                self.backend.decode(
+                    [
+                        (token, start + i, self.prefix_seq, False)
+                        for i, token in enumerate(chunk)
+                    ]
+                )
+            self._prefix = list(tokens)
+        return len(tokens)
+
+    def submit(
+        self,
+        prompt_tokens: List[int],
+        endpoint: str = "predict",
+        priority: Priority = Priority.PREDICT,
+        max_tokens: int = 512,
+        stop: Sequence[str] = (),
+        temperature: float = 0.8,
+        top_k: int = 40,
+        top_p: float = 0.95,
+    ) -> Generation:
+        """
+        Queue a generation (call from the event loop) and return it; iterate
+        ``tokens()`` or await ``text()``. Raises Overloaded when the queue is
+        full.
+        """
+        generation = Generation(
+            prompt_tokens, endpoint, max_tokens, stop, temperature, top_k, top_p
+        )
+        with self._lock:
+            if len(self._pending) >= self.max_queue:
+                metrics.SCHEDULER_REJECTED.labels("llm", "429").inc()
+                raise Overloaded(429, "llm", 5)
+            heapq.heappush(
+                self._pending, (int(priority), next(self._counter), generation)
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="flora-llm-engine", daemon=True
+                )
+                self._thread.start()
+        metrics.SCHEDULER_QUEUE_DEPTH.labels("llm").set(len(self._pending))
+        self._wakeup.set()
+        return generation
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    # ---------------------------------------------------------- engine thread
+
+    def _run(self):
+        while not self._closed:
+            with self._step_lock:
+                try:
+                    self._admit()
+                    if self._active:
+                        self._step()
+                except Exception as e:
+                    # Fail the sequences in flight; keep serving the queue
+                    for generation in list(self._active):
+                        self._finish(generation, "error", e)
+            # A step can finish every sequence while requests are still queued
+            if not self._active and not self._pending:
+                self._wakeup.wait()
+                self._wakeup.clear()
+        for generation in list(self._active):
+            self._finish(generation, "cancelled")
+
+    def _admit(self):
+        admitted = []
+        with self._lock:
+            while self._free and self._pending:
+                _, _, generation = heapq.heappop(self._pending)
+                if generation.cancelled:
+                    generation._put(_DONE)
+                    continue
+                admitted.append((generation, self._free.pop()))
+        metrics.SCHEDULER_QUEUE_DEPTH.labels("llm").set(len(self._pending))
+        for generation, slot in admitted:
+            self._start(generation, slot)
+
+    def _start(self, generation, slot):
+        generation.slot = slot
+        generation.started_at = time.perf_counter()
+        self._active.append(generation)
+        tokens = generation.prompt_tokens
+        if not tokens or len(tokens) >= self.backend.n_ctx_per_seq:
+            self._finish(generation, "error", ValueError("Prompt too long or empty."))
+            return
+        self.backend.seq_rm(slot, -1, -1)
+        # Reuse the cached prefix KV, keeping at least one token to prefill
+        n_prefix = len(self._prefix)
+        if n_prefix and tokens[:n_prefix] == self._prefix:
+            n_prefix = min(n_prefix, len(tokens) - 1)
+            self.backend.seq_cp(self.prefix_seq, slot, 0, n_prefix)
+        else:
+            n_prefix = 0
+        generation.n_prefix = n_prefix
+        generation.n_past = n_prefix
+        generation.pending = tokens[n_prefix:]
+        metrics.PREFILL_TOKENS_SAVED.labels(generation.endpoint).observe(n_prefix)
+        metrics.LLM_ENGINE_ACTIVE.set(len(self._active))
+
+    def _step(self):
+        for generation in list(self._active):
+            if generation.cancelled:
+                self._finish(generation, "cancelled")
+        if not self._active:
+            return
+
+        # One token for every generating sequence, then prompt chunks
+        entries = []
+        for generation in self._active:
+            generation.logit_index = None
+            generation.advance = 0
+            if not generation.pending:
+                generation.logit_index = len(entries)
+                generation.advance = 1
+                entries.append(
+                    (generation.last_token, generation.n_past, generation.slot, True)
+                )
+        n_decode = len(entries)
+        for generation in self._active:
+            room = self.backend.n_batch - len(entries)
+            if not generation.pending or room <= 0:
+                continue
+            chunk = generation.pending[:room]
+            done = len(chunk) == len(generation.pending)
+            for i, token in enumerate(chunk):
+                last = done and i == len(chunk) - 1
+                entries.append((token, generation.n_past + i, generation.slot, last))
+            if done:
+                generation.logit_index = len(entries) - 1
+            generation.pending = generation.pending[len(chunk) :]
+            generation.advance = len(chunk)
+
+        self.backend.decode(entries)
+        metrics.LLM_ENGINE_TOKENS.labels("decode").inc(n_decode)
+        metrics.LLM_ENGINE_TOKENS.labels("prefill").inc(len(entries) - n_decode)
+
+        for generation in list(self._active):
+            generation.n_past += generation.advance
+            if generation.logit_index is not None:
+                token = sample_token(
+                    self.backend.logits(generation.logit_index),
+                    generation.temperature,
+                    generation.top_k,
+                    generation.top_p,
+                    self._rng,
+                )
+                self._accept(generation, token)
+
+    def _accept(self, generation, token):
+        if generation.first_token_at is None:
+            generation.first_token_at = time.perf_counter()
+        if token == self.backend.eos:
+            self._flush(generation, generation.buffer)
+            self._finish(generation, "stop")
+            return
+        generation.n_generated += 1
+        generation.last_token = token
+        piece = generation.decoder.decode(self.backend.detokenize([token]))
+        text = generation.buffer + piece
+
+        hits = [text.find(s) for s in generation.stop if s in text]
+        if hits:
+            self._flush(generation, text[: min(hits)])
+            self._finish(generation, "stop")
+            return
+        if (
+            generation.n_generated >= generation.max_tokens
+            or generation.n_past + 1 >= self.backend.n_ctx_per_seq
+        ):
+            self._flush(generation, text)
+            self._finish(generation, "length")
+            return
+        # Hold back text that may turn out to be the start of a stop string
+        held = stop_prefix_len(text, generation.stop)
+        self._flush(generation, text[: len(text) - held])
+        generation.buffer = text[len(text) - held :]
+
+    def _flush(self, generation, text):
+        generation.buffer = ""
+        if text:
+            generation._put(text)
+
+    def _finish(self, generation, reason, error: Optional[Exception] = None):
+        generation.finish_reason = reason
+        generation.finished_at = time.perf_counter()
+        if generation in self._active:
+            self._active.remove(generation)
+        self.backend.seq_rm(generation.slot, -1, -1)
+        with self._lock:
+            self._free.append(generation.slot)
+        metrics.LLM_ENGINE_ACTIVE.set(len(self._active))
+        if reason != "error":
+            record_generation(
+                generation.endpoint,
+                usage={
+                    "prompt_tokens": len(generation.prompt_tokens)
+                    - generation.n_prefix,
+                    "completion_tokens": generation.n_generated,
+                },
+                wall_s=generation.finished_at - generation.started_at,
+            )
+        generation._put(error if error is not None else _DONE)
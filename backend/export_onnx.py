@@ -1,13 +1,36 @@
 import os
+import argparse
 from optimum.onnxruntime import ORTModelForImageClassification
 from transformers import AutoImageProcessor
 from dotenv import load_dotenv
 
+from backend.preprocessing import ImagePreprocessor, export_fused_preprocessing
+from backend.quantization import quantize_cv_model
+
 load_dotenv()
 
 MODEL_DIR = os.getenv("MODEL_DIR", ".")
 CV_DIR = os.path.join(MODEL_DIR, "flora_cv_model")
 ONNX_DIR = os.path.join(MODEL_DIR, "flora_cv_onnx")
+INT8_DIR = os.path.join(MODEL_DIR, "flora_cv_onnx_int8")
+
+parser = argparse.ArgumentParser(description="Export the CV model to ONNX.")
+parser.add_argument(
+    "--fused-preprocessing",
+    action="store_true",
+    help="Also write model_with_preprocessing.onnx, which takes uint8 NHWC images",
+)
+parser.add_argument(
+    "--quantize",
+    choices=["dynamic", "static"],
+    help="Also write an INT8 copy to flora_cv_onnx_int8 with an accuracy report",
+)
+parser.add_argument(
+    "--dataset-dir",
+    default=os.getenv("PLANTVILLAGE_DIR", "PlantVillage/train"),
+    help="PlantVillage class folders used for calibration and the report",
+)
+args = parser.parse_args()
 
 print(f"Exporting model from {CV_DIR} to {ONNX_DIR}...")
 
@@ -19,4 +42,22 @@ processor = AutoImageProcessor.from_pretrained(CV_DIR)
 model.save_pretrained(ONNX_DIR)
 processor.save_pretrained(ONNX_DIR)
 
+if args.fused_preprocessing:
+    fused_path = export_fused_preprocessing(
+        os.path.join(ONNX_DIR, "model.onnx"),
+        os.path.join(ONNX_DIR, "model_with_preprocessing.onnx"),
+        ImagePreprocessor.from_processor(processor),
+    )
+    print(f"Fused preprocessing graph saved to {fused_path}")
+
 print("Export complete! ONNX model saved.")
+
+if args.quantize:
+    print(f"Quantizing ({args.quantize}) into {INT8_DIR}...")
+    report = quantize_cv_model(ONNX_DIR, INT8_DIR, args.dataset_dir, args.quantize)
+    print(
+        f"Top-1 {report['fp32']['top1']:.4f} -> {report['int8']['top1']:.4f}, "
+        f"p50 {report['fp32']['latency_ms_p50']}ms -> "
+        f"{report['int8']['latency_ms_p50']}ms, "
+        f"size {report['fp32']['size_mb']}MB -> {report['int8']['size_mb']}MB"
+    )
@@ -28,6 +28,8 @@ from langchain.vectorstores import Chroma
 from langchain_community.retrievers import BM25Retriever
 from langchain.retrievers import EnsembleRetriever
 
+from backend.retrieval import RetrievalTable
+
 DATA_PATH = "data/dataset_json"
 DB_OUTPUT_PATH = "flora_rag_db"
 CHUNK_SIZE = 800
@@ -118,6 +120,20 @@ def build_vector_store(chunks: List[Document], output_path: str):
     return vectordb
 
 
+def build_retrieval_table(vectordb, chunks: List[Document], output_path: str):
+    """
+    Step 3b: Precompute the /predict query for every disease class so the API
+    can skip query embedding and vector search. The API checks the stored index
+    fingerprint and rebuilds the table itself if the database changes again.
+    """
+    labels = sorted({c.metadata.get("disease", "unknown") for c in chunks})
+    print(f"📋 Building retrieval table for {len(labels)} classes...")
+    table = RetrievalTable(output_path)
+    table.build(vectordb, labels)
+    table.save()
+    print(f"   -> Saved to {table.path}")
+
+
 def verify_pipeline(vectordb, chunks):
     """
     Step 4: Verify Hybrid Search capability (Sanity Check).
@@ -156,6 +172,7 @@ if __name__ == "__main__":
     if raw_docs:
         doc_chunks = split_documents(raw_docs)
         vdb = build_vector_store(doc_chunks, DB_OUTPUT_PATH)
+        build_retrieval_table(vdb, doc_chunks, DB_OUTPUT_PATH)
         verify_pipeline(vdb, doc_chunks)
     else:
         print("Pipeline aborted: No documents found.")
@@ -0,0 +1,191 @@
+import asyncio
+import itertools
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+
+from backend import metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class Job:
+    """
+    One background unit of work. ``partial`` can be updated by the job while
+    it runs (e.g. the explanation generated so far) so pollers see progress.
+    """
+
+    def __init__(self, job_id: str, run, meta: dict, clock):
+        self.id = job_id
+        self.run = run
+        self.meta = meta
+        self.status = QUEUED
+        self.partial = ""
+        self.result = None
+        self.error = None
+        self.created_at = clock()
+        self.finished_at = None
+        self._task = None
+        self._cancelled = False
+        self._done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    async def wait(self, timeout: float):
+        """Wait up to ``timeout`` seconds for the job to finish."""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def as_dict(self):
+        body = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            **self.meta,
+        }
+        if self.status == DONE:
+            body["result"] = self.result
+        elif self.status == RUNNING:
+            body["partial"] = self.partial
+        elif self.status == FAILED:
+            body["error"] = self.error
+        return body
+
+
+JobFn = Callable[[Job], Awaitable[Any]]
+
+
+class JobStore:
+    """
+    Bounded in-memory job queue drained by a fixed set of worker tasks.
+
+    Finished jobs are kept for ``ttl`` seconds so clients can fetch the
+    result, then dropped. When ``maxsize`` jobs are stored, the oldest finished
+    one is evicted; if every stored job is still queued or running, new
+    submissions get a 429. Cancelling a running job cancels its task, which
+    cancels whatever it is awaiting (e.g. a token stream).
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 3600.0,
+        workers: int = 2,
+        clock=time.time,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.workers = max(1, workers)
+        self.clock = clock
+        self._jobs = OrderedDict()
+        self._ids = itertools.count()
+        self._loop = None
+        self._queue = None
+        self._workers = []
+
+    def _ensure_workers(self):
+        # Bind to whichever loop is running (see MicroBatcher._ensure_worker)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._workers = [
+                loop.create_task(self._work()) for _ in range(self.workers)
+            ]
+
+    def _expire(self):
+        now = self.clock()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - job.finished_at > self.ttl:
+                del self._jobs[job_id]
+
+    def _make_room(self):
+        self._expire()
+        if len(self._jobs) < self.maxsize:
+            return
+        for job_id, job in self._jobs.items():
+            if job.finished:
+                del self._jobs[job_id]
+                return
+        raise HTTPException(
+            429,
+            "Too many explanation jobs in progress, retry later.",
+            headers={"Retry-After": "5"},
+        )
+
+    def _new_job(self, run, meta):
+        self._make_room()
+        job_id = f"{next(self._ids):x}{secrets.token_hex(8)}"
+        job = Job(job_id, run, meta, self.clock)
+        self._jobs[job_id] = job
+        return job
+
+    def submit(self, run: JobFn, **meta) -> Job:
+        """Queue ``await run(job)``; its return value becomes the job result."""
+        self._ensure_workers()
+        job = self._new_job(run, meta)
+        self._queue.put_nowait(job)
+        metrics.JOBS.labels(QUEUED).inc()
+        return job
+
+    def completed(self, result, **meta) -> Job:
+        """Store an already-finished job (e.g. the answer was cached)."""
+        job = self._new_job(None, meta)
+        self._finish(job, DONE, result=result)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        if job._task is not None:
+            job._cancelled = True
+            job._task.cancel()  # the worker records the cancellation
+        else:
+            self._finish(job, CANCELLED)  # still queued: the worker skips it
+        return job
+
+    def _finish(self, job, status, result=None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = self.clock()
+        job._done.set()
+        metrics.JOBS.labels(status).inc()
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            if job.finished:
+                continue
+            job.status = RUNNING
+            job._task = asyncio.ensure_future(job.run(job))
+            try:
+                result = await asyncio.shield(job._task)
+                self._finish(job, DONE, result=result)
+            except asyncio.CancelledError:
+                if not job._cancelled:
+                    job._task.cancel()  # the worker itself is shutting down
+                    raise
+                self._finish(job, CANCELLED)
+            except Exception as e:
+                self._finish(job, FAILED, error=str(e))
+            finally:
+                job._task = None
@@ -0,0 +1,73 @@
+"""
+Live camera diagnosis over a WebSocket (/ws/stream).
+
+A phone sends JPEG frames faster than they can be classified, so each
+connection keeps only the newest unprocessed frame: frames that arrive while
+one is being classified replace each other, and the stale ones are dropped.
+The class is reported once it is stable, i.e. the last few frames agree on
+it with enough confidence. A jittery camera therefore produces one diagnosis,
+and one explanation, instead of one per frame.
+"""
+
+import asyncio
+from collections import deque
+
+from backend import metrics
+
+
+class LatestFrame:
+    """
+    Single-slot mailbox: ``put`` replaces any frame not taken yet (latest
+    frame wins) and ``get`` waits for the next one. ``get`` returns None once
+    the mailbox is closed and empty.
+    """
+
+    def __init__(self):
+        self._frame = None
+        self._closed = False
+        self._ready = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, frame):
+        if self._frame is not None:
+            self.dropped += 1
+            metrics.STREAM_FRAMES.labels("dropped").inc()
+        self._frame = frame
+        self._ready.set()
+
+    def close(self):
+        self._closed = True
+        self._ready.set()
+
+    async def get(self):
+        while self._frame is None and not self._closed:
+            self._ready.clear()
+            await self._ready.wait()
+        frame, self._frame = self._frame, None
+        return frame
+
+
+class StabilityTracker:
+    """
+    Decides when the predicted class of a frame sequence is stable: the last
+    ``frames`` predictions name the same class, each with at least
+    ``min_confidence``. ``update`` returns the class when it becomes the
+    stable one, and None otherwise (including while it stays stable).
+    """
+
+    def __init__(self, frames: int = 3, min_confidence: float = 0.6):
+        self.frames = frames
+        self.min_confidence = min_confidence
+        self.stable = None
+        self._recent = deque(maxlen=frames)
+
+    def update(self, diagnosis, confidence):
+        self._recent.append(diagnosis if confidence >= self.min_confidence else None)
+        if (
+            diagnosis != self.stable
+            and diagnosis is not None
+            and self._recent.count(diagnosis) == self.frames
+        ):
+            self.stable = diagnosis
+            return diagnosis
+        return None
@@ -0,0 +1,167 @@
+"""
+LLM worker process for the split deployment.
+
+    python -m backend.llm_worker --socket-dir /run/flora
+
+Loads the GGUF like the in-process "llm" component (prefix cache, optional
+speculative decoding or continuous batching, all configured by the same
+environment variables) and serves generations to API processes started with
+``LLM_WORKERS`` over a Unix socket (see backend/remote_llm.py). Requests
+queue on the worker's own LLM lane, chat before predict, and are shed with a
+429 when it is full. Run more workers to scale generation independently of
+the API.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+
+from backend import app, remote_llm
+from backend.streaming import TokenStream
+from backend.telemetry import read_llm_perf, record_generation
+
+
+def start_generation(request):
+    """
+    Start ``request`` on the LLM lane. Returns the token stream and a dict
+    that holds the llama.cpp state afterwards when the request asked for it.
+    """
+    prompt, endpoint = request["prompt"], request["endpoint"]
+    priority = app.Priority(request["priority"])
+    if "engine" in app.sys_comps:
+        return app.engine_generation(prompt, endpoint, priority), {}
+
+    llm = app.sys_comps["llm"]
+    state = request.get("state")
+    carry = {}
+
+    def prepare():
+        if state is None:
+            app.restore_prefix(prompt, endpoint)
+        else:
+            app.restore_session(SimpleNamespace(state=state), prompt)
+
+    def finish():
+        record_generation(endpoint, read_llm_perf(llm))
+        if request.get("want_state"):
+            carry["state"] = llm.save_state()
+
+    stream = TokenStream(
+        llm,
+        prompt,
+        prepare=prepare,
+        finish=finish,
+        max_tokens=app.MAX_NEW_TOKENS,
+        stop=app.STOP_SEQUENCES,
+    ).start(lambda fn: app.scheduler.submit("llm", fn, priority=priority))
+    return stream, carry
+
+
+async def reply(writer, message, **kwargs):
+    try:
+        return await remote_llm.send(writer, message, **kwargs)
+    except ConnectionError:
+        return None  # the API process went away
+
+
+async def discard_unread(reader, segment, timeout=30.0):
+    """
+    Remove ``segment`` once the API has closed the connection. It has read
+    the reply by then, or never will (its request was cancelled first).
+    """
+    if segment is None:
+        return
+    try:
+        await asyncio.wait_for(reader.read(), timeout)
+    except (ConnectionError, asyncio.TimeoutError):
+        pass
+    remote_llm.discard(segment)
+
+
+async def handle(reader, writer):
+    stream = None
+    try:
+        request = await remote_llm.recv(reader)
+        if request.get("op") == "ping":
+            await reply(writer, {"ok": True, "pid": os.getpid()})
+            return
+        stream, carry = start_generation(request)
+        async for text in stream.tokens():
+            await remote_llm.send(writer, {"token": text})
+        segment = await reply(
+            writer,
+            {"done": True, "state": carry.get("state")},
+            shm_dir=app.IPC_SHM_DIR if os.path.isdir(app.IPC_SHM_DIR) else None,
+            min_bytes=app.IPC_SHM_MIN_KB * 1024,
+        )
+        await discard_unread(reader, segment)
+    except HTTPException as e:
+        message = {"error": e.detail, "status": e.status_code}
+        message["retry_after"] = getattr(e, "retry_after", None)
+        await reply(writer, message)
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    except Exception as e:
+        await reply(writer, {"error": str(e), "status": 500})
+    finally:
+        if stream is not None:
+            stream.cancel()  # frees the LLM if the API process went away
+        writer.close()
+
+
+async def serve(path):
+    if os.path.exists(path):
+        os.unlink(path)  # left behind by a previous run
+    server = await asyncio.start_unix_server(handle, path=path)
+    os.chmod(path, 0o660)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    print(f"🚀 LLM worker {os.getpid()} serving on {path}")
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        os.unlink(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--socket", help="Unix socket path to listen on")
+    target.add_argument(
+        "--socket-dir", help="Listen on <dir>/llm-<host>-<pid>.sock (for replicas)"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=int(os.getenv("LLM_WORKER_METRICS_PORT", "0")),
+        help="Expose Prometheus metrics on this port (0 = off)",
+    )
+    args = parser.parse_args(argv)
+
+    path = args.socket or os.path.join(
+        args.socket_dir, f"llm-{socket.gethostname()}-{os.getpid()}.sock"
+    )
+    app.LLM_WORKERS = ""  # this process is the worker
+    if os.path.isdir(app.IPC_SHM_DIR):
+        remote_llm.sweep_segments(app.IPC_SHM_DIR)
+    app.load_llm()
+    app.warm_llm()
+    if args.metrics_port:
+        from prometheus_client import start_http_server
+
+        start_http_server(args.metrics_port)
+    asyncio.run(serve(path))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Prometheus metrics for the inference path.
+
+Everything here registers on the default ``prometheus_client`` registry, which
+is what the instrumentator in ``app.py`` already exposes on ``/metrics``.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+BATCH_SIZE = Histogram(
+    "flora_batch_size",
+    "Number of items run together in one batched forward pass.",
+    ["batcher"],
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+BATCH_QUEUE_WAIT = Histogram(
+    "flora_batch_queue_wait_seconds",
+    "Time an item waited in the micro-batch queue before its batch started.",
+    ["batcher"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+SCHEDULER_QUEUE_DEPTH = Gauge(
+    "flora_scheduler_queue_depth",
+    "Jobs waiting in a scheduler lane (not yet running).",
+    ["lane"],
+)
+
+SCHEDULER_ESTIMATED_WAIT = Gauge(
+    "flora_scheduler_estimated_wait_seconds",
+    "Estimated time a newly admitted job would wait before it starts.",
+    ["lane"],
+)
+
+SCHEDULER_REJECTED = Counter(
+    "flora_scheduler_rejected_total",
+    "Jobs shed by admission control, by lane and HTTP status.",
+    ["lane", "status"],
+)
+
+EXPLANATION_CACHE_REQUESTS = Counter(
+    "flora_explanation_cache_requests_total",
+    "Explanation cache lookups by outcome (hit, miss, coalesced).",
+    ["result"],
+)
+
+PREDICTION_CACHE_REQUESTS = Counter(
+    "flora_prediction_cache_requests_total",
+    "Upload cache lookups by outcome (exact_hit, perceptual_hit, miss).",
+    ["result"],
+)
+
+SEMANTIC_CACHE_REQUESTS = Counter(
+    "flora_semantic_cache_requests_total",
+    "/chat semantic answer cache lookups by outcome (hit, miss).",
+    ["result"],
+)
+
+SEMANTIC_CACHE_SIMILARITY = Histogram(
+    "flora_semantic_cache_similarity",
+    "Cosine similarity of the closest cached question for the same diagnosis.",
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.92, 0.94, 0.96, 0.98, 1.0),
+)
+
+STREAM_FRAMES = Counter(
+    "flora_stream_frames_total",
+    "/ws/stream camera frames by outcome (classified, dropped, failed).",
+    ["result"],
+)
+
+STREAM_CONNECTIONS = Gauge(
+    "flora_stream_connections",
+    "Open /ws/stream connections.",
+)
+
+PREFILL_TOKENS_SAVED = Histogram(
+    "flora_llm_prefill_tokens_saved",
+    "Prompt tokens per request served from a cached prefix KV state.",
+    ["endpoint"],
+    buckets=(0, 50, 100, 200, 300, 400, 600, 800),
+)
+
+COMPONENT_READY = Gauge(
+    "flora_component_ready",
+    "1 once a model/store component is loaded and warmed up, else 0.",
+    ["component"],
+)
+
+COMPONENT_LOAD_SECONDS = Gauge(
+    "flora_component_load_seconds",
+    "Wall time a component took to load and warm up at startup.",
+    ["component"],
+)
+
+INFERENCE_STAGE = Histogram(
+    "flora_inference_stage_seconds",
+    "Time spent in one stage of the inference path (work only, no queueing).",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+LLM_TOKENS_PER_SECOND = Gauge(
+    "flora_llm_tokens_per_second",
+    "Throughput of the most recent generation, by phase (prefill, decode).",
+    ["phase"],
+)
+
+LLM_PROMPT_TOKENS = Gauge(
+    "flora_llm_prompt_tokens",
+    "Prompt tokens evaluated by the most recent generation (after prefix reuse).",
+    ["endpoint"],
+)
+
+LLM_COMPLETION_TOKENS = Gauge(
+    "flora_llm_completion_tokens",
+    "Tokens generated by the most recent generation.",
+    ["endpoint"],
+)
+
+RESIDENT_MEMORY = Gauge(
+    "flora_resident_memory_bytes",
+    "Resident memory: whole process, the resident part of the mmapped GGUF "
+    "weights, and per component the approximate process RSS growth while it "
+    "loaded (components load concurrently, so it includes memory allocated "
+    "by other loads at the same time).",
+    ["component"],
+)
+
+JOBS = Counter(
+    "flora_explanation_jobs_total",
+    "Background explanation jobs by state transition "
+    "(queued, done, failed, cancelled).",
+    ["status"],
+)
+
+SESSIONS = Gauge(
+    "flora_chat_sessions",
+    "Chat sessions currently stored.",
+)
+
+SESSION_STATE_BYTES = Gauge(
+    "flora_chat_session_state_bytes",
+    "Bytes of llama.cpp state retained by chat sessions.",
+)
+
+SESSION_STATE_EVICTIONS = Counter(
+    "flora_chat_session_state_evictions_total",
+    "Session states dropped to stay within SESSION_MEMORY_MB.",
+)
+
+SESSION_TURNS = Counter(
+    "flora_chat_session_turns_total",
+    "Chat turns by how the prompt was prepared (continued from the session's "
+    "state, or prefilled from the transcript).",
+    ["result"],
+)
+
+LLM_ENGINE_TOKENS = Counter(
+    "flora_llm_engine_tokens_total",
+    "Tokens evaluated by the continuous batching engine, by phase (prefill, "
+    "decode). rate() of the decode series is the aggregate generation speed.",
+    ["phase"],
+)
+
+LLM_ENGINE_ACTIVE = Gauge(
+    "flora_llm_engine_active_sequences",
+    "Generations currently interleaved in the batching engine's context.",
+)
+
+LLM_REMOTE_REQUESTS = Counter(
+    "flora_llm_remote_requests_total",
+    "Generations sent to LLM worker processes, by result (ok, error, unavailable).",
+    ["result"],
+)
+
+IPC_SHARED_BYTES = Counter(
+    "flora_ipc_shared_memory_bytes_total",
+    "Payload bytes handed between processes through shared memory instead "
+    "of the socket.",
+)
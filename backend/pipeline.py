@@ -63,6 +63,8 @@ from langchain.vectorstores import Chroma
 from langchain.retrievers import EnsembleRetriever
 from langchain_community.retrievers import BM25Retriever
 
+from backend.preprocessing import BILINEAR, ImagePreprocessor
+
 CV_MODEL_CHECKPOINT = "microsoft/swin-tiny-patch4-window7-224"
 DATASET_PATH = "PlantVillage/train"
 JSON_FOLDER_PATH = "ragdatazip/dataset_json"
@@ -125,7 +127,14 @@ def train_cv_model():
             normalize,
         ]
     )
-    _val_transforms = Compose([Resize(size), CenterCrop(size), ToTensor(), normalize])
+    # Same maths as Compose([Resize(size), CenterCrop(size), ToTensor(), normalize])
+    # but with JPEG draft decoding and one vectorized normalize per batch
+    _val_preprocessor = ImagePreprocessor(
+        size=size,
+        mean=image_processor.image_mean,
+        std=image_processor.image_std,
+        resample=BILINEAR,
+    )
 
     def transform_train(example):
         example["pixel_values"] = [
@@ -135,9 +144,8 @@ def train_cv_model():
         return example
 
     def transform_val(example):
-        example["pixel_values"] = [
-            _val_transforms(Image.open(x).convert("RGB")) for x in example["image"]
-        ]
+        pixel_values = _val_preprocessor([Image.open(x) for x in example["image"]])
+        example["pixel_values"] = list(torch.from_numpy(pixel_values))
         example["label"] = [label2id[y] for y in example["label"]]
         return example
 
@@ -0,0 +1,54 @@
+def prompt_tokens(llm, text):
+    """The tokens llama-cpp-python evaluates for completion prompt ``text``."""
+    return llm.tokenize(text.encode("utf-8"), special=True)
+
+
+def common_prefix_len(a, b) -> int:
+    """How many leading tokens ``a`` and ``b`` share."""
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class PrefixCache:
+    """
+    llama.cpp state snapshots taken right after evaluating each static prompt
+    prefix (system line + few-shot examples).
+
+    Restoring a snapshot before a call leaves only the variable part of the
+    prompt (context and question) to prefill: llama-cpp-python skips every
+    prompt token that matches the tokens already in the context.
+    """
+
+    def __init__(self, llm):
+        self.llm = llm
+        self._snapshots = {}  # template name -> (prefix tokens, LlamaState)
+
+    def _tokenize(self, text):
+        return prompt_tokens(self.llm, text)
+
+    def warm(self, template):
+        """Evaluate ``template.prefix`` once and keep its KV state."""
+        tokens = self._tokenize(template.prefix)
+        self.llm.reset()
+        self.llm.eval(tokens)
+        self._snapshots[template.name] = (tokens, self.llm.save_state())
+        return len(tokens)
+
+    def restore(self, template, prompt) -> int:
+        """
+        Load the snapshot for ``template`` if ``prompt`` starts with its
+        prefix tokens. Returns the number of prefill tokens saved (0 on a miss).
+        """
+        snapshot = self._snapshots.get(template.name)
+        if snapshot is None:
+            return 0
+        tokens, state = snapshot
+        # A prefix ending mid-word can merge with the next token; don't reuse then
+        if self._tokenize(prompt)[: len(tokens)] != tokens:
+            return 0
+        self.llm.load_state(state)
+        return len(tokens)
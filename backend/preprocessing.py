@@ -0,0 +1,194 @@
+"""
+Fast image preprocessing for the Swin classifier.
+
+Replaces the generic ``AutoImageProcessor(..., return_tensors="pt")`` call on
+the serving path (and torchvision's ``_val_transforms`` in pipeline.py):
+
+1. JPEG draft mode: libjpeg decodes 12MP phone photos straight at 1/2, 1/4 or
+   1/8 scale, so we never materialise the full-resolution bitmap.
+2. One resize to the model resolution with PIL's C resampler (the same
+   resampler the HF processor uses, so outputs match).
+3. Crop + rescale + normalize as a single NumPy multiply-add per channel,
+   written into a preallocated NCHW float32 batch buffer that is reused
+   between calls.
+"""
+
+import io
+import json
+import os
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+BICUBIC = 3
+BILINEAR = 2
+
+
+class ImagePreprocessor:
+    """
+    ``load`` turns raw bytes (or a PIL image) into a resized RGB image and is
+    safe to run on many threads at once. ``batch`` packs loaded images into the
+    model's ``pixel_values`` layout.
+    """
+
+    def __init__(
+        self,
+        size=(224, 224),
+        mean=(0.485, 0.456, 0.406),
+        std=(0.229, 0.224, 0.225),
+        resample: int = BICUBIC,
+        rescale_factor: float = 1 / 255,
+        shortest_edge: int = None,
+        draft: bool = True,
+    ):
+        self.size = tuple(size)  # (height, width) fed to the model
+        self.resample = int(resample)
+        self.shortest_edge = shortest_edge
+        self.draft = draft
+        mean = np.asarray(mean, dtype=np.float64)
+        std = np.asarray(std, dtype=np.float64)
+        # (x * rescale - mean) / std  ==  x * scale + bias
+        self.scale = (rescale_factor / std).astype(np.float32)[:, None, None]
+        self.bias = (-mean / std).astype(np.float32)[:, None, None]
+        self._local = threading.local()
+
+    @classmethod
+    def from_processor(cls, processor, **kwargs):
+        """Mirror the settings of a Hugging Face image processor."""
+        size = processor.size
+        crop = getattr(processor, "crop_size", None)
+        shortest_edge = None
+        if isinstance(size, int):
+            size = (size, size)
+        elif "height" in size:
+            size = (size["height"], size["width"])
+        else:
+            shortest_edge = size["shortest_edge"]
+            if crop and getattr(processor, "do_center_crop", False):
+                size = (crop["height"], crop["width"])
+            else:
+                size = (shortest_edge, shortest_edge)
+        return cls(
+            size=size,
+            mean=processor.image_mean,
+            std=processor.image_std,
+            resample=int(getattr(processor, "resample", BICUBIC)),
+            rescale_factor=getattr(processor, "rescale_factor", 1 / 255),
+            shortest_edge=shortest_edge,
+            **kwargs,
+        )
+
+    @classmethod
+    def from_pretrained(cls, model_dir, **kwargs):
+        """
+        Read ``preprocessor_config.json`` directly, so serving does not need
+        transformers to build the preprocessor.
+        """
+        with open(os.path.join(model_dir, "preprocessor_config.json")) as f:
+            config = json.load(f)
+        return cls.from_processor(SimpleNamespace(**config), **kwargs)
+
+    def _resize_target(self, width, height):
+        if self.shortest_edge is None:
+            return self.size[1], self.size[0]
+        ratio = self.shortest_edge / min(width, height)
+        return max(1, round(width * ratio)), max(1, round(height * ratio))
+
+    def load(self, data):
+        """Decode (with JPEG draft downscaling) and resize one image."""
+        img = data if isinstance(data, Image.Image) else Image.open(io.BytesIO(data))
+        target = self._resize_target(*img.size)
+        if self.draft and img.format == "JPEG":
+            # Keep at least 2x the target so the final resample still filters
+            img.draft("RGB", (target[0] * 2, target[1] * 2))
+        img = img.convert("RGB")
+        if img.size != target:
+            img = img.resize(target, self.resample)
+        return img
+
+    def _buffer(self, n):
+        buf = getattr(self._local, "buf", None)
+        if buf is None or buf.shape[0] < n:
+            buf = np.empty((n, 3) + self.size, dtype=np.float32)
+            self._local.buf = buf
+        return buf[:n]
+
+    def batch(self, images, out=None):
+        """
+        Normalize loaded images into an (N, 3, H, W) float32 array.
+
+        Without ``out`` the result is a view of a per-thread buffer that the
+        next call on the same thread overwrites; pass ``out`` (or copy) to keep it.
+        """
+        out = self._buffer(len(images)) if out is None else out
+        height, width = self.size
+        for i, img in enumerate(images):
+            pixels = np.asarray(img if isinstance(img, np.ndarray) else self.load(img))
+            top = (pixels.shape[0] - height) // 2
+            left = (pixels.shape[1] - width) // 2
+            chw = pixels[top : top + height, left : left + width].transpose(2, 0, 1)
+            np.multiply(chw, self.scale, out=out[i])
+            out[i] += self.bias
+        return out
+
+    def __call__(self, images):
+        """Bytes or PIL images in, a fresh ``pixel_values`` array out."""
+        return self.batch([self.load(img) for img in images]).copy()
+
+
+def export_fused_preprocessing(model_path, output_path, preprocessor, opset=18):
+    """
+    Write a variant of an exported classifier that takes raw ``uint8`` NHWC
+    images of any size and does resize + normalize inside the ONNX graph, so
+    clients without NumPy/PIL (or edge runtimes) can feed decoded frames.
+    """
+    import onnx
+    from onnx import TensorProto, compose, helper, numpy_helper, version_converter
+
+    height, width = preprocessor.size
+    nodes = [
+        helper.make_node("Cast", ["image"], ["image_f"], to=TensorProto.FLOAT),
+        helper.make_node("Transpose", ["image_f"], ["nchw"], perm=[0, 3, 1, 2]),
+        helper.make_node(
+            "Resize",
+            ["nchw", "", "", "target_hw"],
+            ["resized"],
+            mode="cubic" if preprocessor.resample == BICUBIC else "linear",
+            cubic_coeff_a=-0.5,  # PIL's bicubic kernel
+            antialias=1,
+            axes=[2, 3],
+        ),
+        helper.make_node("Mul", ["resized", "scale"], ["scaled"]),
+        helper.make_node("Add", ["scaled", "bias"], ["pixel_values"]),
+    ]
+    initializers = [
+        numpy_helper.from_array(np.array([height, width], dtype=np.int64), "target_hw"),
+        numpy_helper.from_array(preprocessor.scale[None], "scale"),
+        numpy_helper.from_array(preprocessor.bias[None], "bias"),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "flora_preprocessing",
+        [
+            helper.make_tensor_value_info(
+                "image", TensorProto.UINT8, ["batch_size", "height", "width", 3]
+            )
+        ],
+        [
+            helper.make_tensor_value_info(
+                "pixel_values", TensorProto.FLOAT, ["batch_size", 3, height, width]
+            )
+        ],
+        initializers,
+    )
+    pre = helper.make_model(graph, opset_imports=[helper.make_opsetid("", opset)])
+
+    model = onnx.load(model_path)
+    model = version_converter.convert_version(model, opset)
+    pre.ir_version = model.ir_version
+    fused = compose.merge_models(pre, model, io_map=[("pixel_values", "pixel_values")])
+    onnx.checker.check_model(fused)
+    onnx.save(fused, output_path)
+    return output_path
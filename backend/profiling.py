@@ -0,0 +1,126 @@
+"""
+On-demand profiling of the live process (``POST /admin/profile``).
+
+A sampler thread reads every thread's stack with ``sys._current_frames()``
+at a fixed interval and counts identical stacks, in the collapsed format
+flamegraph.pl and speedscope read (``thread;outer;...;inner count``).
+tracemalloc runs for the same window, and the allocations still alive at the
+end are reported by source line.
+
+Nothing is installed while no profile is running: the sampler thread and
+tracemalloc exist only for the requested window.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# Profiles are mutually exclusive: two samplers would skew each other
+_active = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    # ";" separates frames in the collapsed format
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """Counts the stacks of all other threads every ``interval`` seconds."""
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+def top_allocations(snapshot, limit: int = 25):
+    """The source lines holding the most traced memory."""
+    snapshot = snapshot.filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+    )
+    return [
+        {
+            "file": stat.traceback[0].filename,
+            "line": stat.traceback[0].lineno,
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+async def profile(seconds: float, interval: float = 0.005, top: int = 25):
+    """
+    Sample stacks and trace allocations for ``seconds`` without blocking the
+    event loop. Raises ProfilerBusy if another profile is running.
+    """
+    if not _active.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    own_tracemalloc = not tracemalloc.is_tracing()
+    try:
+        if own_tracemalloc:
+            tracemalloc.start()
+        sampler = StackSampler(interval).start()
+        started = time.perf_counter()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        return {
+            "seconds": round(time.perf_counter() - started, 3),
+            "interval_s": interval,
+            "samples": sampler.samples,
+            "collapsed": sampler.collapsed(),
+            "allocations": top_allocations(snapshot, top),
+        }
+    finally:
+        if own_tracemalloc:
+            tracemalloc.stop()
+        _active.release()
@@ -0,0 +1,146 @@
+"""
+Prompt templates shared by the API (backend/app.py) and the prompt-engineering
+experiments (experiments/prompts/*). Keeping them in one registry means the
+served prompt and the one we evaluate cannot drift apart.
+
+Every template is split into a static ``prefix`` and a ``body`` with the
+per-request fields, so the server can pre-evaluate the prefix once and reuse
+its llama.cpp KV state (see backend/prefix_cache.py).
+"""
+
+# (context class, question, answer) few-shot examples
+EXAMPLES = [
+    (
+        "Apple___Apple_scab",
+        "My apple tree leaves have olive-green spots. What should I do?",
+        "This is Apple Scab. Remove fallen leaves to reduce spores and apply fungicides like captan early in the season.",
+    ),
+    (
+        "Tomato___Early_blight",
+        "I see dark rings on my tomato leaves. How do I fix it?",
+        "This is Tomato Early Blight. Improve air circulation, avoid overhead watering, and apply copper-based fungicides.",
+    ),
+    (
+        "Corn_(maize)___healthy",
+        "My corn looks green and tall. Is it okay?",
+        "Yes, your corn plant appears healthy. No treatment is needed.",
+    ),
+]
+
+META_SYSTEM_INSTRUCTION = """
+ROLE: You are Dr. Flora, an expert Plant Pathologist with 20 years of experience in agricultural diagnostics.
+
+OBJECTIVE: Provide accurate, helpful, and concise advice to farmers and gardeners about plant diseases.
+
+RULES:
+1. Identify the disease clearly based on the provided context.
+2. Provide actionable treatment or prevention steps.
+3. Use a professional but encouraging tone.
+4. If the plant is healthy, reassure the user.
+5. Do not hallucinate treatments; stick to standard agricultural practices (fungicides, sanitation, resistant varieties).
+
+OUTPUT FORMAT:
+- Diagnosis: [Disease Name]
+- Advice: [Actionable Steps]
+"""
+
+
+def format_examples(n: int) -> str:
+    """The first ``n`` few-shot examples, in the layout used by every prompt."""
+    blocks = [
+        f"Example {i}:\nContext: {context}\nQuestion: {question}\nAnswer: {answer}\n"
+        for i, (context, question, answer) in enumerate(EXAMPLES[:n], start=1)
+    ]
+    return "\n" + "\n".join(blocks)
+
+
+class PromptTemplate:
+    """
+    A static prefix followed by a ``str.format`` body. Chat templates also
+    have a ``turn`` appended after each answer to ask a follow-up question.
+    """
+
+    def __init__(self, name, version, prefix, body, stop=(), turn=None):
+        self.name = name
+        self.version = version
+        self.prefix = prefix
+        self.body = body
+        self.stop = list(stop)
+        self.turn = turn
+
+    def render(self, **fields) -> str:
+        return self.prefix + self.body.format(**fields)
+
+    def render_conversation(self, context, turns, question) -> str:
+        """
+        ``turns`` is the ``(question, answer)`` history: the first question
+        goes in the body, later ones in ``turn``. Each turn only appends to
+        the previous prompt, so llama.cpp state from earlier turns is reusable.
+        """
+        if not turns:
+            return self.render(context=context, question=question)
+        (first_question, first_answer), *rest = turns
+        parts = [self.render(context=context, question=first_question), first_answer]
+        for q, a in rest:
+            parts += [self.turn.format(question=q), a]
+        parts.append(self.turn.format(question=question))
+        return "".join(parts)
+
+
+PROMPTS = {
+    t.name: t
+    for t in [
+        # Served by /predict and /chat (Winner of M2_D1 Experiments)
+        PromptTemplate(
+            "flora_few_shot",
+            "few-shot-v1",
+            "<|system|>\nYou are a plant disease expert. Answer the question based on the context.\n"
+            + format_examples(2)
+            + "\n<|user|>\n",
+            "Context: {context}\nQuestion: {question}\n<|assistant|>\n",
+            stop=["<|user|>", "<|system|>"],
+            turn="\n<|user|>\nQuestion: {question}\n<|assistant|>\n",
+        ),
+        # Prompt-engineering strategies evaluated by experiments/run_eval.py
+        PromptTemplate(
+            "zero_shot",
+            "v1",
+            "You are an AI assistant for plant disease detection.\nThe user has a plant with the following condition: ",
+            "{context}.\n\nQuestion: {question}\n\nAnswer:",
+        ),
+        PromptTemplate(
+            "zero_shot_no_context",
+            "v1",
+            "Question: ",
+            "{question}\n\nAnswer:",
+        ),
+        PromptTemplate(
+            "few_shot",
+            "v1",
+            "You are a plant disease expert. Answer the question based on the context.\n"
+            + format_examples(3)
+            + "\n\n",
+            "Context: {context}\nQuestion: {question}\nAnswer:",
+        ),
+        PromptTemplate(
+            "few_shot_no_context",
+            "v1",
+            "You are a plant disease expert. Answer the question.\n"
+            + format_examples(3)
+            + "\n\n",
+            "Question: {question}\nAnswer:",
+        ),
+        PromptTemplate(
+            "meta_prompt",
+            "v1",
+            META_SYSTEM_INSTRUCTION + "\n\n",
+            "Context: {context}\nUser Question: {question}\n\nResponse:",
+        ),
+        PromptTemplate(
+            "meta_prompt_no_context",
+            "v1",
+            META_SYSTEM_INSTRUCTION + "\n\n",
+            "User Question: {question}\n\nResponse:",
+        ),
+    ]
+}
@@ -0,0 +1,267 @@
+"""
+INT8 variants of the exported Swin classifier.
+
+``quantize_cv_model`` turns ``flora_cv_onnx`` into ``flora_cv_onnx_int8``:
+
+1. Pin a symbolic batch axis on the graph inputs/outputs so the quantized
+   model keeps serving micro-batches of any size.
+2. Quantize (dynamic: weights only; static: weights + activations, calibrated
+   on a stratified PlantVillage subset).
+3. Let onnxruntime optimize the quantized graph once and save the result, so
+   the API can load it with graph optimizations disabled.
+4. Score FP32 and INT8 on a held-out subset and write ``quantization_report.json``
+   (top-1, latency, size). ``app.py`` only serves the INT8 model when the
+   report is within its accuracy tolerance.
+
+onnxruntime is imported lazily: the app imports this module for
+``quantized_model_ok`` even where quantization tooling is not installed.
+"""
+
+import json
+import os
+import random
+import shutil
+import time
+
+import numpy as np
+
+from backend.preprocessing import ImagePreprocessor
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_FILE = "model_quantized.onnx"
+REPORT_FILE = "quantization_report.json"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def stratified_sample(dataset_dir, per_class, exclude=(), seed=0):
+    """
+    Up to ``per_class`` (path, label) pairs from every class folder of a
+    PlantVillage-style ``dataset_dir/<label>/<image>`` tree.
+    """
+    rng = random.Random(seed)
+    exclude = set(exclude)
+    samples = []
+    for label in sorted(os.listdir(dataset_dir)):
+        folder = os.path.join(dataset_dir, label)
+        if not os.path.isdir(folder):
+            continue
+        files = sorted(
+            os.path.join(folder, name)
+            for name in os.listdir(folder)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        files = [f for f in files if f not in exclude]
+        rng.shuffle(files)
+        samples.extend((path, label) for path in files[:per_class])
+    return samples
+
+
+def set_dynamic_batch(model, dim_param="batch_size"):
+    """Make dimension 0 of every graph input and output symbolic."""
+    for value in list(model.graph.input) + list(model.graph.output):
+        dim = value.type.tensor_type.shape.dim
+        if dim:
+            dim[0].ClearField("dim_value")
+            dim[0].dim_param = dim_param
+    return model
+
+
+def _batches(preprocessor, paths, batch_size):
+    for start in range(0, len(paths), batch_size):
+        chunk = paths[start : start + batch_size]
+        yield preprocessor([_read(path) for path in chunk])
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _calibration_reader(preprocessor, paths, batch_size, input_name):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(_batches(preprocessor, paths, batch_size))
+
+        def get_next(self):
+            batch = next(self._it, None)
+            return None if batch is None else {input_name: batch}
+
+    return Reader()
+
+
+def _session(path, optimize=True, optimized_path=None, threads=None):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = (
+        ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+        if optimize
+        else ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+    )
+    if optimized_path:
+        options.optimized_model_filepath = optimized_path
+    if threads:
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+def evaluate(model_path, samples, preprocessor, label2id, batch_size=16, runs=20):
+    """Top-1 accuracy on ``samples`` and batch-1 latency percentiles (ms)."""
+    session = _session(model_path)
+    input_name = session.get_inputs()[0].name
+    paths = [path for path, _ in samples]
+    targets = np.array([label2id[label] for _, label in samples])
+
+    preds = []
+    for batch in _batches(preprocessor, paths, batch_size):
+        (logits,) = session.run(None, {input_name: batch})
+        preds.append(np.argmax(logits, axis=-1))
+    top1 = float(np.mean(np.concatenate(preds) == targets)) if samples else 0.0
+
+    single = preprocessor([_read(paths[0])])
+    session.run(None, {input_name: single})  # warm-up
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        session.run(None, {input_name: single})
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "top1": round(top1, 4),
+        "latency_ms_p50": round(float(np.percentile(timings, 50)), 2),
+        "latency_ms_p95": round(float(np.percentile(timings, 95)), 2),
+        "size_mb": round(os.path.getsize(model_path) / 2**20, 2),
+    }
+
+
+def quantize_cv_model(
+    onnx_dir,
+    output_dir,
+    dataset_dir,
+    mode="static",
+    calibration_per_class=10,
+    eval_per_class=20,
+    batch_size=16,
+):
+    """Write an INT8 copy of ``onnx_dir`` plus its accuracy/latency report."""
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quantize_dynamic,
+        quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    from transformers import AutoConfig, AutoImageProcessor
+
+    if mode not in ("static", "dynamic"):
+        raise ValueError(f"Unknown quantization mode: {mode}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    for name in os.listdir(onnx_dir):
+        if name.endswith(".json"):
+            shutil.copy(os.path.join(onnx_dir, name), output_dir)
+
+    fp32_path = os.path.join(onnx_dir, MODEL_FILE)
+    prepared = os.path.join(output_dir, "model_prepared.onnx")
+    raw_int8 = os.path.join(output_dir, "model_int8_unoptimized.onnx")
+    int8_path = os.path.join(output_dir, QUANTIZED_FILE)
+
+    model = set_dynamic_batch(onnx.load(fp32_path))
+    onnx.save(model, prepared)
+    # Shape inference + constant folding so every MatMul/Conv gets quantized
+    quant_pre_process(prepared, prepared)
+    input_name = model.graph.input[0].name
+
+    preprocessor = ImagePreprocessor.from_processor(
+        AutoImageProcessor.from_pretrained(onnx_dir), draft=False
+    )
+    calibration = stratified_sample(dataset_dir, calibration_per_class)
+    held_out = stratified_sample(
+        dataset_dir, eval_per_class, exclude=[p for p, _ in calibration], seed=1
+    )
+
+    if mode == "dynamic":
+        quantize_dynamic(prepared, raw_int8, weight_type=QuantType.QInt8)
+    else:
+        quantize_static(
+            prepared,
+            raw_int8,
+            _calibration_reader(
+                preprocessor, [p for p, _ in calibration], batch_size, input_name
+            ),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+
+    # Optimize once here; the app loads this file with optimizations disabled
+    _session(raw_int8, optimized_path=int8_path)
+    os.remove(raw_int8)
+
+    label2id = {
+        v: int(k) for k, v in AutoConfig.from_pretrained(onnx_dir).id2label.items()
+    }
+    # The prepared copy is the FP32 graph with the same dynamic batch axis
+    fp32 = evaluate(prepared, held_out, preprocessor, label2id, batch_size)
+    fp32["size_mb"] = round(os.path.getsize(fp32_path) / 2**20, 2)
+    os.remove(prepared)
+    int8 = evaluate(int8_path, held_out, preprocessor, label2id, batch_size)
+    report = {
+        "mode": mode,
+        "model_file": QUANTIZED_FILE,
+        "calibration_images": len(calibration),
+        "eval_images": len(held_out),
+        "fp32": fp32,
+        "int8": int8,
+        "accuracy_drop": round(fp32["top1"] - int8["top1"], 4),
+        "speedup": round(fp32["latency_ms_p50"] / max(int8["latency_ms_p50"], 1e-6), 2),
+    }
+    with open(os.path.join(output_dir, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def session_options(preoptimized=False, intra_op_threads=0):
+    """
+    ORT options for serving. ``preoptimized`` graphs were optimized and saved
+    at export time; ``intra_op_threads=1`` avoids creating a thread pool,
+    which ``backend/serve.py`` needs to fork safely after loading.
+    """
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if preoptimized:
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+    options.intra_op_num_threads = intra_op_threads
+    return options
+
+
+def load_report(model_dir):
+    try:
+        with open(os.path.join(model_dir, REPORT_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def quantized_model_ok(model_dir, max_accuracy_drop):
+    """
+    True when ``model_dir`` holds an INT8 model whose report is within the
+    accuracy tolerance and which is not slower than FP32.
+    """
+    report = load_report(model_dir)
+    if report is None:
+        return False
+    model_file = report.get("model_file", QUANTIZED_FILE)
+    if not os.path.exists(os.path.join(model_dir, model_file)):
+        return False
+    return (
+        report.get("accuracy_drop", float("inf")) <= max_accuracy_drop
+        and report.get("speedup", 0.0) >= 1.0
+    )
@@ -0,0 +1,347 @@
+"""
+Generation on separate LLM worker processes (``backend/llm_worker.py``).
+
+In the split deployment the API process keeps CV, retrieval, caches and
+sessions, and sends each generation to a worker over a Unix socket. Messages
+are length-prefixed pickles (protocol 5). Any buffer of at least
+``min_bytes`` is taken out of band and written to one file in ``shm_dir``
+instead of the socket: a tmpfs (``/dev/shm``, or a tmpfs volume shared by the
+containers). The main payload is a chat session's llama.cpp state, which is
+tens of MB. The receiver copies the buffers out once and unlinks the file.
+A segment the peer never reads (it died, or the request was cancelled first)
+is unlinked by the sender once the connection ends, and ``sweep_segments``
+removes any left over by crashed processes at startup.
+
+Both ends are trusted processes of this deployment: keep the socket and
+shared-memory directory private to them, since the payload is a pickle.
+"""
+
+import asyncio
+import glob
+import io
+import os
+import pickle
+import secrets
+import socket
+import struct
+import time
+
+from fastapi import HTTPException
+
+from backend import metrics
+from backend.scheduler import Overloaded, Priority
+
+HEADER = struct.Struct("!I")
+_DONE = object()
+SEGMENT_PREFIX = "flora-ipc-"
+
+
+def _restore(cls, attributes, byte_keys):
+    obj = cls.__new__(cls)
+    obj.__dict__.update(attributes)
+    for key in byte_keys:
+        obj.__dict__[key] = bytes(attributes[key])
+    return obj
+
+
+class _Pickler(pickle.Pickler):
+    """
+    bytes are always pickled in-band (unlike arrays and bytearrays), and
+    reducer_override is not consulted for them. Objects holding large bytes
+    attributes, such as LlamaState.llama_state, are rebuilt with those
+    attributes passed as PickleBuffers so they can go out of band too.
+    """
+
+    def __init__(self, file, min_bytes, **kwargs):
+        super().__init__(file, **kwargs)
+        self.min_bytes = min_bytes
+
+    def reducer_override(self, obj):
+        attributes = getattr(obj, "__dict__", None)
+        if not isinstance(attributes, dict) or isinstance(obj, type):
+            return NotImplemented
+        byte_keys = [
+            key
+            for key, value in attributes.items()
+            if type(value) is bytes and len(value) >= self.min_bytes
+        ]
+        if not byte_keys:
+            return NotImplemented
+        attributes = dict(attributes)
+        for key in byte_keys:
+            attributes[key] = pickle.PickleBuffer(attributes[key])
+        return _restore, (type(obj), attributes, byte_keys)
+
+
+def _write_segment(shm_dir, buffers):
+    path = os.path.join(
+        shm_dir, f"{SEGMENT_PREFIX}{os.getpid()}-{secrets.token_hex(8)}"
+    )
+    fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        for buf in buffers:
+            f.write(buf)
+    return path
+
+
+def _read_segment(path, sizes):
+    with open(path, "rb") as f:
+        os.unlink(path)
+        buffers = []
+        for size in sizes:
+            buf = bytearray(size)
+            f.readinto(buf)
+            buffers.append(buf)
+    return buffers
+
+
+def sweep_segments(shm_dir, max_age_s: float = 300.0) -> int:
+    """
+    Remove segments older than ``max_age_s`` from ``shm_dir``. Live segments
+    are read within moments of being written, so old ones were orphaned by
+    a process that crashed. Returns how many were removed.
+    """
+    removed = 0
+    cutoff = time.time() - max_age_s
+    for path in glob.glob(os.path.join(shm_dir, SEGMENT_PREFIX + "*")):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+                removed += 1
+        except FileNotFoundError:
+            pass  # read (or swept) by someone else meanwhile
+    return removed
+
+
+def _encode(obj, shm_dir, min_bytes):
+    out_of_band = []
+
+    def keep_in_band(buf):
+        raw = buf.raw()
+        if shm_dir is None or raw.nbytes < min_bytes:
+            return True
+        out_of_band.append(raw)
+        return False
+
+    body = io.BytesIO()
+    _Pickler(
+        body,
+        min_bytes if shm_dir is not None else float("inf"),
+        protocol=5,
+        buffer_callback=keep_in_band,
+    ).dump(obj)
+    path, sizes = None, [b.nbytes for b in out_of_band]
+    if out_of_band:
+        path = _write_segment(shm_dir, out_of_band)
+        metrics.IPC_SHARED_BYTES.inc(sum(sizes))
+    payload = pickle.dumps((body.getvalue(), path, sizes), protocol=5)
+    return HEADER.pack(len(payload)) + payload, path
+
+
+def encode(obj, shm_dir=None, min_bytes=64 * 1024) -> bytes:
+    """One framed message; large buffers go to ``shm_dir`` when it is set."""
+    return _encode(obj, shm_dir, min_bytes)[0]
+
+
+def decode(payload: bytes):
+    body, path, sizes = pickle.loads(payload)
+    buffers = _read_segment(path, sizes) if path else ()
+    return pickle.loads(body, buffers=buffers)
+
+
+def discard(path):
+    """Remove a shared-memory segment unless the receiver already has."""
+    if path:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _discard_encoded(job):
+    if not job.cancelled() and job.exception() is None:
+        discard(job.result()[1])
+
+
+async def send(writer, obj, shm_dir=None, min_bytes=64 * 1024):
+    """
+    Send one message. Returns the path of its shared-memory segment (None if
+    it went inline): ``discard`` it once the peer can no longer read it.
+    """
+    if shm_dir is None:
+        frame, path = _encode(obj, None, min_bytes)
+    else:
+        # Pickling and writing tens of MB must not block the event loop
+        job = asyncio.ensure_future(asyncio.to_thread(_encode, obj, shm_dir, min_bytes))
+        try:
+            frame, path = await asyncio.shield(job)
+        except asyncio.CancelledError:
+            job.add_done_callback(_discard_encoded)  # the thread keeps writing
+            raise
+    try:
+        writer.write(frame)
+        await writer.drain()
+    except BaseException:
+        discard(path)
+        raise
+    return path
+
+
+async def recv(reader):
+    (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    payload = await reader.readexactly(size)
+    # Large states take a while to unpickle; keep that off the event loop
+    return await asyncio.to_thread(decode, payload)
+
+
+def _recv_exactly(sock, n):
+    data = bytearray()
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return bytes(data)
+
+
+class RemoteGeneration:
+    """
+    A generation running on a worker, with the TokenStream interface
+    (``tokens()`` / ``cancel()``). Cancelling closes the connection, which
+    stops the worker at its next token. ``on_state`` receives the llama.cpp
+    state the worker returns after a session turn.
+    """
+
+    def __init__(self, client, request, on_state=None):
+        self.on_state = on_state
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run(client, request))
+
+    async def _run(self, client, request):
+        try:
+            path, reader, writer = await client.connect()
+            segment = None
+            try:
+                segment = await send(writer, request, client.shm_dir, client.min_bytes)
+                while True:
+                    message = await recv(reader)
+                    if "token" in message:
+                        self._queue.put_nowait(message["token"])
+                    elif "error" in message:
+                        raise client.error(message)
+                    else:
+                        break
+            finally:
+                client.release(path)
+                writer.close()
+                # Read by now, unless the worker died or we were cancelled first
+                discard(segment)
+            if self.on_state is not None and message.get("state") is not None:
+                self.on_state(message["state"])
+            metrics.LLM_REMOTE_REQUESTS.labels("ok").inc()
+            self._queue.put_nowait(_DONE)
+        except Exception as e:
+            metrics.LLM_REMOTE_REQUESTS.labels("error").inc()
+            self._queue.put_nowait(e)
+
+    def cancel(self):
+        if not self._task.done():
+            self._task.cancel()
+
+    async def tokens(self):
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.cancel()
+
+    async def text(self) -> str:
+        return "".join([t async for t in self.tokens()]).strip()
+
+
+class LLMClient:
+    """
+    Sends generations to the least busy LLM worker. ``workers`` is a
+    directory scanned for ``*.sock`` on every request (so workers can come
+    and go) or a comma-separated list of socket paths.
+    """
+
+    def __init__(self, workers: str, shm_dir=None, min_bytes=64 * 1024):
+        self.workers = workers
+        self.shm_dir = shm_dir if shm_dir and os.path.isdir(shm_dir) else None
+        self.min_bytes = min_bytes
+        self._in_flight = {}
+
+    def sockets(self):
+        if os.path.isdir(self.workers):
+            return sorted(glob.glob(os.path.join(self.workers, "*.sock")))
+        return [p.strip() for p in self.workers.split(",") if p.strip()]
+
+    def ping(self, path, timeout=1.0) -> bool:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout)
+                sock.connect(path)
+                sock.sendall(encode({"op": "ping"}))
+                (size,) = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+                return decode(_recv_exactly(sock, size)).get("ok", False)
+        except (OSError, ValueError):
+            return False
+
+    def wait_ready(self, timeout: float) -> int:
+        """Block until at least one worker answers; returns how many do."""
+        deadline = time.monotonic() + timeout
+        while True:
+            ready = sum(self.ping(path) for path in self.sockets())
+            if ready or time.monotonic() >= deadline:
+                break
+            time.sleep(1.0)
+        if not ready:
+            raise RuntimeError(f"No LLM worker answered at {self.workers}")
+        return ready
+
+    async def connect(self):
+        """Connect to the worker with the fewest requests in flight."""
+        for path in sorted(self.sockets(), key=lambda p: self._in_flight.get(p, 0)):
+            try:
+                reader, writer = await asyncio.open_unix_connection(path)
+            except OSError:
+                continue  # stale socket of a stopped worker
+            self._in_flight[path] = self._in_flight.get(path, 0) + 1
+            return path, reader, writer
+        metrics.LLM_REMOTE_REQUESTS.labels("unavailable").inc()
+        raise HTTPException(503, "No LLM worker is available.")
+
+    def release(self, path):
+        self._in_flight[path] -= 1
+
+    @staticmethod
+    def error(message):
+        status = message.get("status", 500)
+        if status in (429, 503):
+            return Overloaded(status, "llm", message.get("retry_after") or 1)
+        return RuntimeError(message["error"])
+
+    def generate(
+        self,
+        prompt,
+        endpoint="predict",
+        priority=Priority.PREDICT,
+        state=None,
+        on_state=None,
+    ) -> RemoteGeneration:
+        """Start a generation (call from the event loop)."""
+        request = {
+            "op": "generate",
+            "prompt": prompt,
+            "endpoint": endpoint,
+            "priority": int(priority),
+            "state": state,
+            "want_state": on_state is not None,
+        }
+        return RemoteGeneration(self, request, on_state)
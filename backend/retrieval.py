@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+TABLE_FILE = "retrieval_table.json"
+TOP_K = 2
+
+
+def index_fingerprint(rag_dir: str) -> str:
+    """
+    Cheap fingerprint of a persisted Chroma index: every file's path, size and
+    mtime. Rebuilding or writing to the index changes it.
+    """
+    digest = hashlib.sha256()
+    if not os.path.isdir(rag_dir):
+        return ""
+    for root, dirs, files in os.walk(rag_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name == TABLE_FILE:
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            rel = os.path.relpath(path, rag_dir)
+            digest.update(f"{rel}:{st.st_size}:{st.st_mtime_ns};".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def search_chunks(vectordb, diagnosis: str, k: int = TOP_K):
+    """
+    The /predict retrieval query: disease-filtered search first, unfiltered
+    search as a fallback. Returns the matching chunk texts.
+    """
+    docs = vectordb.similarity_search(
+        query=f"{diagnosis} treatment", k=k, filter={"disease": diagnosis}
+    )
+    if not docs:
+        docs = vectordb.similarity_search(f"{diagnosis} treatment", k=k)
+    return [d.page_content for d in docs]
+
+
+class RetrievalTable:
+    """
+    diagnosis -> top-k chunks, precomputed for every class the CV model can
+    predict. The /predict query only depends on the class, so there are only as
+    many distinct queries as there are labels.
+
+    The table is tied to the fingerprint of the index it was built from and
+    stops answering (``get`` returns None) as soon as the index on disk changes.
+    """
+
+    def __init__(self, rag_dir: str, check_interval_s: float = 30.0):
+        self.rag_dir = rag_dir
+        self.check_interval_s = check_interval_s
+        self.fingerprint = None
+        self.labels = []
+        self._chunks = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._rebuilding = threading.Lock()
+
+    def __len__(self):
+        return len(self._chunks)
+
+    @property
+    def path(self):
+        return os.path.join(self.rag_dir, TABLE_FILE)
+
+    def build(self, vectordb, labels, k: int = TOP_K):
+        """Run the query for every label against ``vectordb``."""
+        fingerprint = index_fingerprint(self.rag_dir)
+        chunks = {label: search_chunks(vectordb, label, k) for label in labels}
+        with self._lock:
+            self._chunks = chunks
+            self.labels = list(chunks)
+            self.fingerprint = fingerprint
+            self._checked_at = time.monotonic()
+
+    def refresh(self, vectordb) -> bool:
+        """
+        Rebuild for the same labels after the index changed. Returns False
+        without waiting if another thread is already rebuilding.
+        """
+        if not self._rebuilding.acquire(blocking=False):
+            return False
+        try:
+            self.build(vectordb, self.labels)
+            return True
+        finally:
+            self._rebuilding.release()
+
+    def save(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "chunks": self._chunks}, f)
+
+    def load(self) -> bool:
+        """Load a table written by ingest.py; False if missing or out of date."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("fingerprint") != index_fingerprint(self.rag_dir):
+            return False
+        with self._lock:
+            self._chunks = data["chunks"]
+            self.labels = list(self._chunks)
+            self.fingerprint = data["fingerprint"]
+            self._checked_at = time.monotonic()
+        return True
+
+    def is_stale(self) -> bool:
+        """True once the index on disk no longer matches the table."""
+        if self.fingerprint is None:
+            return True
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval_s:
+            return False
+        self._checked_at = now
+        if index_fingerprint(self.rag_dir) != self.fingerprint:
+            with self._lock:
+                self._chunks = {}
+                self.fingerprint = None
+            return True
+        return False
+
+    def get(self, diagnosis: str):
+        """Precomputed chunks for ``diagnosis``, or None on a miss/stale table."""
+        if self.is_stale():
+            return None
+        return self._chunks.get(diagnosis)
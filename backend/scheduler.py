@@ -0,0 +1,147 @@
+import asyncio
+import enum
+import itertools
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from backend import metrics
+
+# Weight of the newest observation in the service-time moving average
+EWMA_ALPHA = 0.2
+
+
+class Priority(enum.IntEnum):
+    """Lower value runs first. Short chat follow-ups jump queued explanations."""
+
+    CHAT = 0
+    PREDICT = 1
+
+
+class Overloaded(HTTPException):
+    """
+    Raised at admission time when a lane is too busy to take more work.
+    FastAPI turns it into a 429/503 response carrying a Retry-After header.
+    """
+
+    def __init__(self, status_code: int, lane: str, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=status_code,
+            detail=f"The {lane} queue is full, retry in {self.retry_after}s.",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+
+class Lane:
+    """
+    A bounded thread pool fed by a priority queue.
+
+    Jobs are plain blocking callables; they run on the lane's own executor so
+    the event loop stays free. Admission is refused with 429 once ``max_queue``
+    jobs are waiting, and with 503 once the estimated wait exceeds
+    ``max_wait_s``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        workers: int = 1,
+        max_queue: int = 64,
+        max_wait_s: float = 30.0,
+        initial_service_s: float = 0.1,
+    ):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.max_wait_s = max_wait_s
+        self.service_s = initial_service_s
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix=f"flora-{name}"
+        )
+        self._counter = itertools.count()
+        self._busy = 0
+        self._loop = None
+        self._queue = None
+        self._tasks = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def estimated_wait(self) -> float:
+        """Seconds until a job admitted now would start running."""
+        return (self.depth + self._busy) * self.service_s / self.workers
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.PriorityQueue()
+            self._busy = 0
+            self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    def _update_gauges(self):
+        metrics.SCHEDULER_QUEUE_DEPTH.labels(self.name).set(self.depth)
+        metrics.SCHEDULER_ESTIMATED_WAIT.labels(self.name).set(self.estimated_wait())
+
+    def submit(self, fn, *args, priority: Priority = Priority.PREDICT):
+        """
+        Admit a job and return the future for its result.
+        Raises Overloaded instead of queueing when the lane is saturated.
+        """
+        self._ensure_workers()
+
+        wait = self.estimated_wait()
+        if self.depth >= self.max_queue:
+            metrics.SCHEDULER_REJECTED.labels(self.name, "429").inc()
+            raise Overloaded(429, self.name, wait)
+        if wait > self.max_wait_s:
+            metrics.SCHEDULER_REJECTED.labels(self.name, "503").inc()
+            raise Overloaded(503, self.name, wait)
+
+        fut = self._loop.create_future()
+        self._queue.put_nowait((int(priority), next(self._counter), fn, args, fut))
+        self._update_gauges()
+        return fut
+
+    async def _work(self):
+        while True:
+            _, _, fn, args, fut = await self._queue.get()
+            if fut.cancelled():
+                self._update_gauges()
+                continue
+
+            self._busy += 1
+            self._update_gauges()
+            started = time.perf_counter()
+            try:
+                result = await self._loop.run_in_executor(self._executor, fn, *args)
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+            else:
+                if not fut.done():
+                    fut.set_result(result)
+            finally:
+                elapsed = time.perf_counter() - started
+                self.service_s = (
+                    EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * self.service_s
+                )
+                self._busy -= 1
+                self._update_gauges()
+
+
+class InferenceScheduler:
+    """Routes blocking CV, retrieval and LLM work to their own lanes."""
+
+    def __init__(self, *lanes: Lane):
+        self.lanes = {lane.name: lane for lane in lanes}
+
+    def submit(self, lane: str, fn, *args, priority: Priority = Priority.PREDICT):
+        return self.lanes[lane].submit(fn, *args, priority=priority)
+
+    async def run(self, lane: str, fn, *args, priority: Priority = Priority.PREDICT):
+        return await self.submit(lane, fn, *args, priority=priority)
@@ -0,0 +1,121 @@
+"""
+Preload-and-fork server.
+
+    python -m backend.serve --workers 4 --port 8000
+
+``uvicorn --workers N`` imports the app in N fresh processes, so each one
+loads its own Swin, MiniLM and GGUF. Here the master loads the large
+read-only weights once (``app.preload_components``), binds the listening
+socket, then forks the workers:
+
+* the GGUF is mmapped, so all workers map the same page-cache pages;
+* ORT/torch weights live in the master's heap and stay shared copy-on-write
+  as long as nobody writes to them;
+* ``gc.freeze()`` moves the preloaded objects out of the collector's reach,
+  so garbage collections in the workers don't dirty their pages.
+
+Anything that does not survive ``fork()`` (Chroma's sqlite handles, ORT and
+llama.cpp thread pools, the event loop) is created in each worker, which then
+runs the app's normal startup (warm-ups, readiness) on the shared weights.
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, log_level):
+    # Every worker accepts on the master's socket; the kernel spreads
+    # connections across them
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(app, sock, log_level):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            run_worker(app, sock, log_level)
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2"))
+    )
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    # No ORT thread pool may exist at fork time; workers scale by process
+    os.environ.setdefault("CV_INTRA_OP_THREADS", "1")
+    from backend import app as app_module
+
+    print(f"📦 Preloading models in master (pid {os.getpid()})...")
+    start = time.perf_counter()
+    app_module.preload_components()
+    print(f"   Preloaded in {time.perf_counter() - start:.1f}s.")
+
+    sock = bind_socket(args.host, args.port)
+    gc.collect()
+    gc.freeze()
+
+    workers = {spawn(app_module.app, sock, args.log_level) for _ in range(args.workers)}
+    print(f"🚀 Serving on {args.host}:{args.port} with {len(workers)} workers.")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"⚠️ Worker {pid} exited ({status}), restarting.")
+            time.sleep(1)  # don't spin if workers crash on startup
+            workers.add(spawn(app_module.app, sock, args.log_level))
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Server-side chat sessions.
+
+/predict opens a session holding the diagnosis and its packed context, so
+/chat clients only send ``session_id`` and the new question. After every turn
+the llama.cpp state (KV cache + token ids) is kept with the session; the next
+turn's prompt extends the previous one, so loading that state leaves only the
+new question to prefill.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from backend import metrics
+
+
+class Session:
+    """
+    One diagnosis conversation: the context it is grounded in, the turns so
+    far and, once the LLM has run for it, the llama.cpp state (KV cache and
+    token ids) right after the last answer.
+    """
+
+    def __init__(self, session_id, diagnosis, context, explanation_key=None):
+        self.id = session_id
+        self.diagnosis = diagnosis
+        self.context = context
+        # Explanation cache key of the /predict answer: it becomes the first
+        # turn once available, without keeping a second copy of the text
+        self.explanation_key = explanation_key
+        self.turns: List[Tuple[str, str]] = []
+        self.state = None
+        self.state_bytes = 0
+        self.last_used = time.time()
+
+
+def state_size(state) -> int:
+    """
+    Memory held by a LlamaState: the KV state bytes plus its ``scores``
+    (n_batch x n_vocab float32 logits, n_ctx x n_vocab with logits_all) and
+    ``input_ids`` arrays.
+    """
+    size = getattr(state, "llama_state_size", None)
+    if not isinstance(size, int):
+        data = getattr(state, "llama_state", b"")
+        size = len(data) if isinstance(data, (bytes, bytearray)) else 0
+    for name in ("scores", "input_ids"):
+        nbytes = getattr(getattr(state, name, None), "nbytes", 0)
+        size += nbytes if isinstance(nbytes, int) else 0
+    return size
+
+
+class SessionStore:
+    """
+    LRU session store under a memory budget.
+
+    Saved llama.cpp states are by far the largest part of a session, so the
+    budget applies to them: once the states exceed ``max_state_bytes`` the
+    least recently used sessions lose their state first (their next turn is
+    re-prefilled from the transcript). Sessions themselves expire after
+    ``ttl`` seconds idle or when more than ``max_sessions`` exist.
+    """
+
+    def __init__(
+        self,
+        max_state_bytes: int = 256 * 1024 * 1024,
+        max_sessions: int = 4096,
+        ttl: float = 3600.0,
+        clock=time.time,
+    ):
+        self.max_state_bytes = max_state_bytes
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._state_bytes = 0
+        # States are saved from the LLM thread
+        self._lock = threading.Lock()
+
+    @property
+    def state_bytes(self) -> int:
+        return self._state_bytes
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, diagnosis, context, explanation_key=None) -> Session:
+        session = Session(
+            secrets.token_urlsafe(16), diagnosis, context, explanation_key
+        )
+        session.last_used = self.clock()
+        with self._lock:
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self._drop_state(evicted)
+        self._publish()
+        return session
+
+    def get(self, session_id) -> Optional[Session]:
+        now = self.clock()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and now - session.last_used > self.ttl:
+                del self._sessions[session_id]
+                self._drop_state(session)
+                session = None
+            if session is not None:
+                session.last_used = now
+                self._sessions.move_to_end(session_id)
+        self._publish()
+        return session
+
+    def save_state(self, session: Session, state):
+        """Keep ``state`` for ``session`` and evict older states over budget."""
+        size = state_size(state)
+        with self._lock:
+            self._drop_state(session)
+            if session.id not in self._sessions or size > self.max_state_bytes:
+                return
+            session.state = state
+            session.state_bytes = size
+            self._state_bytes += size
+            for other in list(self._sessions.values()):
+                if self._state_bytes <= self.max_state_bytes:
+                    break
+                if other is not session:
+                    self._drop_state(other)
+                    metrics.SESSION_STATE_EVICTIONS.inc()
+        self._publish()
+
+    def drop_state(self, session: Session):
+        with self._lock:
+            self._drop_state(session)
+        self._publish()
+
+    def _drop_state(self, session):
+        self._state_bytes -= session.state_bytes
+        session.state = None
+        session.state_bytes = 0
+
+    def _publish(self):
+        metrics.SESSIONS.set(len(self._sessions))
+        metrics.SESSION_STATE_BYTES.set(self._state_bytes)
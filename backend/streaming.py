@@ -0,0 +1,180 @@
+import asyncio
+import json
+import threading
+
+_DONE = object()
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def iter_completion(llm, prompt, cancel: threading.Event, **kwargs):
+    """
+    Yield text chunks from a streaming llama.cpp completion.
+    Stops early (and releases the context) as soon as ``cancel`` is set.
+    """
+    chunks = llm(prompt, echo=False, stream=True, **kwargs)
+    try:
+        for chunk in chunks:
+            if cancel.is_set():
+                break
+            text = chunk["choices"][0]["text"]
+            if text:
+                yield text
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+class TokenStream:
+    """
+    Bridges a blocking llama.cpp token stream running on a scheduler lane
+    into an async iterator on the event loop.
+
+    Closing the iterator (client disconnect, task cancellation) cancels the
+    generation, so the LLM worker is freed at the next token boundary.
+    ``prepare`` runs on the worker thread just before generation starts and
+    ``finish`` right after it stops (completed, cancelled or failed).
+    """
+
+    def __init__(self, llm, prompt, prepare=None, finish=None, **kwargs):
+        self.llm = llm
+        self.prompt = prompt
+        self.prepare = prepare
+        self.finish = finish
+        self.kwargs = kwargs
+        self._cancel = threading.Event()
+        self._loop = None
+        self._queue = None
+        self._job = None
+
+    def start(self, submit):
+        """
+        Submit the generation through ``submit`` (e.g. a scheduler lane).
+        Admission errors such as Overloaded propagate to the caller.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._job = submit(self._produce)
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+        if self._job is not None and not self._job.done():
+            self._job.cancel()
+
+    def _put(self, item):
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        except RuntimeError:  # event loop already closed
+            self._cancel.set()
+
+    def _produce(self):
+        try:
+            if self.prepare is not None:
+                self.prepare()
+            for text in iter_completion(
+                self.llm, self.prompt, self._cancel, **self.kwargs
+            ):
+                self._put(text)
+        except Exception as e:
+            self._put(e)
+        finally:
+            if self.finish is not None:
+                try:
+                    self.finish()
+                except Exception:
+                    pass
+            self._put(_DONE)
+
+    async def tokens(self):
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.cancel()
+
+
+async def sse_stream(stream: TokenStream, head_events, result_key: str, on_finish=None):
+    """
+    Emit ``head_events`` first, then one ``token`` event per chunk and a final
+    ``done`` event carrying the full text under ``result_key``.
+
+    ``on_finish`` is called with the full text once generation completes, or
+    with None if it failed or the client went away.
+    """
+    for event in head_events:
+        yield event
+
+    parts = []
+    completed = False
+    try:
+        async for text in stream.tokens():
+            parts.append(text)
+            yield sse_event("token", {"text": text})
+        completed = True
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
+        return
+    finally:
+        if on_finish is not None:
+            on_finish("".join(parts).strip() if completed else None)
+
+    yield sse_event("done", {result_key: "".join(parts).strip()})
+
+
+async def sse_text(head_events, get_text, result_key: str):
+    """
+    SSE body for an answer that is not streamed token by token (e.g. a cache
+    hit): ``head_events``, then the whole text as one ``token`` event and ``done``.
+    ``get_text()`` returns an awaitable of the text, so it can be a pending
+    generation; it is only called once the body runs.
+    """
+    for event in head_events:
+        yield event
+
+    try:
+        text = await get_text()
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
+        return
+
+    yield sse_event("token", {"text": text})
+    yield sse_event("done", {result_key: text})
+
+
+async def sse_follow(head_events, generation, tokens, result_key: str, on_close=None):
+    """
+    SSE body that watches a shared generation without owning it:
+    ``generation`` is the future of the full text and ``tokens`` an
+    asyncio.Queue receiving its chunks. ``on_close`` runs when the body ends
+    or the client goes away; the generation itself carries on for others.
+    """
+    try:
+        for event in head_events:
+            yield event
+
+        generation.add_done_callback(lambda _: tokens.put_nowait(_DONE))
+        while True:
+            text = await tokens.get()
+            if text is _DONE:
+                break
+            yield sse_event("token", {"text": text})
+
+        try:
+            text = generation.result()
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+            return
+        yield sse_event("done", {result_key: text})
+    finally:
+        if on_close is not None:
+            on_close()
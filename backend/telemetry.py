@@ -0,0 +1,175 @@
+"""
+Stage timings, LLM throughput and memory gauges for ``/metrics``.
+
+Everything on the request path is a ``perf_counter`` pair plus one histogram
+observation. Memory gauges are computed when Prometheus scrapes, not per request.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from backend import metrics
+
+try:
+    import llama_cpp
+except ImportError:
+    llama_cpp = None
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+@contextmanager
+def stage(name: str):
+    """Observe the wall time of the ``with`` block as stage ``name``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.INFERENCE_STAGE.labels(name).observe(time.perf_counter() - start)
+
+
+def timed(name: str):
+    """Decorator form of ``stage`` for functions run on scheduler lanes."""
+
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def _perf_api(llm):
+    """(read, reset) callables for llama.cpp's perf counters, or None."""
+    ctx = getattr(getattr(llm, "_ctx", None), "ctx", None)
+    if llama_cpp is None or ctx is None:
+        return None
+    if hasattr(llama_cpp, "llama_perf_context"):
+        return (
+            lambda: llama_cpp.llama_perf_context(ctx),
+            lambda: llama_cpp.llama_perf_context_reset(ctx),
+        )
+    if hasattr(llama_cpp, "llama_get_timings"):  # llama-cpp-python < 0.3
+        return (
+            lambda: llama_cpp.llama_get_timings(ctx),
+            lambda: llama_cpp.llama_reset_timings(ctx),
+        )
+    return None
+
+
+def reset_llm_perf(llm):
+    """Zero llama.cpp's counters; call on the LLM thread before generating."""
+    api = _perf_api(llm)
+    if api is not None:
+        try:
+            api[1]()
+        except Exception:
+            pass
+
+
+def read_llm_perf(llm):
+    """
+    Prefill/decode split of the last generation as
+    ``(prefill_s, prompt_tokens, decode_s, completion_tokens)``, or None when
+    this llama-cpp-python build does not expose its perf counters.
+    """
+    api = _perf_api(llm)
+    if api is None:
+        return None
+    try:
+        data = api[0]()
+        return (
+            float(data.t_p_eval_ms) / 1000,
+            int(data.n_p_eval),
+            float(data.t_eval_ms) / 1000,
+            int(data.n_eval),
+        )
+    except Exception:
+        return None
+
+
+def record_generation(endpoint, perf=None, usage=None, wall_s=None):
+    """
+    Publish one generation. Uses llama.cpp's prefill/decode split when ``perf``
+    is available, otherwise falls back to the completion ``usage`` and wall time.
+    """
+    if perf is not None:
+        prefill_s, prompt_tokens, decode_s, completion_tokens = perf
+        metrics.INFERENCE_STAGE.labels("llm_prefill").observe(prefill_s)
+        metrics.INFERENCE_STAGE.labels("llm_decode").observe(decode_s)
+        if prefill_s > 0:
+            metrics.LLM_TOKENS_PER_SECOND.labels("prefill").set(
+                prompt_tokens / prefill_s
+            )
+        if decode_s > 0:
+            metrics.LLM_TOKENS_PER_SECOND.labels("decode").set(
+                completion_tokens / decode_s
+            )
+    elif usage:
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        if wall_s:
+            metrics.INFERENCE_STAGE.labels("llm_generate").observe(wall_s)
+            metrics.LLM_TOKENS_PER_SECOND.labels("decode").set(
+                completion_tokens / wall_s
+            )
+    else:
+        return
+    metrics.LLM_PROMPT_TOKENS.labels(endpoint).set(prompt_tokens)
+    metrics.LLM_COMPLETION_TOKENS.labels(endpoint).set(completion_tokens)
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (0 where unsupported)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def mapped_rss_bytes(path) -> int:
+    """Resident bytes of every mapping of ``path`` (e.g. an mmapped GGUF)."""
+    path = os.path.realpath(path)
+    total = 0
+    in_mapping = False
+    try:
+        with open("/proc/self/smaps") as f:
+            for line in f:
+                if line[0] in "0123456789abcdef" and "-" in line.split(" ", 1)[0]:
+                    in_mapping = line.rstrip().endswith(path)
+                elif in_mapping and line.startswith("Rss:"):
+                    total += int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        return 0
+    return total
+
+
+def track_memory(component: str, fn):
+    """
+    Run ``fn`` and record how much process RSS grew meanwhile under
+    ``component``. Components load concurrently, so this is approximate: it
+    includes whatever the other loads allocated at the same time.
+    """
+
+    def wrapper():
+        before = rss_bytes()
+        result = fn()
+        metrics.RESIDENT_MEMORY.labels(component).set(max(0, rss_bytes() - before))
+        return result
+
+    return wrapper
+
+
+def expose_memory(gguf_path=None):
+    """Compute process (and GGUF page-cache) RSS at scrape time."""
+    metrics.RESIDENT_MEMORY.labels("process").set_function(rss_bytes)
+    if gguf_path:
+        metrics.RESIDENT_MEMORY.labels("llm_weights_mmap").set_function(
+            lambda: mapped_rss_bytes(gguf_path)
+        )
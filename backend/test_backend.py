@@ -35,6 +35,7 @@ def main():
         confidence = data.get("confidence")
         explanation = data.get("explanation")
         chat_context = data.get("chat_context")
+        session_id = data.get("session_id")
 
         print("\n" + "=" * 50)
         print(f"Diagnosis: {diagnosis} ({confidence})")
@@ -58,15 +59,17 @@ def main():
         if not question:
             continue
 
-        payload = {
-            "question": question,
-            "context": chat_context,
-            "diagnosis": diagnosis,
-        }
+        # The server keeps the conversation; only the question is sent
+        payload = {"question": question, "session_id": session_id}
 
         try:
             chat_response = requests.post(f"{BASE_URL}/chat", json=payload)
+            if chat_response.status_code == 404:
+                # Session expired: start a new one from the diagnosis context
+                payload.update(context=chat_context, diagnosis=diagnosis)
+                chat_response = requests.post(f"{BASE_URL}/chat", json=payload)
             if chat_response.status_code == 200:
+                session_id = chat_response.json().get("session_id")
                 answer = chat_response.json().get("answer")
                 print(f"\nFlora-Bot: {answer}")
             else:
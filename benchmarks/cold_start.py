@@ -0,0 +1,171 @@
+"""
+Cold start and memory of the CV serving path, torch-free vs the old stack.
+
+Every run is a fresh interpreter that imports the stack, loads
+``flora_cv_onnx`` and classifies one image. Three modes are measured:
+
+    onnxruntime  backend/classifier.py + ImagePreprocessor (NumPy + ORT only)
+    app          ``import backend.app`` then its load_cv() / classify_images()
+    optimum      the previous path: torch + transformers' AutoImageProcessor
+                 (return_tensors="pt") + optimum's ORTModelForImageClassification
+
+For each mode the report gives the medians over ``--runs`` of:
+
+- the time to import, load, and run the first prediction;
+- the whole process wall time, including interpreter startup;
+- the final and peak RSS;
+- whether torch ended up in ``sys.modules``.
+
+    python benchmarks/cold_start.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.getenv("MODEL_DIR", "backend/models")
+ONNX_DIR = os.path.join(MODEL_DIR, "flora_cv_onnx")
+MODES = ("onnxruntime", "app", "optimum")
+
+
+def memory_mb():
+    """Current and peak RSS of this process, from /proc (Linux only)."""
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                fields[key] = int(value.split()[0]) / 1024
+    return round(fields["VmRSS"], 1), round(fields["VmHWM"], 1)
+
+
+def child(mode, model_dir):
+    """One cold start, in this (fresh) process. Prints a JSON line."""
+    sys.path.append(ROOT)
+    from PIL import Image
+
+    image = Image.new("RGB", (512, 384), (40, 120, 40))
+    start = time.perf_counter()
+
+    if mode == "optimum":
+        import torch
+        from optimum.onnxruntime import ORTModelForImageClassification
+        from transformers import AutoImageProcessor
+    elif mode == "app":
+        from backend import app
+    else:
+        from backend.classifier import OnnxClassifier, softmax_top1
+        from backend.preprocessing import ImagePreprocessor
+    imported = time.perf_counter()
+
+    if mode == "optimum":
+        model = ORTModelForImageClassification.from_pretrained(model_dir)
+        processor = AutoImageProcessor.from_pretrained(model_dir)
+    elif mode == "app":
+        app.ONNX_DIR, app.CV_QUANTIZED = model_dir, "off"
+        app.load_cv()
+    else:
+        model = OnnxClassifier(model_dir)
+        preprocessor = ImagePreprocessor.from_pretrained(model_dir)
+    loaded = time.perf_counter()
+
+    if mode == "optimum":
+        inputs = processor(image, return_tensors="pt")
+        with torch.no_grad():
+            probs = torch.softmax(model(**inputs).logits, dim=-1)
+            torch.max(probs, dim=-1)
+    elif mode == "app":
+        app.classify_images([app.sys_comps["preprocessor"].load(image)])
+    else:
+        softmax_top1(model(preprocessor.batch([preprocessor.load(image)])))
+    predicted = time.perf_counter()
+
+    rss, peak = memory_mb()
+    print(
+        json.dumps(
+            {
+                "import_s": round(imported - start, 3),
+                "load_s": round(loaded - imported, 3),
+                "first_predict_s": round(predicted - loaded, 3),
+                "rss_mb": rss,
+                "peak_rss_mb": peak,
+                "modules": len(sys.modules),
+                "torch_imported": "torch" in sys.modules,
+            }
+        )
+    )
+
+
+def measure(mode, model_dir, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--model-dir", model_dir],
+            capture_output=True,
+            text=True,
+            cwd=ROOT,
+        )
+        wall = time.perf_counter() - start
+        if out.returncode != 0:
+            return {"mode": mode, "error": out.stderr.strip().splitlines()[-1]}
+        sample = json.loads(out.stdout.strip().splitlines()[-1])
+        sample["process_s"] = round(wall, 3)
+        samples.append(sample)
+
+    result = {"mode": mode, "runs": runs}
+    for key in samples[0]:
+        values = [s[key] for s in samples]
+        if key == "torch_imported":
+            result[key] = values[0]
+        else:
+            result[key] = round(statistics.median(values), 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CV cold-start benchmark.")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--model-dir", default=ONNX_DIR)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default="benchmarks/results/cold_start.json")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, os.path.abspath(args.model_dir))
+        return
+
+    model_dir = os.path.abspath(args.model_dir)
+    results = []
+    for mode in args.modes:
+        print(f"⏱️ {mode}: {args.runs} cold starts...")
+        results.append(measure(mode, model_dir, args.runs))
+
+    print(
+        f"\n{'mode':<12} {'import s':>8} {'load s':>7} {'1st s':>6} {'process s':>9} "
+        f"{'RSS MB':>7} {'peak MB':>7} {'torch':>5}"
+    )
+    for r in results:
+        if "error" in r:
+            print(f"{r['mode']:<12} skipped: {r['error']}")
+            continue
+        print(
+            f"{r['mode']:<12} {r['import_s']:>8} {r['load_s']:>7} "
+            f"{r['first_predict_s']:>6} {r['process_s']:>9} {r['rss_mb']:>7} "
+            f"{r['peak_rss_mb']:>7} {str(r['torch_imported']):>5}"
+        )
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📄 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
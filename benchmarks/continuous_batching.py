@@ -0,0 +1,180 @@
+"""
+Serial generation vs the continuous batching engine (backend/engine.py).
+
+A burst of ``--requests`` questions from data/eval.jsonl arrives at once, as
+under load. The serial path answers them one after another, like the LLM lane
+does; the engine interleaves up to ``slots`` of them per decode step. Both
+reuse the cached prompt prefix and decode greedily. The report gives the
+aggregate completion tokens/s over the whole burst, per-request latency and
+time to first token (both from the burst's start), and the share of answers
+identical to the serial ones:
+
+    python benchmarks/continuous_batching.py --slots 2 4 8 --requests 16
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+from llama_cpp import Llama
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from backend.engine import GenerationEngine, LlamaBatchBackend  # noqa: E402
+from backend.prefix_cache import PrefixCache  # noqa: E402
+from backend.prompts import PROMPTS  # noqa: E402
+
+MODEL_DIR = os.getenv("MODEL_DIR", "backend/models")
+GGUF_PATH = os.path.join(MODEL_DIR, "tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf")
+TEMPLATE = PROMPTS["flora_few_shot"]
+N_CTX = 2048
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def run_serial(llm, prompts, max_tokens):
+    """One request at a time, in arrival order, streamed to time the first token."""
+    prefix_cache = PrefixCache(llm)
+    prefix_cache.warm(TEMPLATE)
+    start = time.perf_counter()
+    answers = []
+    for prompt in prompts:
+        prefix_cache.restore(TEMPLATE, prompt)
+        first, parts = None, []
+        for chunk in llm(
+            prompt,
+            max_tokens=max_tokens,
+            temperature=0.0,
+            stop=TEMPLATE.stop,
+            stream=True,
+        ):
+            if first is None:
+                first = time.perf_counter()
+            parts.append(chunk["choices"][0]["text"])
+        done = time.perf_counter()
+        answers.append(
+            {
+                "text": "".join(parts).strip(),
+                "tokens": len(parts),
+                "ttft_s": (first or done) - start,
+                "latency_s": done - start,
+            }
+        )
+    return answers, time.perf_counter() - start
+
+
+async def run_engine(engine, prompts, max_tokens):
+    """Every request submitted at once; the engine admits them as slots free up."""
+    start = time.perf_counter()
+    generations = [
+        engine.submit(
+            engine.backend.tokenize(prompt),
+            max_tokens=max_tokens,
+            stop=TEMPLATE.stop,
+            temperature=0,
+        )
+        for prompt in prompts
+    ]
+    texts = await asyncio.gather(*(g.text() for g in generations))
+    answers = [
+        {
+            "text": text,
+            "tokens": g.n_generated,
+            "ttft_s": (g.first_token_at or g.finished_at) - start,
+            "latency_s": g.finished_at - start,
+        }
+        for g, text in zip(generations, texts)
+    ]
+    return answers, time.perf_counter() - start
+
+
+def summarize(name, answers, seconds, baseline=None):
+    tokens = sum(a["tokens"] for a in answers)
+    latencies = [a["latency_s"] for a in answers]
+    result = {
+        "engine": name,
+        "requests": len(answers),
+        "completion_tokens": tokens,
+        "seconds": round(seconds, 2),
+        "tokens_per_second": round(tokens / seconds, 2),
+        "latency_p50_s": round(statistics.median(latencies), 2),
+        "latency_p95_s": round(percentile(latencies, 95), 2),
+        "ttft_p50_s": round(statistics.median(a["ttft_s"] for a in answers), 2),
+        "parity": 1.0,
+        "speedup": 1.0,
+    }
+    if baseline is not None:
+        same = sum(a["text"] == b["text"] for a, b in zip(answers, baseline["answers"]))
+        result["parity"] = round(same / len(answers), 4)
+        result["speedup"] = round(
+            result["tokens_per_second"] / baseline["tokens_per_second"], 3
+        )
+    result["answers"] = answers
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuous batching benchmark.")
+    parser.add_argument("--data", default="data/eval.jsonl")
+    parser.add_argument("--slots", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument(
+        "--output", default="benchmarks/results/continuous_batching.json"
+    )
+    args = parser.parse_args()
+
+    with open(args.data) as f:
+        data = [json.loads(line) for line in f if line.strip()]
+    # Cycle through the eval set; the class name stands in for the RAG context
+    prompts = [
+        TEMPLATE.render(
+            context=item.get("context_class") or "", question=item["question"]
+        )
+        for item in (data[i % len(data)] for i in range(args.requests))
+    ]
+
+    llm = Llama(model_path=GGUF_PATH, n_ctx=N_CTX, n_threads=4, verbose=False)
+    print(f"⏱️ serial: {len(prompts)} requests...")
+    baseline = summarize("serial", *run_serial(llm, prompts, args.max_tokens))
+    results = [baseline]
+
+    for slots in args.slots:
+        print(f"⏱️ batched (slots={slots})...")
+        backend = LlamaBatchBackend(llm, n_seq=slots + 1, n_ctx_per_seq=N_CTX)
+        engine = GenerationEngine(backend, slots=slots, max_queue=len(prompts))
+        engine.cache_prefix(backend.tokenize(TEMPLATE.prefix))
+        try:
+            answers, seconds = asyncio.run(run_engine(engine, prompts, args.max_tokens))
+        finally:
+            engine.close()
+            backend.close()
+        results.append(summarize(f"batched({slots})", answers, seconds, baseline))
+
+    print(
+        f"\n{'engine':<12} {'tok/s':>7} {'speedup':>7} {'p50 s':>6} {'p95 s':>6} "
+        f"{'TTFT s':>6} {'parity':>6}"
+    )
+    for r in results:
+        print(
+            f"{r['engine']:<12} {r['tokens_per_second']:>7} {r['speedup']:>7} "
+            f"{r['latency_p50_s']:>6} {r['latency_p95_s']:>6} "
+            f"{r['ttft_p50_s']:>6} {r['parity']:>6}"
+        )
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📄 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""
+Load generator for the Flora-Bot API: a mix of /predict and /chat traffic.
+
+Closed loop (``--concurrency`` clients sending back to back) measures capacity;
+open loop (``--rate`` requests/s with Poisson arrivals) measures latency at a
+given load. Open-loop latency is measured from each request's scheduled start,
+so a saturated server shows up as growing latency instead of a lower send rate.
+
+    # against a running server (real models)
+    python benchmarks/loadtest.py --url http://localhost:8000 --image leaf.jpg \\
+        --mode open --rate 2 --duration 60 --mix predict=0.3,chat=0.7
+
+    # offline: the app in-process, with the fake models of tests/test_backend_api.py
+    python benchmarks/loadtest.py --fake --mode closed --concurrency 16
+
+Every run writes a JSON report (percentiles, throughput and error rate per
+endpoint, plus the git commit). ``--baseline`` compares the run to an earlier
+report; ``--diff OLD NEW`` compares two saved reports without running.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVAL_PATH = os.path.join(ROOT, "data", "eval.jsonl")
+FAKE_CLASSES = [
+    "Apple___Apple_scab",
+    "Tomato___Early_blight",
+    "Corn_(maize)___Common_rust_",
+    "Potato___Late_blight",
+]
+
+
+# ----------------------------- offline backend -----------------------------
+
+
+class FakeLlama:
+    """Stand-in for llama_cpp.Llama: fixed answer after a simulated delay."""
+
+    def __init__(self, seconds, text):
+        self.seconds = seconds
+        self.words = text.split()
+
+    def __call__(self, prompt, stream=False, **kwargs):
+        if stream:
+            return self._stream()
+        time.sleep(self.seconds)
+        return {
+            "choices": [{"text": " " + " ".join(self.words)}],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(self.words),
+            },
+        }
+
+    def _stream(self):
+        for word in self.words:
+            time.sleep(self.seconds / len(self.words))
+            yield {"choices": [{"text": " " + word}]}
+
+    def tokenize(self, text, add_bos=True, special=False):
+        return list(range(max(1, len(text) // 4)))
+
+    def save_state(self):
+        return None
+
+    def load_state(self, state):
+        pass
+
+
+def fake_app(cv_ms, llm_ms):
+    """
+    backend.app with the heavy libraries replaced by mocks, as the API tests
+    do, and fake CV/retrieval/LLM stages that only take time.
+    """
+    from unittest.mock import MagicMock
+
+    for name in [
+        "llama_cpp",
+        "optimum.onnxruntime",
+        "transformers",
+        "langchain_community.embeddings",
+        "langchain_community.vectorstores",
+        "torch",
+        "PIL",
+        "PIL.Image",
+    ]:
+        sys.modules[name] = MagicMock()
+    sys.path.append(ROOT)
+    from backend import app as app_module
+
+    def classify(images):
+        time.sleep(cv_ms / 1000 * len(images) ** 0.5)  # batching amortizes
+        return [(FAKE_CLASSES[hash(img) % len(FAKE_CLASSES)], 0.9) for img in images]
+
+    app_module.app.router.on_startup = []
+    app_module.decode_image = bytes
+    app_module.cv_batcher.batch_fn = classify
+    app_module.retrieve_context = lambda diagnosis: f"Context about {diagnosis}."
+    app_module.sys_comps["llm"] = FakeLlama(
+        llm_ms / 1000, "Remove infected leaves and apply a copper fungicide."
+    )
+    return app_module.app
+
+
+# ------------------------------- traffic ----------------------------------
+
+
+class Traffic:
+    """Picks the next request from the endpoint mix."""
+
+    def __init__(self, mix, image, unique, questions, seed):
+        self.endpoints = list(mix)
+        self.weights = [mix[e] for e in self.endpoints]
+        self.image = image
+        self.unique = unique
+        self.questions = questions
+        self.sessions = []  # (session_id, diagnosis, context) from /predict
+        self.rng = random.Random(seed)
+        self.count = 0
+
+    def next(self):
+        self.count += 1
+        return self.rng.choices(self.endpoints, self.weights)[0]
+
+    def upload(self):
+        # Trailing bytes change the content hash (skips the upload cache)
+        # without affecting how the JPEG decodes
+        data = self.image + f"{self.count}".encode() if self.unique else self.image
+        return {"file": ("leaf.jpg", data, "image/jpeg")}
+
+    def chat_payload(self):
+        payload = {"question": self.rng.choice(self.questions)}
+        if self.sessions:
+            session_id, diagnosis, context = self.rng.choice(self.sessions)
+            payload.update(session_id=session_id, diagnosis=diagnosis)
+            payload["context"] = context  # used only if the session expired
+        else:
+            payload.update(diagnosis=FAKE_CLASSES[0], context="Leaf spots.")
+        return payload
+
+
+async def send(http, traffic, endpoint):
+    """One request; returns (ok, status)."""
+    if endpoint == "predict":
+        r = await http.post("/predict", files=traffic.upload())
+        body = r.json() if r.status_code == 200 else {}
+        if "session_id" in body:
+            traffic.sessions.append(
+                (body["session_id"], body["diagnosis"], body.get("chat_context", ""))
+            )
+            del traffic.sessions[:-256]
+        return r.status_code == 200 and "error" not in body, r.status_code
+    r = await http.post("/chat", json=traffic.chat_payload())
+    return r.status_code == 200, r.status_code
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = []  # (endpoint, latency_s, ok, status)
+
+    async def timed(self, http, traffic, endpoint, start):
+        try:
+            ok, status = await send(http, traffic, endpoint)
+        except (httpx.HTTPError, ValueError) as e:
+            ok, status = False, type(e).__name__
+        self.samples.append((endpoint, time.perf_counter() - start, ok, status))
+
+
+async def closed_loop(http, traffic, recorder, concurrency, duration):
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        while time.perf_counter() < deadline:
+            endpoint = traffic.next()
+            await recorder.timed(http, traffic, endpoint, time.perf_counter())
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+
+
+async def open_loop(http, traffic, recorder, rate, duration):
+    start = time.perf_counter()
+    scheduled = start
+    tasks = []
+    while True:
+        scheduled += traffic.rng.expovariate(rate)
+        if scheduled - start >= duration:
+            break
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        endpoint = traffic.next()
+        tasks.append(
+            asyncio.create_task(recorder.timed(http, traffic, endpoint, scheduled))
+        )
+    # Requests still in flight are bounded by the client timeout
+    await asyncio.gather(*tasks)
+
+
+# ------------------------------- reporting --------------------------------
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else None
+
+
+def summarize(samples, duration):
+    groups = {"all": samples}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+    report = {}
+    for name, group in groups.items():
+        latencies = [s[1] for s in group if s[2]]
+        errors = len(group) - len(latencies)
+        statuses = {}
+        for s in group:
+            statuses[str(s[3])] = statuses.get(str(s[3]), 0) + 1
+        report[name] = {
+            "requests": len(group),
+            "errors": errors,
+            "error_rate": round(errors / len(group), 4) if group else 0.0,
+            "throughput_rps": round(len(latencies) / duration, 3),
+            "p50_s": percentile(latencies, 0.50),
+            "p95_s": percentile(latencies, 0.95),
+            "p99_s": percentile(latencies, 0.99),
+            "statuses": statuses,
+        }
+    return report
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+DIFF_FIELDS = ("p50_s", "p95_s", "p99_s", "throughput_rps", "error_rate")
+
+
+def diff(old, new):
+    """Per endpoint and metric: (old, new, relative change)."""
+    rows = []
+    for endpoint in new["endpoints"]:
+        if endpoint not in old["endpoints"]:
+            continue
+        for field in DIFF_FIELDS:
+            a = old["endpoints"][endpoint][field]
+            b = new["endpoints"][endpoint][field]
+            change = (b - a) / a if a and b is not None else None
+            rows.append((endpoint, field, a, b, change))
+    return rows
+
+
+def print_diff(old, new):
+    print(f"\n{old.get('commit')} -> {new.get('commit')}")
+    print(f"{'endpoint':<10} {'metric':<15} {'old':>10} {'new':>10} {'change':>8}")
+    for endpoint, field, a, b, change in diff(old, new):
+        change = f"{change:+.1%}" if change is not None else "-"
+        a = "-" if a is None else f"{a:.4g}"
+        b = "-" if b is None else f"{b:.4g}"
+        print(f"{endpoint:<10} {field:<15} {a:>10} {b:>10} {change:>8}")
+
+
+def print_report(report):
+    print(
+        f"\n{'endpoint':<10} {'requests':>8} {'errors':>6} {'req/s':>7} "
+        f"{'p50 s':>7} {'p95 s':>7} {'p99 s':>7}"
+    )
+    for name, r in report.items():
+        p50, p95, p99 = (r[k] or 0 for k in ("p50_s", "p95_s", "p99_s"))
+        print(
+            f"{name:<10} {r['requests']:>8} {r['errors']:>6} "
+            f"{r['throughput_rps']:>7} {p50:>7.3f} {p95:>7.3f} {p99:>7.3f}"
+        )
+
+
+# --------------------------------- main -----------------------------------
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("predict", "chat"):
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def main_async(args):
+    if args.fake:
+        transport = httpx.ASGITransport(app=fake_app(args.fake_cv_ms, args.fake_llm_ms))
+        base_url = "http://fake"
+    else:
+        transport, base_url = None, args.url
+    with open(EVAL_PATH) as f:
+        questions = [json.loads(line)["question"] for line in f if line.strip()]
+    image = args.image_bytes or os.urandom(2048)
+    traffic = Traffic(args.mix, image, args.unique, questions, args.seed)
+    recorder = Recorder()
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url=base_url, timeout=args.timeout
+    ) as http:
+        start = time.perf_counter()
+        if args.mode == "closed":
+            await closed_loop(http, traffic, recorder, args.concurrency, args.duration)
+        else:
+            await open_loop(http, traffic, recorder, args.rate, args.duration)
+        elapsed = time.perf_counter() - start
+    return summarize(recorder.samples, elapsed), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flora-Bot API load test.")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--fake", action="store_true", help="Run offline, in-process")
+    parser.add_argument("--fake-cv-ms", type=float, default=20.0)
+    parser.add_argument("--fake-llm-ms", type=float, default=200.0)
+    parser.add_argument("--image", help="Leaf photo to upload (random bytes if unset)")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed loop")
+    parser.add_argument("--rate", type=float, default=2.0, help="Open loop, req/s")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("predict=1,chat=1"))
+    parser.add_argument(
+        "--unique", action="store_true", help="Make every upload miss the cache"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmarks/results/loadtest.json")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.diff:
+        reports = []
+        for path in args.diff:
+            with open(path) as f:
+                reports.append(json.load(f))
+        print_diff(*reports)
+        return
+
+    args.image_bytes = None
+    if args.image:
+        with open(args.image, "rb") as f:
+            args.image_bytes = f.read()
+
+    target = "fake backend" if args.fake else args.url
+    load = (
+        f"{args.concurrency} clients" if args.mode == "closed" else f"{args.rate} req/s"
+    )
+    print(f"⏱️ {args.mode} loop, {load}, {args.duration:.0f}s against {target}...")
+    endpoints, elapsed = asyncio.run(main_async(args))
+    print_report(endpoints)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "target": "fake" if args.fake else args.url,
+        "mode": args.mode,
+        "concurrency": args.concurrency if args.mode == "closed" else None,
+        "rate": args.rate if args.mode == "open" else None,
+        "mix": args.mix,
+        "duration_s": round(elapsed, 2),
+        "endpoints": endpoints,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_diff(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
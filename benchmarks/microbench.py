@@ -0,0 +1,440 @@
+"""
+Microbenchmarks for the hot paths outside the HTTP layer.
+
+Stages:
+
+    load_documents  backend/ingest.load_documents on a synthetic JSON corpus
+    split_documents backend/ingest.split_documents on those documents
+    embed           MiniLM embed_documents on up to --embed-chunks chunks
+    vector_store    backend/ingest.build_vector_store (Chroma + embeddings)
+    bm25_index      BM25 half of the hybrid retriever in ingest.verify_pipeline
+    hybrid_query    BM25 + Chroma ensemble queries (ms/item is per query)
+    image_decode    ImagePreprocessor.load on synthetic JPEGs
+    image_batch     ImagePreprocessor.batch on the decoded images
+    llm_generate    the run_eval.py LLM call (few-shot prompt, 150 tokens)
+
+Each stage records the median wall time of ``--repeat`` runs, then one more
+run under tracemalloc for the peak of Python allocations. Native buffers
+(numpy, ONNX, llama.cpp) are covered by the RSS growth column instead. Stages
+whose dependencies or models are missing are reported as skipped.
+
+    python benchmarks/microbench.py --chunks 10000 --output base.json
+    python benchmarks/microbench.py --chunks 10000 --baseline base.json --tolerance 0.2
+
+With ``--baseline``, the run fails (exit 1) if any stage measured at the same
+scale is more than ``--tolerance`` slower. ``--embedder hash`` replaces
+MiniLM in embed/vector_store/hybrid_query with a hashing embedder. That way Chroma
+and BM25 can be measured at 100k-1M chunks without hours of embedding.
+"""
+
+import argparse
+import datetime
+import gc
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from backend.telemetry import rss_bytes  # noqa: E402
+
+MODEL_DIR = os.getenv("MODEL_DIR", "backend/models")
+GGUF_PATH = os.path.join(MODEL_DIR, "tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf")
+EVAL_PATH = os.path.join(ROOT, "data", "eval.jsonl")
+
+CLASSES = [
+    "Apple___Apple_scab",
+    "Apple___Black_rot",
+    "Corn_(maize)___Common_rust_",
+    "Grape___Black_rot",
+    "Potato___Late_blight",
+    "Tomato___Bacterial_spot",
+    "Tomato___Early_blight",
+    "Tomato___healthy",
+]
+WORDS = (
+    "leaf leaves lesion lesions spot spots fungal fungus bacterial blight rust "
+    "scab mildew copper fungicide sulfur captan mancozeb spray prune remove "
+    "infected debris humidity rain splash spores overwinter resistant variety "
+    "rotate crops irrigation drip airflow canopy yellowing wilting margin "
+    "concentric rings tomato potato apple grape corn stem fruit early late"
+).split()
+QUERIES = [
+    "tomato bacterial spot treatment",
+    "how to stop apple scab spores",
+    "copper fungicide for late blight",
+    "rust pustules on corn leaves",
+    "prevent black rot on grapes",
+]
+
+
+class SkipStage(Exception):
+    """A stage cannot run here (missing dependency or model)."""
+
+
+class HashEmbeddings:
+    """Deterministic bag-of-words hashing embedder (LangChain interface)."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _embed(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            vec[zlib.crc32(word.encode()) % self.dim] += 1.0
+        return (vec / max(np.linalg.norm(vec), 1e-12)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+# ------------------------------ synthetic data ------------------------------
+
+
+def synthetic_corpus(directory, chunks, seed, per_file=1000):
+    """
+    JSON files in the layout of data/dataset_json, with entries sized so that
+    split_documents yields about ``chunks`` chunks.
+    """
+    rng = random.Random(seed)
+    entries = []
+    for i in range(chunks):
+        sentences = []
+        while sum(len(s) for s in sentences) < 650:
+            words = rng.choices(WORDS, k=rng.randint(8, 16))
+            sentences.append(" ".join(words).capitalize() + ".")
+        entries.append(
+            {
+                "model_class": CLASSES[i % len(CLASSES)],
+                "content": " ".join(sentences),
+                "source_url": f"https://example.org/{i}",
+                "is_healthy": CLASSES[i % len(CLASSES)].endswith("healthy"),
+            }
+        )
+    for start in range(0, len(entries), per_file):
+        path = os.path.join(directory, f"corpus_{start // per_file:05d}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(entries[start : start + per_file], f)
+
+
+def synthetic_jpegs(n, size, seed):
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(n):
+        # Smooth noise compresses like a photo rather than like static
+        small = rng.integers(0, 256, (size[1] // 8, size[0] // 8, 3), dtype=np.uint8)
+        img = Image.fromarray(small).resize(size, Image.BILINEAR)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=90)
+        images.append(buf.getvalue())
+    return images
+
+
+# ---------------------------------- stages ----------------------------------
+
+
+def import_ingest():
+    try:
+        from backend import ingest
+    except ImportError as e:
+        raise SkipStage(f"ingest dependencies missing: {e}")
+    return ingest
+
+
+def stage_load_documents(ctx):
+    ingest = import_ingest()
+    return (lambda: ingest.load_documents(ctx["corpus_dir"])), None
+
+
+def stage_split_documents(ctx):
+    ingest = import_ingest()
+    if "load_documents" not in ctx:
+        raise SkipStage("needs load_documents")
+    documents = ctx["load_documents"]
+    return (lambda: ingest.split_documents(documents)), len(documents)
+
+
+def stage_embed(ctx):
+    if "split_documents" not in ctx:
+        raise SkipStage("needs split_documents")
+    texts = [c.page_content for c in ctx["split_documents"][: ctx["embed_chunks"]]]
+    embedder = ctx["embedder"]()
+    return (lambda: embedder.embed_documents(texts)), len(texts)
+
+
+def stage_vector_store(ctx):
+    ingest = import_ingest()
+    if "split_documents" not in ctx:
+        raise SkipStage("needs split_documents")
+    chunks = ctx["split_documents"]
+    embedder = ctx["embedder"]()
+    # build_vector_store constructs its own embedder; hand it ours
+    ingest.HuggingFaceEmbeddings = lambda model_name: embedder
+    output = os.path.join(ctx["workdir"], "chroma")
+    return (lambda: ingest.build_vector_store(chunks, output)), len(chunks)
+
+
+def stage_bm25_index(ctx):
+    ingest = import_ingest()
+    if "split_documents" not in ctx:
+        raise SkipStage("needs split_documents")
+    chunks = ctx["split_documents"]
+
+    def build():
+        retriever = ingest.BM25Retriever.from_documents(chunks)
+        retriever.k = 3
+        return retriever
+
+    return build, len(chunks)
+
+
+def stage_hybrid_query(ctx):
+    ingest = import_ingest()
+    if "bm25_index" not in ctx or "vector_store" not in ctx:
+        raise SkipStage("needs bm25_index and vector_store")
+    ensemble = ingest.EnsembleRetriever(
+        retrievers=[
+            ctx["bm25_index"],
+            ctx["vector_store"].as_retriever(search_kwargs={"k": 3}),
+        ],
+        weights=[0.4, 0.6],
+    )
+    queries = QUERIES * (ctx["queries"] // len(QUERIES) + 1)
+    queries = queries[: ctx["queries"]]
+    return (lambda: [ensemble.invoke(q) for q in queries]), len(queries)
+
+
+def stage_image_decode(ctx):
+    try:
+        from backend.preprocessing import ImagePreprocessor
+    except ImportError as e:
+        raise SkipStage(str(e))
+    preprocessor = ImagePreprocessor()
+    images = ctx["jpegs"]
+    return (lambda: [preprocessor.load(data) for data in images]), len(images)
+
+
+def stage_image_batch(ctx):
+    from backend.preprocessing import ImagePreprocessor
+
+    if "image_decode" not in ctx:
+        raise SkipStage("needs image_decode")
+    preprocessor = ImagePreprocessor()
+    images = ctx["image_decode"]
+    return (lambda: preprocessor.batch(images)), len(images)
+
+
+def stage_llm_generate(ctx):
+    if not os.path.exists(GGUF_PATH):
+        raise SkipStage(f"no model at {GGUF_PATH}")
+    try:
+        from llama_cpp import Llama
+        from experiments.prompts import few_shot
+    except ImportError as e:
+        raise SkipStage(str(e))
+    llm = Llama(model_path=GGUF_PATH, n_ctx=2048, n_threads=4, verbose=False)
+    with open(EVAL_PATH) as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    prompts = [
+        few_shot.get_prompt(item["question"], item.get("context_class"))
+        for item in items[: ctx["llm_prompts"]]
+    ]
+
+    def run():
+        for prompt in prompts:
+            llm.reset()
+            llm(prompt, max_tokens=150, stop=["Question:", "Context:"], echo=False)
+
+    return run, len(prompts)
+
+
+STAGES = {
+    "load_documents": stage_load_documents,
+    "split_documents": stage_split_documents,
+    "embed": stage_embed,
+    "vector_store": stage_vector_store,
+    "bm25_index": stage_bm25_index,
+    "hybrid_query": stage_hybrid_query,
+    "image_decode": stage_image_decode,
+    "image_batch": stage_image_batch,
+    "llm_generate": stage_llm_generate,
+}
+
+
+# --------------------------------- measuring --------------------------------
+
+
+def measure(fn, items, repeat, memory):
+    times = []
+    result = None
+    rss_before = rss_bytes()
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    record = {
+        "seconds": round(statistics.median(times), 6),
+        "runs": [round(t, 6) for t in times],
+        "items": items,
+        "per_item_ms": (
+            round(statistics.median(times) / items * 1000, 4) if items else None
+        ),
+        "rss_growth_mb": round((rss_bytes() - rss_before) / 2**20, 1),
+        "peak_python_mb": None,
+    }
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            record["peak_python_mb"] = round(
+                tracemalloc.get_traced_memory()[1] / 2**20, 2
+            )
+        finally:
+            tracemalloc.stop()
+    return result, record
+
+
+def check_regressions(baseline, results, tolerance):
+    """Stages slower than the baseline by more than ``tolerance`` (same scale)."""
+    regressions = []
+    for name, record in results.items():
+        old = baseline.get("stages", {}).get(name)
+        if not old or "seconds" not in old or "seconds" not in record:
+            continue
+        if old.get("items") != record.get("items"):
+            continue  # different scale, not comparable
+        change = record["seconds"] / old["seconds"] - 1 if old["seconds"] else 0.0
+        record["baseline_seconds"] = old["seconds"]
+        record["change"] = round(change, 4)
+        if change > tolerance:
+            regressions.append((name, old["seconds"], record["seconds"], change))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flora-Bot microbenchmarks.")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=None)
+    parser.add_argument("--chunks", type=int, default=10000, help="Corpus size")
+    parser.add_argument("--embed-chunks", type=int, default=2000)
+    parser.add_argument("--embedder", choices=["minilm", "hash"], default="minilm")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--image-size", type=int, nargs=2, default=[640, 480])
+    parser.add_argument("--llm-prompts", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="Earlier report to check against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--output", default="benchmarks/results/microbench.json")
+    args = parser.parse_args()
+
+    def minilm():
+        try:
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+        except ImportError as e:
+            raise SkipStage(str(e))
+        return HuggingFaceEmbeddings(
+            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        )
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        corpus_dir = os.path.join(workdir, "corpus")
+        os.makedirs(corpus_dir)
+        print(f"🧪 Generating {args.chunks} corpus entries, {args.images} JPEGs...")
+        synthetic_corpus(corpus_dir, args.chunks, args.seed)
+        ctx = {
+            "workdir": workdir,
+            "corpus_dir": corpus_dir,
+            "jpegs": synthetic_jpegs(args.images, tuple(args.image_size), args.seed),
+            "embedder": HashEmbeddings if args.embedder == "hash" else minilm,
+            "embed_chunks": args.embed_chunks,
+            "queries": args.queries,
+            "llm_prompts": args.llm_prompts,
+        }
+
+        for name in args.stages or STAGES:
+            try:
+                fn, items = STAGES[name](ctx)
+                ctx[name], record = measure(fn, items, args.repeat, not args.no_memory)
+                if record["items"] is None:
+                    record["items"] = len(ctx[name])
+                    record["per_item_ms"] = round(
+                        record["seconds"] / max(1, record["items"]) * 1000, 4
+                    )
+            except SkipStage as e:
+                record = {"skipped": str(e)}
+            results[name] = record
+            print(f"⏱️ {name}: {json.dumps(record)}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = check_regressions(json.load(f), results, args.tolerance)
+
+    print(
+        f"\n{'stage':<16} {'items':>8} {'seconds':>9} {'ms/item':>9} "
+        f"{'py peak MB':>10} {'change':>8}"
+    )
+    for name, r in results.items():
+        if "skipped" in r:
+            print(f"{name:<16} skipped: {r['skipped']}")
+            continue
+        change = f"{r['change']:+.1%}" if "change" in r else "-"
+        print(
+            f"{name:<16} {r['items']:>8} {r['seconds']:>9.4f} "
+            f"{r['per_item_ms'] or 0:>9.4f} {r['peak_python_mb'] or 0:>10} {change:>8}"
+        )
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("baseline",)},
+        "stages": results,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Results saved to {args.output}")
+
+    if regressions:
+        for name, old, new, change in regressions:
+            print(f"❌ {name} regressed: {old:.4f}s -> {new:.4f}s ({change:+.1%})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
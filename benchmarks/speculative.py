@@ -0,0 +1,166 @@
+"""
+Prompt-lookup speculative decoding vs plain decoding on data/eval.jsonl.
+
+Every question is answered with the served few-shot prompt and the retrieved
+context packed as the API does, once by plain greedy decoding and once per
+draft setting. Greedy verification accepts a draft token only if it is the
+token greedy decoding would have produced, so outputs should be identical;
+the report gives the parity rate alongside completion tokens/s and ROUGE-L:
+
+    python benchmarks/speculative.py --draft-tokens 2 4 10
+    python benchmarks/speculative.py --no-rag   # context = class name only
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+from rouge_score import rouge_scorer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from backend.context_packing import ContextPacker  # noqa: E402
+from backend.prompts import PROMPTS  # noqa: E402
+from backend.retrieval import search_chunks  # noqa: E402
+
+MODEL_DIR = os.getenv("MODEL_DIR", "backend/models")
+GGUF_PATH = os.path.join(MODEL_DIR, "tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf")
+RAG_DIR = os.path.join(MODEL_DIR, "flora_rag_db")
+TEMPLATE = PROMPTS["flora_few_shot"]
+
+
+def load_llm(draft_model=None):
+    return Llama(
+        model_path=GGUF_PATH,
+        n_ctx=2048,
+        n_threads=4,
+        draft_model=draft_model,
+        verbose=False,
+    )
+
+
+def build_prompts(data, llm, rag, budget):
+    """The prompt /chat would send for each eval question."""
+    if rag:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        from langchain_community.vectorstores import Chroma
+
+        embed_fn = HuggingFaceEmbeddings(
+            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        )
+        vectordb = Chroma(persist_directory=RAG_DIR, embedding_function=embed_fn)
+        packer = ContextPacker(
+            embed_fn.embed_documents,
+            lambda text: len(llm.tokenize(text.encode("utf-8"), add_bos=False)),
+            budget=budget,
+        )
+
+    prompts = []
+    for item in data:
+        context = item.get("context_class") or ""
+        if rag and context:
+            context = packer.pack(search_chunks(vectordb, context), item["question"])
+        prompts.append(TEMPLATE.render(context=context, question=item["question"]))
+    return prompts
+
+
+def run(llm, prompts, max_tokens):
+    """Greedy answers, with completion tokens and wall time per prompt."""
+    answers = []
+    for prompt in prompts:
+        llm.reset()  # every prompt prefilled from scratch, as in a cold run
+        start = time.perf_counter()
+        output = llm(prompt, max_tokens=max_tokens, temperature=0.0, stop=TEMPLATE.stop)
+        answers.append(
+            {
+                "text": output["choices"][0]["text"].strip(),
+                "tokens": output["usage"]["completion_tokens"],
+                "seconds": time.perf_counter() - start,
+            }
+        )
+    return answers
+
+
+def summarize(name, answers, ideals, baseline=None):
+    """Completion tokens per wall second (prefill included), ROUGE-L, parity."""
+    scorer = rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
+    tokens = sum(a["tokens"] for a in answers)
+    rouge = [
+        scorer.score(ideal, a["text"])["rougeL"].fmeasure
+        for a, ideal in zip(answers, ideals)
+    ]
+    result = {
+        "decoding": name,
+        "completion_tokens": tokens,
+        "tokens_per_second": round(tokens / sum(a["seconds"] for a in answers), 2),
+        "avg_rouge_l": round(sum(rouge) / len(rouge), 4),
+        "parity": 1.0,
+        "speedup": 1.0,
+    }
+    if baseline is not None:
+        same = sum(a["text"] == b["text"] for a, b in zip(answers, baseline["answers"]))
+        result["parity"] = round(same / len(answers), 4)
+        result["speedup"] = round(
+            result["tokens_per_second"] / baseline["tokens_per_second"], 3
+        )
+    result["answers"] = answers
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speculative decoding benchmark.")
+    parser.add_argument("--data", default="data/eval.jsonl")
+    parser.add_argument("--draft-tokens", type=int, nargs="+", default=[2, 4, 10])
+    parser.add_argument("--ngram", type=int, default=2, help="Max n-gram size")
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--context-budget", type=int, default=256)
+    parser.add_argument(
+        "--no-rag", action="store_true", help="Use the class name as context"
+    )
+    parser.add_argument("--output", default="benchmarks/results/speculative.json")
+    args = parser.parse_args()
+
+    with open(args.data) as f:
+        data = [json.loads(line) for line in f if line.strip()]
+    ideals = [item["ideal_answer"] for item in data]
+
+    llm = load_llm()
+    prompts = build_prompts(data, llm, not args.no_rag, args.context_budget)
+    print(f"⏱️ greedy: {len(prompts)} prompts...")
+    baseline = summarize("greedy", run(llm, prompts, args.max_tokens), ideals)
+    results = [baseline]
+    del llm
+
+    for n in args.draft_tokens:
+        name = f"prompt_lookup(ngram={args.ngram}, draft={n})"
+        print(f"⏱️ {name}...")
+        llm = load_llm(
+            LlamaPromptLookupDecoding(max_ngram_size=args.ngram, num_pred_tokens=n)
+        )
+        results.append(
+            summarize(name, run(llm, prompts, args.max_tokens), ideals, baseline)
+        )
+        del llm
+
+    print(
+        f"\n{'decoding':<36} {'tok/s':>7} {'speedup':>7} {'ROUGE-L':>7} {'parity':>6}"
+    )
+    for r in results:
+        print(
+            f"{r['decoding']:<36} {r['tokens_per_second']:>7} "
+            f"{r['speedup']:>7} {r['avg_rouge_l']:>7} {r['parity']:>6}"
+        )
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📄 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Memory and throughput of the API as the number of worker processes grows.
+
+For each worker count this starts the server, waits for /health/ready,
+records memory per process, then drives /predict with a closed-loop client
+for a fixed time:
+
+    python benchmarks/workers.py --image leaf.jpg --workers 1 2 4
+    python benchmarks/workers.py --image leaf.jpg --mode uvicorn   # baseline
+
+``--mode preload`` runs ``python -m backend.serve`` (weights loaded once and
+shared by forked workers); ``--mode uvicorn`` runs ``uvicorn --workers``
+(every worker loads its own copy). RSS counts shared pages in every process,
+so the number to compare is PSS (shared pages split between the processes
+mapping them) and the total PSS across master + workers.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def children(pid):
+    """Direct child pids of ``pid`` (Linux)."""
+    found = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                found.extend(int(c) for c in f.read().split())
+        except OSError:
+            pass
+    return found
+
+
+def memory(pid):
+    """RSS, PSS and private (USS) bytes of one process from smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def start_server(mode, workers, port):
+    if mode == "preload":
+        cmd = [sys.executable, "-m", "backend.serve", "--workers", str(workers)]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "backend.app:app"]
+        cmd += ["--workers", str(workers), "--host", "0.0.0.0"]
+    cmd += ["--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=ROOT)
+
+
+def wait_ready(base_url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health/ready", timeout=2).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(1)
+    return False
+
+
+async def drive(base_url, image, concurrency, duration, unique):
+    """Closed loop: ``concurrency`` clients, each sending back-to-back requests."""
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def client(n):
+        nonlocal errors
+        async with httpx.AsyncClient(base_url=base_url, timeout=120) as http:
+            i = 0
+            while time.perf_counter() < deadline:
+                # Trailing bytes change the content hash (skips the upload
+                # cache) without affecting how the JPEG decodes
+                data = image + f"{n}-{i}".encode() if unique else image
+                i += 1
+                start = time.perf_counter()
+                try:
+                    r = await http.post("/predict", files={"file": ("leaf.jpg", data)})
+                    ok = r.status_code == 200 and "error" not in r.json()
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+    await asyncio.gather(*(client(n) for n in range(concurrency)))
+    latencies.sort()
+
+    def pct(q):
+        return latencies[int(q * (len(latencies) - 1))] if latencies else None
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / duration, 2),
+        "p50_s": pct(0.5),
+        "p95_s": pct(0.95),
+    }
+
+
+def run(args, workers):
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = start_server(args.mode, workers, args.port)
+    try:
+        if not wait_ready(base_url, args.startup_timeout):
+            raise RuntimeError(f"server with {workers} workers never became ready")
+        procs = [server.pid] + children(server.pid)
+        mem = {pid: memory(pid) for pid in procs}
+        load = asyncio.run(
+            drive(
+                base_url, args.image_bytes, args.concurrency, args.duration, args.unique
+            )
+        )
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    worker_mem = [m for pid, m in mem.items() if pid != server.pid]
+
+    def mib(key, values):
+        return round(max(m[key] for m in values) / 2**20, 1) if values else None
+
+    return {
+        "mode": args.mode,
+        "workers": workers,
+        "total_rss_mib": round(sum(m["rss"] for m in mem.values()) / 2**20, 1),
+        "total_pss_mib": round(sum(m["pss"] for m in mem.values()) / 2**20, 1),
+        "worker_rss_mib": mib("rss", worker_mem),
+        "worker_pss_mib": mib("pss", worker_mem),
+        "worker_uss_mib": mib("uss", worker_mem),
+        **load,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker scaling benchmark.")
+    parser.add_argument("--image", required=True, help="Leaf photo to upload")
+    parser.add_argument("--mode", choices=["preload", "uvicorn"], default="preload")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument(
+        "--unique", action="store_true", help="Make every upload miss the cache"
+    )
+    parser.add_argument("--output", default="benchmarks/results/workers.json")
+    args = parser.parse_args()
+    with open(args.image, "rb") as f:
+        args.image_bytes = f.read()
+
+    results = []
+    for workers in args.workers:
+        print(f"⏱️ {args.mode}: {workers} worker(s)...")
+        results.append(run(args, workers))
+        print(json.dumps(results[-1]))
+
+    print(
+        f"\n{'workers':>7} {'total PSS':>10} {'worker PSS':>10} "
+        f"{'worker USS':>10} {'req/s':>7} {'p95 s':>7}"
+    )
+    for r in results:
+        print(
+            f"{r['workers']:>7} {r['total_pss_mib']:>10} {r['worker_pss_mib']:>10} "
+            f"{r['worker_uss_mib']:>10} {r['throughput_rps']:>7} "
+            f"{r['p95_s'] or 0:>7.3f}"
+        )
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📄 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,12 @@
+from backend.prompts import PROMPTS
+
+
 def get_prompt(question, context_class=None):
     """
     Meta-Prompting Strategy (Persona-based).
     Defines a specific persona, rules, and objectives for the model.
+    Templates live in backend/prompts.py, shared with the API.
     """
-    system_instruction = """
-ROLE: You are Dr. Flora, an expert Plant Pathologist with 20 years of experience in agricultural diagnostics.
-
-OBJECTIVE: Provide accurate, helpful, and concise advice to farmers and gardeners about plant diseases.
-
-RULES:
-1. Identify the disease clearly based on the provided context.
-2. Provide actionable treatment or prevention steps.
-3. Use a professional but encouraging tone.
-4. If the plant is healthy, reassure the user.
-5. Do not hallucinate treatments; stick to standard agricultural practices (fungicides, sanitation, resistant varieties).
-
-OUTPUT FORMAT:
-- Diagnosis: [Disease Name]
-- Advice: [Actionable Steps]
-"""
-
     if context_class:
-        prompt = f"""{system_instruction}
-
-Context: {context_class}
-User Question: {question}
-
-Response:"""
-    else:
-        prompt = f"""{system_instruction}
-
-User Question: {question}
-
-Response:"""
-    return prompt
+        return PROMPTS["meta_prompt"].render(context=context_class, question=question)
+    return PROMPTS["meta_prompt_no_context"].render(question=question)
@@ -11,11 +11,16 @@ from rouge_score import rouge_scorer
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from experiments.prompts import zero_shot, few_shot, meta_prompt
+from backend.context_packing import ContextPacker
+from backend.prefix_cache import PrefixCache
+from backend.prompts import PROMPTS
+from backend.retrieval import search_chunks
 
 # Configuration
 MODEL_DIR = os.getenv("MODEL_DIR", "backend/models")
 GGUF_FILE = "tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf"
 GGUF_PATH = os.path.join(MODEL_DIR, GGUF_FILE)
+RAG_DIR = os.path.join(MODEL_DIR, "flora_rag_db")
 DATA_PATH = "data/eval.jsonl"
 
 # Map strategy names to modules
@@ -30,7 +35,18 @@ def load_model():
     return Llama(model_path=GGUF_PATH, n_ctx=2048, n_threads=4, verbose=False)
 
 
-def evaluate(strategy_name):
+def load_retriever():
+    """The API's Chroma store and MiniLM embeddings, for --rag-context."""
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from langchain_community.vectorstores import Chroma
+
+    embed_fn = HuggingFaceEmbeddings(
+        model_name="sentence-transformers/all-MiniLM-L6-v2"
+    )
+    return Chroma(persist_directory=RAG_DIR, embedding_function=embed_fn), embed_fn
+
+
+def evaluate(strategy_name, rag_context=False, context_budget=None):
     print(f"🧪 Starting Evaluation for Strategy: {strategy_name}")
 
     # 1. Setup
@@ -40,6 +56,22 @@ def evaluate(strategy_name):
 
     results = []
     rouge_scores = []
+    prefill_saved = []
+    prefilled = []
+
+    # Optionally give the model the retrieved chunks the API would use, either
+    # with the old 500-character cut or packed into a token budget
+    if rag_context:
+        vectordb, embed_fn = load_retriever()
+        packer = ContextPacker(
+            embed_fn.embed_documents,
+            lambda text: len(llm.tokenize(text.encode("utf-8"), add_bos=False)),
+        )
+
+    # Pre-evaluate the strategy's static prefixes once, as the API does
+    prefix_cache = PrefixCache(llm)
+    for template_name in (strategy_name, f"{strategy_name}_no_context"):
+        prefix_cache.warm(PROMPTS[template_name])
 
     # 2. Load Data
     with open(DATA_PATH, "r") as f:
@@ -51,14 +83,28 @@ def evaluate(strategy_name):
     with mlflow.start_run(run_name=f"eval_{strategy_name}"):
         mlflow.log_param("strategy", strategy_name)
         mlflow.log_param("model", GGUF_FILE)
+        mlflow.log_param("rag_context", rag_context)
+        mlflow.log_param("context_budget", context_budget or "chars_500")
 
         for i, item in enumerate(data):
             question = item["question"]
             context = item.get("context_class")
             ideal = item["ideal_answer"]
+            if rag_context and context:
+                chunks = search_chunks(vectordb, context)
+                if context_budget:
+                    context = packer.pack(chunks, question, context_budget)
+                else:
+                    context = "\n".join(c[:500] for c in chunks)
 
             # Generate Prompt
             prompt = prompt_module.get_prompt(question, context)
+            template = PROMPTS[
+                strategy_name if context else f"{strategy_name}_no_context"
+            ]
+            prefill_saved.append(prefix_cache.restore(template, prompt))
+            n_prompt = len(llm.tokenize(prompt.encode("utf-8"), special=True))
+            prefilled.append(n_prompt - prefill_saved[-1])
 
             # Run Model
             output = llm(
@@ -89,12 +135,19 @@ def evaluate(strategy_name):
         # 4. Log Aggregate Metrics
         avg_rouge = sum(rouge_scores) / len(rouge_scores)
         mlflow.log_metric("avg_rouge_l", avg_rouge)
+        mlflow.log_metric(
+            "avg_prefill_tokens_saved", sum(prefill_saved) / len(prefill_saved)
+        )
+        mlflow.log_metric("avg_prefilled_tokens", sum(prefilled) / len(prefilled))
         print(f"✅ Finished. Average ROUGE-L: {avg_rouge:.4f}")
 
         # 5. Save Results
         results_dir = "experiments/results"
         os.makedirs(results_dir, exist_ok=True)
-        output_file = os.path.join(results_dir, f"results_{strategy_name}.csv")
+        suffix = ""
+        if rag_context:
+            suffix = f"_rag_{context_budget}" if context_budget else "_rag_chars"
+        output_file = os.path.join(results_dir, f"results_{strategy_name}{suffix}.csv")
         df = pd.DataFrame(results)
         df.to_csv(output_file, index=False)
         mlflow.log_artifact(output_file)
@@ -106,6 +159,18 @@ if __name__ == "__main__":
     parser.add_argument(
         "strategy", choices=STRATEGIES.keys(), help="Prompting strategy to evaluate"
     )
+    parser.add_argument(
+        "--rag-context",
+        action="store_true",
+        help="Use the retrieved knowledge-base chunks as context, as /predict does",
+    )
+    parser.add_argument(
+        "--context-budget",
+        type=int,
+        default=None,
+        help="Pack the retrieved context into this many tokens "
+        "(default: the old 500-characters-per-chunk cut)",
+    )
     args = parser.parse_args()
 
-    evaluate(args.strategy)
+    evaluate(args.strategy, args.rag_context, args.context_budget)
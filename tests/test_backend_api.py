@@ -2,22 +2,40 @@ import sys
 import os
 from unittest.mock import MagicMock
 
-# 1. Mock heavy dependencies BEFORE importing the app
-# This is crucial because the app imports them at the top level
-sys.modules["llama_cpp"] = MagicMock()
-sys.modules["optimum.onnxruntime"] = MagicMock()
-sys.modules["transformers"] = MagicMock()
-sys.modules["langchain_community.embeddings"] = MagicMock()
-sys.modules["langchain_community.vectorstores"] = MagicMock()
-sys.modules["torch"] = MagicMock()
-sys.modules["PIL"] = MagicMock()
-sys.modules["PIL.Image"] = MagicMock()
-
-# 2. Add project root to sys.path so we can import backend
+# 1. Add project root to sys.path so we can import backend
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# 2. Mock heavy dependencies while the app is imported
+# This is crucial because the app imports them at the top level. Modules that
+# other test files use for real are imported first, and the mocks are taken
+# out again afterwards, so only backend.app keeps them (test_preprocessing
+# compares against the real PIL and transformers in the same session).
+try:
+    import backend.preprocessing  # noqa: F401
+except ImportError:  # no Pillow: it gets the mock like the app
+    pass
+
+MOCKED_MODULES = (
+    "llama_cpp",
+    "optimum.onnxruntime",
+    "transformers",
+    "langchain_community.embeddings",
+    "langchain_community.vectorstores",
+    "torch",
+    "PIL",
+    "PIL.Image",
+)
+real_modules = {name: sys.modules.get(name) for name in MOCKED_MODULES}
+sys.modules.update({name: MagicMock() for name in MOCKED_MODULES})
+
 # 3. Import the app
 from backend.app import app, sys_comps  # noqa: E402
+
+for name, module in real_modules.items():
+    if module is None:
+        del sys.modules[name]
+    else:
+        sys.modules[name] = module
 from fastapi.testclient import TestClient  # noqa: E402
 
 # 4. Disable the startup event
@@ -34,6 +52,33 @@ def test_app_initialization():
     assert app.title == "Flora-Bot API"
 
 
+def test_health_endpoints():
+    """
+    Liveness is unconditional; readiness lists components and blocks
+    endpoints whose components are still loading.
+    """
+    from backend.app import readiness
+
+    assert client.get("/health/live").json() == {"status": "alive"}
+    assert client.get("/health/ready").status_code == 200
+
+    readiness.register("llm")
+    try:
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["components"]["llm"]["status"] == "pending"
+        assert response.json()["endpoints"] == {"predict": False, "chat": False}
+        assert client.get("/health").status_code == 200
+
+        response = client.post(
+            "/chat", json={"question": "q", "context": "c", "diagnosis": "d"}
+        )
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+    finally:
+        readiness.components.clear()
+
+
 def test_chat_endpoint():
     """
     Test the /chat endpoint with mocked LLM.
@@ -58,3 +103,482 @@ def test_chat_endpoint():
     data = response.json()
     assert "answer" in data
     assert data["answer"] == "This is a mocked response."
+
+
+def test_chat_stream_endpoint():
+    """
+    Test that /chat/stream emits one SSE token event per chunk and a done event.
+    """
+
+    def fake_llm(prompt, **kwargs):
+        assert kwargs["stream"] is True
+        assert kwargs["stop"] == ["<|user|>", "<|system|>"]
+        return iter(
+            [{"choices": [{"text": " Spray"}]}, {"choices": [{"text": " copper."}]}]
+        )
+
+    sys_comps["llm"] = MagicMock(side_effect=fake_llm)
+
+    payload = {
+        "question": "What should I spray?",
+        "context": "Some context about plants.",
+        "diagnosis": "Healthy",
+    }
+
+    response = client.post("/chat/stream", json=payload)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    body = response.text
+    assert body.count("event: token") == 2
+    assert 'event: done\ndata: {"answer": "Spray copper."}' in body
+
+
+def test_predict_stream_cold_and_cached(monkeypatch):
+    """
+    /predict/stream streams the explanation token by token the first time
+    and answers a repeat from the explanation cache in a single token event.
+    """
+    import json
+    import re
+
+    from backend import app as app_module
+
+    monkeypatch.setattr(app_module, "decode_image", lambda data: data)
+    monkeypatch.setattr(
+        app_module.cv_batcher,
+        "batch_fn",
+        lambda images: [("Grape___Black_rot", 0.75) for _ in images],
+    )
+    monkeypatch.setattr(
+        app_module, "retrieve_context", lambda d: f"{d} stream test notes"
+    )
+
+    def fake_llm(prompt, **kwargs):
+        assert kwargs["stream"] is True
+        return iter(
+            [{"choices": [{"text": " Remove"}]}, {"choices": [{"text": " mummies."}]}]
+        )
+
+    sys_comps["llm"] = MagicMock(side_effect=fake_llm)
+    files = {"file": ("leaf.jpg", b"rot", "image/jpeg")}
+
+    def events(body):
+        return re.findall(r"^event: (\w+)\ndata: (.*)$", body, re.M)
+
+    cold = events(client.post("/predict/stream", files=files).text)
+    assert [name for name, _ in cold] == ["diagnosis", "token", "token", "done"]
+    assert json.loads(cold[0][1])["diagnosis"] == "Grape___Black_rot"
+    assert json.loads(cold[-1][1]) == {"explanation": "Remove mummies."}
+
+    cached = events(client.post("/predict/stream", files=files).text)
+    assert [name for name, _ in cached] == ["diagnosis", "token", "done"]
+    assert json.loads(cached[1][1]) == {"text": "Remove mummies."}
+    assert json.loads(cached[-1][1]) == {"explanation": "Remove mummies."}
+    assert sys_comps["llm"].call_count == 1
+
+
+def test_prediction_cache_follows_the_retrieval_index(monkeypatch):
+    """A retried upload is re-diagnosed once the retrieval table's index changes."""
+    from types import SimpleNamespace
+
+    from backend import app as app_module
+
+    classify = MagicMock(
+        side_effect=lambda images: [("Peach___healthy", 0.9)] * len(images)
+    )
+    monkeypatch.setattr(app_module, "decode_image", lambda data: data)
+    monkeypatch.setattr(app_module.cv_batcher, "batch_fn", classify)
+    contexts = iter(["index v1 notes", "index v2 notes"])
+    monkeypatch.setattr(app_module, "retrieve_context", lambda d: next(contexts))
+    table = SimpleNamespace(fingerprint="v1")
+    monkeypatch.setitem(sys_comps, "retrieval_table", table)
+    sys_comps["llm"] = MagicMock(return_value={"choices": [{"text": " Fine."}]})
+
+    files = {"file": ("leaf.jpg", b"peach retry", "image/jpeg")}
+    assert client.post("/predict", files=files).json()["chat_context"] == (
+        "index v1 notes"
+    )
+    client.post("/predict", files=files)
+    assert classify.call_count == 1
+
+    table.fingerprint = "v2"
+    assert client.post("/predict", files=files).json()["chat_context"] == (
+        "index v2 notes"
+    )
+    assert classify.call_count == 2
+
+
+def test_predict_batch_endpoint(monkeypatch):
+    """
+    Test /predict/batch with a zip plus a loose image: every image gets a
+    prediction, and the LLM runs once per distinct diagnosis.
+    """
+    import io
+    import zipfile
+    from backend import app as app_module
+
+    labels = {b"scab-1": "Apple___Apple_scab", b"scab-2": "Apple___Apple_scab"}
+    labels[b"blight"] = "Tomato___Early_blight"
+
+    # Images are "decoded" to their bytes and classified by lookup
+    monkeypatch.setattr(app_module, "decode_image", lambda data: data)
+    monkeypatch.setattr(
+        app_module.cv_batcher,
+        "batch_fn",
+        lambda images: [(labels[img], 0.9) for img in images],
+    )
+    monkeypatch.setattr(
+        app_module, "retrieve_context", lambda diagnosis: f"{diagnosis} context"
+    )
+    mock_llm = MagicMock(return_value={"choices": [{"text": " Treat it."}]})
+    sys_comps["llm"] = mock_llm
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("field/leaf1.jpg", b"scab-1")
+        zf.writestr("field/leaf2.jpg", b"scab-2")
+        zf.writestr("field/notes.txt", b"not an image")
+
+    response = client.post(
+        "/predict/batch",
+        files=[
+            ("files", ("visit.zip", archive.getvalue(), "application/zip")),
+            ("files", ("tomato.jpg", b"blight", "image/jpeg")),
+        ],
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [p["filename"] for p in data["predictions"]] == [
+        "field/leaf1.jpg",
+        "field/leaf2.jpg",
+        "tomato.jpg",
+    ]
+    assert [(s["diagnosis"], s["count"]) for s in data["summary"]] == [
+        ("Apple___Apple_scab", 2),
+        ("Tomato___Early_blight", 1),
+    ]
+    assert mock_llm.call_count == 2
+
+
+def test_predict_batch_limits_and_failed_explanations(monkeypatch):
+    """
+    Oversized archives are refused before extraction, and a failed
+    explanation still returns the classified images.
+    """
+    import io
+    import zipfile
+    from backend import app as app_module
+
+    monkeypatch.setattr(app_module, "decode_image", lambda data: data)
+    monkeypatch.setattr(
+        app_module.cv_batcher,
+        "batch_fn",
+        lambda images: [("Corn___Common_rust", 0.9) for _ in images],
+    )
+    monkeypatch.setattr(app_module, "retrieve_context", lambda d: f"{d} notes")
+    monkeypatch.setattr(app_module, "MAX_BATCH_IMAGES", 2)
+    sys_comps["llm"] = MagicMock(side_effect=RuntimeError("llama.cpp crashed"))
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for i in range(3):
+            zf.writestr(f"leaf{i}.jpg", b"rust")
+    read = MagicMock(side_effect=AssertionError("read before the count check"))
+    monkeypatch.setattr(zipfile.ZipFile, "read", read)
+
+    files = [("files", ("visit.zip", archive.getvalue(), "application/zip"))]
+    assert client.post("/predict/batch", files=files).status_code == 413
+
+    # Two archives that each fit the byte budget but not together
+    monkeypatch.setattr(app_module, "MAX_BATCH_BYTES", 6)
+    small = io.BytesIO()
+    with zipfile.ZipFile(small, "w") as zf:
+        zf.writestr("leaf.jpg", b"rust")
+    monkeypatch.setattr(zipfile.ZipFile, "read", lambda self, info: b"rust")
+    files = [
+        ("files", (f"visit{i}.zip", small.getvalue(), "application/zip"))
+        for i in range(2)
+    ]
+    response = client.post("/predict/batch", files=files)
+    assert response.status_code == 413 and "extracted" in response.json()["detail"]
+
+    files = [("files", (f"leaf{i}.jpg", b"rust", "image/jpeg")) for i in range(2)]
+    response = client.post("/predict/batch", files=files)
+    assert response.status_code == 200
+    data = response.json()
+    assert [p["diagnosis"] for p in data["predictions"]] == ["Corn___Common_rust"] * 2
+    (summary,) = data["summary"]
+    assert summary["count"] == 2 and "explanation" not in summary
+    assert summary["error"] == "llama.cpp crashed"
+
+
+def test_predict_async_mode(monkeypatch):
+    """
+    /predict?mode=async answers with the diagnosis and a job id; the job's
+    explanation is then available from /jobs/{job_id}.
+    """
+    from backend import app as app_module
+
+    monkeypatch.setattr(app_module, "decode_image", lambda data: data)
+    monkeypatch.setattr(
+        app_module.cv_batcher,
+        "batch_fn",
+        lambda images: [("Corn___Common_rust", 0.8) for _ in images],
+    )
+    monkeypatch.setattr(
+        app_module, "retrieve_context", lambda diagnosis: f"{diagnosis} context"
+    )
+    sys_comps["llm"] = MagicMock(
+        return_value={"choices": [{"text": " Use fungicide."}]}
+    )
+
+    files = {"file": ("leaf.jpg", b"rust", "image/jpeg")}
+    assert client.post("/predict", files=files).json()["explanation"] == (
+        "Use fungicide."
+    )
+
+    response = client.post("/predict?mode=async", files=files)
+    assert response.status_code == 202
+    data = response.json()
+    assert data["diagnosis"] == "Corn___Common_rust"
+    assert "explanation" not in data
+
+    job = client.get(f"/jobs/{data['job_id']}").json()
+    assert job["status"] == "done" and job["result"] == "Use fungicide."
+    result = client.get(f"/jobs/{data['job_id']}/result").json()
+    assert result["explanation"] == "Use fungicide."
+    assert client.delete("/jobs/unknown").status_code == 404
+
+
+def test_chat_session_continues_from_saved_state():
+    """
+    /chat with a session_id needs only the question: the second turn extends
+    the first turn's prompt and starts from the state it saved.
+    """
+    from types import SimpleNamespace
+
+    from prometheus_client import REGISTRY
+
+    from backend.app import sessions
+
+    prompts = []
+
+    def fake_llm(prompt, **kwargs):
+        prompts.append(prompt)
+        return {"choices": [{"text": f" Answer {len(prompts)}."}]}
+
+    llm = MagicMock(side_effect=fake_llm)
+    llm.tokenize.return_value = [1, 2, 3, 7, 8]
+    llm.save_state.return_value = SimpleNamespace(
+        input_ids=[1, 2, 3, 4], n_tokens=4, llama_state=b"kv"
+    )
+    sys_comps["llm"] = llm
+    session = sessions.create("Apple___Apple_scab", "Scab spreads in rain.")
+    saved = ("flora_llm_prefill_tokens_saved_sum", {"endpoint": "chat"})
+
+    first = client.post("/chat", json={"question": "Why?", "session_id": session.id})
+    assert first.json() == {"answer": "Answer 1.", "session_id": session.id}
+    llm.load_state.assert_not_called()
+
+    before = REGISTRY.get_sample_value(*saved) or 0
+    client.post("/chat", json={"question": "When?", "session_id": session.id})
+    assert prompts[1].startswith(prompts[0] + "Answer 1.")
+    llm.load_state.assert_called_once()
+    # Only the tokens the new prompt shares with the saved state are reused
+    assert REGISTRY.get_sample_value(*saved) - before == 3
+
+    missing = client.post("/chat", json={"question": "q", "session_id": "nope"})
+    assert missing.status_code == 404
+    assert client.post("/chat", json={"question": "q"}).status_code == 422
+
+
+def test_chat_reuses_answers_to_similar_questions():
+    """
+    A first follow-up close enough to an answered one in a /predict session
+    with the same diagnosis and context is answered from the semantic cache,
+    on /chat and /chat/stream alike. Later turns, other contexts and
+    client-supplied contexts always go to the LLM.
+    """
+    from backend.app import sessions
+
+    vectors = {"Is it safe to eat?": [1, 0], "Can I eat it?": [0.98, 0.1]}
+    embed_fn = MagicMock()
+    embed_fn.embed_query.side_effect = lambda q: vectors[q]
+    answers = []
+
+    def fake_llm(prompt, **kwargs):
+        answers.append(f"Answer {len(answers) + 1}.")
+        return {"choices": [{"text": " " + answers[-1]}]}
+
+    sys_comps.update(llm=MagicMock(side_effect=fake_llm), embed_fn=embed_fn)
+    diagnosis = "Peach___Bacterial_spot"
+    try:
+        first, second, third = [
+            sessions.create(diagnosis, "c", explanation_key="peach|c") for _ in range(3)
+        ]
+        other = sessions.create(diagnosis, "d", explanation_key="peach|d")
+
+        def ask(session, question="Can I eat it?"):
+            payload = {"question": question, "session_id": session.id}
+            return client.post("/chat", json=payload).json()["answer"]
+
+        assert ask(first, "Is it safe to eat?") == "Answer 1."
+        assert ask(second) == "Answer 1."
+        payload = {"question": "Can I eat it?", "session_id": third.id}
+        stream = client.post("/chat/stream", json=payload)
+        assert 'data: {"answer": "Answer 1."}' in stream.text
+        assert third.turns[-1] == ("Can I eat it?", "Answer 1.")
+
+        assert ask(second) == "Answer 2."  # not its first follow-up
+        assert ask(other) == "Answer 3."
+        payload = {"question": "Can I eat it?", "context": "c", "diagnosis": diagnosis}
+        assert client.post("/chat", json=payload).json()["answer"] == "Answer 4."
+        assert len(answers) == 4
+    finally:
+        del sys_comps["embed_fn"]
+
+
+def test_ws_stream_reports_stable_diagnoses(monkeypatch):
+    """
+    Camera frames go through the CV batcher; a class is sent once stable,
+    followed by its explanation. Failed frames come back as errors.
+    """
+    from backend import app as app_module
+
+    labels = {b"blurry": ("Apple___Apple_scab", 0.3)}
+    labels[b"scab"] = ("Apple___Apple_scab", 0.9)
+    labels[b"rust"] = ("Apple___Cedar_apple_rust", 0.8)
+
+    def decode(data):
+        if data not in labels:
+            raise ValueError("not an image")
+        return data
+
+    monkeypatch.setattr(app_module, "decode_image", decode)
+    monkeypatch.setattr(
+        app_module.cv_batcher, "batch_fn", lambda images: [labels[i] for i in images]
+    )
+    monkeypatch.setattr(app_module, "retrieve_context", lambda d: f"{d} field notes")
+    monkeypatch.setattr(app_module, "STREAM_STABLE_FRAMES", 1)
+    sys_comps["llm"] = MagicMock(return_value={"choices": [{"text": " Prune."}]})
+
+    with client.websocket_connect("/ws/stream") as ws:
+        ws.send_bytes(b"garbage")
+        assert ws.receive_json() == {"type": "error", "error": "not an image"}
+
+        ws.send_bytes(b"blurry")
+        ws.send_bytes(b"scab")
+        found = ws.receive_json()
+        assert found["type"] == "diagnosis"
+        assert found["diagnosis"] == "Apple___Apple_scab"
+        assert found["chat_context"] == "Apple___Apple_scab field notes"
+        explained = ws.receive_json()
+        assert explained["type"] == "explanation"
+        assert explained["explanation"] == "Prune."
+        assert explained["session_id"] == found["session_id"]
+
+        ws.send_bytes(b"rust")
+        assert ws.receive_json()["diagnosis"] == "Apple___Cedar_apple_rust"
+
+
+def test_speculative_decoding_is_selected_per_endpoint(monkeypatch):
+    """The draft model is attached only for endpoints in LLM_SPECULATIVE."""
+    from backend import app as app_module
+
+    draft = object()
+    sys_comps["llm"] = MagicMock()
+    monkeypatch.setitem(sys_comps, "draft_model", draft)
+    monkeypatch.setattr(app_module, "LLM_SPECULATIVE", {"chat"})
+
+    client.post("/chat", json={"question": "q", "context": "c"})
+    assert sys_comps["llm"].draft_model is draft
+    app_module.restore_prefix("prompt", "predict")
+    assert sys_comps["llm"].draft_model is None
+
+
+def test_admin_profile_requires_token(monkeypatch):
+    from backend import app as app_module
+
+    assert client.post("/admin/profile?seconds=0.05").status_code == 403
+
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+    headers = {"Authorization": "Bearer wrong"}
+    assert client.post("/admin/profile", headers=headers).status_code == 401
+
+    headers = {"Authorization": "Bearer secret"}
+    response = client.post(
+        "/admin/profile?seconds=0.05&format=collapsed", headers=headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert client.post("/admin/profile?seconds=600", headers=headers).status_code == 422
+
+
+def test_llm_worker_serves_generations_over_a_socket(tmp_path):
+    """A session turn on a worker streams tokens and returns its new state."""
+    import asyncio
+
+    from backend import llm_worker
+    from backend.remote_llm import LLMClient
+
+    def fake_llm(prompt, **kwargs):
+        return iter(
+            [{"choices": [{"text": " Prune"}]}, {"choices": [{"text": " it."}]}]
+        )
+
+    llm = MagicMock(side_effect=fake_llm)
+    llm.save_state.return_value = {"n_tokens": 42}
+    sys_comps["llm"] = llm
+    path = str(tmp_path / "llm.sock")
+
+    async def main():
+        server = await asyncio.start_unix_server(llm_worker.handle, path=path)
+        async with server:
+            client = LLMClient(path)
+            assert await asyncio.to_thread(client.ping, path)
+            states = []
+            generation = client.generate(
+                "prompt", endpoint="chat", state=None, on_state=states.append
+            )
+            return await generation.text(), states
+
+    answer, states = asyncio.run(main())
+    assert answer == "Prune it."
+    assert states == [{"n_tokens": 42}]
+
+
+def test_cv_stages_are_timed_separately_and_warm_up_is_not():
+    """
+    classify_images records preprocess and cv_forward (the ORT call only);
+    warm_cv runs the model without touching either histogram.
+    """
+    from types import SimpleNamespace
+
+    import numpy as np
+    from prometheus_client import REGISTRY
+
+    from backend.app import classify_images, warm_cv
+
+    def count(stage):
+        name = "flora_inference_stage_seconds_count"
+        return REGISTRY.get_sample_value(name, {"stage": stage}) or 0
+
+    sys_comps["preprocessor"] = SimpleNamespace(
+        size=(2, 2), batch=lambda images: np.zeros((len(images), 3, 2, 2))
+    )
+    model = MagicMock(side_effect=lambda x: np.tile([[0.1, 2.0]], (len(x), 1)))
+    model.config.id2label = {0: "Apple___healthy", 1: "Apple___Apple_scab"}
+    sys_comps["cv_model"] = model
+
+    before = {stage: count(stage) for stage in ("preprocess", "cv_forward")}
+    warm_cv()
+    assert model.call_count >= 1
+    assert {stage: count(stage) for stage in before} == before
+
+    [(diagnosis, _)] = classify_images([np.zeros((2, 2, 3), dtype=np.uint8)])
+    assert diagnosis == "Apple___Apple_scab"
+    assert {stage: count(stage) for stage in before} == {
+        stage: n + 1 for stage, n in before.items()
+    }
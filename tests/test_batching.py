@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.batching import MicroBatcher  # noqa: E402
+
+
+def test_concurrent_submits_share_one_batch():
+    """Items submitted inside the wait window are run as a single batch."""
+    seen_batches = []
+
+    def double(items):
+        seen_batches.append(list(items))
+        return [x * 2 for x in items]
+
+    batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert asyncio.run(main()) == [0, 2, 4, 6, 8]
+    assert seen_batches == [[0, 1, 2, 3, 4]]
+
+
+def test_batches_are_capped_at_max_batch_size():
+    """A burst larger than max_batch_size is split across several batches."""
+    sizes = []
+
+    def identity(items):
+        sizes.append(len(items))
+        return items
+
+    batcher = MicroBatcher(identity, max_batch_size=4, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+
+    assert asyncio.run(main()) == list(range(10))
+    assert max(sizes) <= 4
+    assert sum(sizes) == 10
+
+
+def test_batch_errors_reach_every_caller():
+    """If the forward pass fails, each waiting caller sees the exception."""
+
+    def boom(items):
+        raise ValueError("bad batch")
+
+    batcher = MicroBatcher(boom, max_batch_size=4, max_wait_ms=5)
+
+    async def main():
+        return await asyncio.gather(
+            batcher.submit(1), batcher.submit(2), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
@@ -0,0 +1,260 @@
+import asyncio
+import os
+import sys
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.cache import (  # noqa: E402
+    ExplanationCache,
+    PredictionCache,
+    SemanticAnswerCache,
+    TTLCache,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """The entry touched least recently is dropped first."""
+    cache = TTLCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_expires_old_entries():
+    """Entries older than the TTL are treated as missing."""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=8, ttl=60, clock=clock)
+    cache.put("a", 1)
+
+    clock.now += 59
+    assert cache.get("a") == 1
+    clock.now += 2
+    assert cache.get("a") is None
+
+
+def test_explanation_cache_key_changes_with_each_component():
+    """Diagnosis, context, prompt version and model file all affect the key."""
+    base = ExplanationCache.make_key("Apple___Apple_scab", "ctx", "v1", "m.gguf")
+    assert base == ExplanationCache.make_key(
+        "Apple___Apple_scab", "ctx", "v1", "m.gguf"
+    )
+    assert base != ExplanationCache.make_key("Tomato___healthy", "ctx", "v1", "m.gguf")
+    assert base != ExplanationCache.make_key(
+        "Apple___Apple_scab", "ctx2", "v1", "m.gguf"
+    )
+    assert base != ExplanationCache.make_key(
+        "Apple___Apple_scab", "ctx", "v2", "m.gguf"
+    )
+    assert base != ExplanationCache.make_key(
+        "Apple___Apple_scab", "ctx", "v1", "x.gguf"
+    )
+
+
+def test_concurrent_misses_share_one_generation():
+    """Only the first of several concurrent misses runs the LLM."""
+    cache = ExplanationCache(maxsize=8)
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "Remove fallen leaves."
+
+    async def main():
+        return await asyncio.gather(
+            *(cache.get_or_create("key", generate) for _ in range(5))
+        )
+
+    assert asyncio.run(main()) == ["Remove fallen leaves."] * 5
+    assert len(calls) == 1
+    assert cache.get("key") == "Remove fallen leaves."
+
+
+class FakeStream:
+    """Token stream with the TokenStream interface, one chunk per tick."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def tokens(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0.01)
+            yield chunk
+
+
+def test_streamed_explanation_survives_its_consumer_leaving():
+    """
+    A coalesced waiter still gets the result when the client that started
+    the stream goes away; with nobody left, the generation is cancelled.
+    """
+    cache = ExplanationCache(maxsize=8)
+
+    async def main():
+        seen = []
+        stream = FakeStream([" Prune", " infected", " twigs."])
+        fut = cache.stream("key", stream, on_token=seen.append)
+        waiter = asyncio.ensure_future(cache.get_or_create("key", None))
+        await asyncio.sleep(0.015)
+        cache.leave(fut)  # the streaming client disconnected
+        result = await waiter
+
+        lonely = FakeStream([" a", " b", " c"])
+        abandoned = cache.stream("other", lonely)
+        await asyncio.sleep(0.015)
+        cache.leave(abandoned)
+        await asyncio.sleep(0.01)
+        return result, seen, abandoned.cancelled(), cache.pending("other")
+
+    result, seen, cancelled, pending = asyncio.run(main())
+    assert result == "Prune infected twigs." == cache.get("key")
+    assert seen == [" Prune", " infected", " twigs."]
+    assert cancelled and pending is None and cache.get("other") is None
+
+
+def test_cancelled_job_leaves_the_explanation_to_other_waiters():
+    """
+    Cancelling a background job that started the stream (as /jobs DELETE
+    does) does not fail a request coalesced on the same explanation.
+    """
+    cache = ExplanationCache(maxsize=8)
+
+    async def job(fut):
+        try:
+            return await asyncio.shield(fut)
+        finally:
+            cache.leave(fut)
+
+    async def main():
+        fut = cache.stream("key", FakeStream([" Remove", " leaves."]))
+        task = asyncio.ensure_future(job(fut))
+        waiter = asyncio.ensure_future(cache.get_or_create("key", None))
+        await asyncio.sleep(0.005)
+        task.cancel()
+        result = await waiter
+        return result, task.cancelled()
+
+    result, cancelled = asyncio.run(main())
+    assert cancelled and result == "Remove leaves." == cache.get("key")
+
+
+def test_explanation_cache_survives_restart(tmp_path):
+    """With a path set, a new cache instance sees the previous entries."""
+    path = str(tmp_path / "explanations.json")
+    ExplanationCache(maxsize=8, ttl=3600, path=path).put("key", "Use copper spray.")
+
+    reloaded = ExplanationCache(maxsize=8, ttl=3600, path=path)
+    assert reloaded.get("key") == "Use copper spray."
+
+
+def test_explanation_cache_saves_in_the_background(tmp_path):
+    """On the event loop, puts are batched into one write after save_delay."""
+    path = tmp_path / "explanations.json"
+
+    async def main():
+        cache = ExplanationCache(maxsize=8, path=str(path), save_delay=0.05)
+        cache.put("a", "Prune.")
+        cache.put("b", "Spray.")
+        assert not path.exists()  # nothing written on the event loop
+        await asyncio.sleep(0.2)
+        first = ExplanationCache(maxsize=8, path=str(path))
+        cache.put("c", "Water less.")
+        await cache.save()  # at shutdown: no need to wait for the delay
+        return first
+
+    first = asyncio.run(main())
+    assert (first.get("a"), first.get("b"), first.get("c")) == (
+        "Prune.",
+        "Spray.",
+        None,
+    )
+    assert ExplanationCache(maxsize=8, path=str(path)).get("c") == "Water less."
+
+
+def test_prediction_cache_exact_hit_by_content_hash():
+    """Byte-identical uploads hit the cache; different bytes don't."""
+    cache = PredictionCache(maxsize=4)
+    key = PredictionCache.content_key(b"jpeg-bytes")
+    cache.put(key, ("Apple___Apple_scab", 0.97, "ctx"))
+
+    assert cache.get(PredictionCache.content_key(b"jpeg-bytes")) == (
+        "Apple___Apple_scab",
+        0.97,
+        "ctx",
+    )
+    assert cache.get(PredictionCache.content_key(b"other-bytes")) is None
+
+
+def test_prediction_cache_matches_near_duplicate_perceptual_hash():
+    """A hash a couple of bits away matches; a distant one does not."""
+    cache = PredictionCache(maxsize=4, phash_distance=4)
+    phash = 0xF0F0_F0F0_F0F0_F0F0
+    cache.put("original", ("Tomato___Early_blight", 0.9, "ctx"), phash=phash)
+
+    assert cache.get_similar(phash ^ 0b101) == ("Tomato___Early_blight", 0.9, "ctx")
+    assert cache.get_similar(phash ^ 0xFFFF) is None
+
+
+def test_prediction_cache_eviction_frees_perceptual_slots():
+    """Evicted uploads can no longer be matched by perceptual hash."""
+    cache = PredictionCache(maxsize=2, phash_distance=0)
+    cache.put("a", "A", phash=1)
+    cache.put("b", "B", phash=2)
+    cache.put("c", "C", phash=3)
+
+    assert len(cache) == 2
+    assert cache.get_similar(1) is None
+    assert cache.get_similar(3) == "C"
+
+
+def test_prediction_cache_clear_starts_a_new_version():
+    """clear() drops exact and perceptual entries and records the new version."""
+    cache = PredictionCache(maxsize=2, phash_distance=0)
+    cache.put("a", ("Apple___healthy", 0.9, "old context"), phash=7)
+    cache.clear("index-v2")
+    assert cache.version == "index-v2" and len(cache) == 0
+    assert cache.get("a") is None and cache.get_similar(7) is None
+    cache.put("b", ("Apple___healthy", 0.9, "new context"), phash=7)
+    cache.put("c", ("Apple___healthy", 0.8, "new context"), phash=9)
+    assert cache.get_similar(7)[2] == "new context" and len(cache) == 2
+
+
+def test_semantic_cache_matches_paraphrases_under_the_same_key():
+    """Close questions hit, other keys and distant questions miss."""
+    clock = FakeClock()
+    cache = SemanticAnswerCache(threshold=0.9, maxsize=2, ttl=60, clock=clock)
+    cache.put("Apple___Apple_scab", [1.0, 0.0, 0.0], "Every 7-10 days.")
+
+    assert cache.get("Apple___Apple_scab", [2.0, 0.3, 0.0]) == "Every 7-10 days."
+    assert cache.get("Apple___Apple_scab", [0.5, 1.0, 0.0]) is None
+    assert cache.get("Tomato___Early_blight", [1.0, 0.0, 0.0]) is None
+
+    clock.now += 61
+    assert cache.get("Apple___Apple_scab", [1.0, 0.0, 0.0]) is None
+    assert len(cache) == 0
+
+
+def test_semantic_cache_evicts_least_recently_used():
+    cache = SemanticAnswerCache(threshold=0.9, maxsize=2)
+    cache.put("scab", [1.0, 0.0], "a")
+    cache.put("scab", [0.0, 1.0], "b")
+    cache.get("scab", [1.0, 0.0])
+    cache.put("blight", [1.0, 0.0], "c")
+
+    assert len(cache) == 2
+    assert cache.get("scab", [1.0, 0.0]) == "a"
+    assert cache.get("scab", [0.0, 1.0]) is None
+    assert cache.get("blight", [1.0, 0.0]) == "c"
@@ -0,0 +1,69 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.classifier import OnnxClassifier, softmax_top1  # noqa: E402
+from backend.preprocessing import ImagePreprocessor  # noqa: E402
+
+
+def test_softmax_top1():
+    pred_idx, conf = softmax_top1([[0.0, 0.0, 10.0], [1.0, 1.0, 1.0]])
+    assert pred_idx.tolist() == [2, 0]
+    np.testing.assert_allclose(conf, [1 / (1 + 2 * np.exp(-10)), 1 / 3], rtol=1e-6)
+
+
+def test_onnx_classifier_serves_an_export_without_torch(tmp_path):
+    """The graph, config.json and preprocessor_config.json are all it needs."""
+    onnx = pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from onnx import TensorProto, helper
+
+    # logits = per-channel mean of pixel_values
+    graph = helper.make_graph(
+        [
+            helper.make_node(
+                "ReduceMean", ["pixel_values"], ["logits"], axes=[2, 3], keepdims=0
+            )
+        ],
+        "tiny",
+        [
+            helper.make_tensor_value_info(
+                "pixel_values", TensorProto.FLOAT, [None, 3, 4, 4]
+            )
+        ],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, [None, 3])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(tmp_path / "model.onnx"))
+    (tmp_path / "config.json").write_text(
+        json.dumps({"id2label": {"0": "red", "1": "green", "2": "blue"}})
+    )
+    (tmp_path / "preprocessor_config.json").write_text(
+        json.dumps(
+            {
+                "size": {"height": 4, "width": 4},
+                "image_mean": [0.5, 0.5, 0.5],
+                "image_std": [0.5, 0.5, 0.5],
+                "resample": 3,
+                "rescale_factor": 1 / 255,
+            }
+        )
+    )
+
+    classifier = OnnxClassifier(str(tmp_path))
+    preprocessor = ImagePreprocessor.from_pretrained(str(tmp_path))
+    assert preprocessor.size == (4, 4)
+
+    green = np.zeros((4, 4, 3), dtype=np.uint8)
+    green[..., 1] = 255
+    logits = classifier(preprocessor.batch([green, 255 - green]))
+    pred_idx, _ = softmax_top1(logits)
+    id2label = classifier.config.id2label
+    assert [id2label[i] for i in pred_idx.tolist()] == ["green", "red"]
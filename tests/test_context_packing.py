@@ -0,0 +1,55 @@
+import os
+import sys
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.context_packing import ContextPacker, split_sentences  # noqa: E402
+
+WORDS = ["fungicide", "spray", "history", "apple", "weather"]
+
+
+def keyword_embed(texts):
+    """Bag-of-keywords vectors: similarity means shared keywords."""
+    return [[text.lower().count(w) for w in WORDS] for text in texts]
+
+
+def word_count(text):
+    return len(text.split())
+
+
+CHUNKS = [
+    "Apple scab was first described in 1819. Its history is long.",
+    "Spray a fungicide such as captan early. Rake fallen leaves.\n"
+    "Wet weather spreads the spores.",
+]
+
+
+def test_split_sentences_drops_fragments():
+    """Sentences split on punctuation and newlines; tiny fragments are dropped."""
+    assert split_sentences("Symptoms:\nOlive spots appear. Leaves fall.\n- ok") == [
+        "Olive spots appear.",
+        "Leaves fall.",
+    ]
+
+
+def test_pack_keeps_relevant_sentences_within_budget():
+    """The most similar sentences fill the budget and keep their original order."""
+    packer = ContextPacker(keyword_embed, word_count, budget=14)
+
+    packed = packer.pack(CHUNKS, "Which fungicide spray works in wet weather?")
+
+    assert packed == (
+        "Spray a fungicide such as captan early. Wet weather spreads the spores."
+    )
+    assert word_count(packed) <= 14
+
+
+def test_pack_passes_short_context_and_falls_back_without_embeddings():
+    """Context within budget is untouched; without embeddings, order decides."""
+    packer = ContextPacker(lambda texts: None, word_count, budget=100)
+    assert packer.pack(CHUNKS, "anything") == "\n".join(CHUNKS)
+
+    assert packer.pack(CHUNKS, "anything", budget=8) == (
+        "Apple scab was first described in 1819."
+    )
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.engine import GenerationEngine, stop_prefix_len  # noqa: E402
+
+
+class FakeBackend:
+    """Predicts ``token + 1`` after every token; token 0 is EOS."""
+
+    n_vocab = 50
+    eos = 0
+
+    def __init__(self, n_batch=8, n_ctx_per_seq=64, delay=0.0):
+        self.n_batch = n_batch
+        self.n_ctx_per_seq = n_ctx_per_seq
+        self.delay = delay
+        self.batches = []
+        self.copies = []
+
+    def seq_rm(self, seq, p0, p1):
+        pass
+
+    def seq_cp(self, src, dst, p0, p1):
+        self.copies.append((src, dst, p0, p1))
+
+    def decode(self, entries):
+        assert len(entries) <= self.n_batch
+        self.batches.append(list(entries))
+        time.sleep(self.delay)
+
+    def logits(self, index):
+        row = np.zeros(self.n_vocab, dtype=np.float32)
+        row[(self.batches[-1][index][0] + 1) % self.n_vocab] = 1.0
+        return row
+
+    def detokenize(self, tokens):
+        return "".join(f"<{t}>" for t in tokens).encode()
+
+
+def run(engine, coro):
+    try:
+        return asyncio.run(coro)
+    finally:
+        engine.close()
+
+
+def test_sequences_interleave_and_queued_requests_join_at_token_boundaries():
+    backend = FakeBackend()
+    engine = GenerationEngine(backend, slots=2)
+
+    async def main():
+        gens = [
+            engine.submit(prompt, max_tokens=3, temperature=0)
+            for prompt in ([1, 2, 3], [10, 11], [20])
+        ]
+        return gens, [await g.text() for g in gens]
+
+    gens, texts = run(engine, main())
+
+    assert texts == ["<4><5><6>", "<12><13><14>", "<21><22><23>"]
+    assert all(g.finish_reason == "length" for g in gens)
+    seqs = [{seq for _, _, seq, _ in batch} for batch in backend.batches]
+    assert {0, 1} in seqs  # both slots advanced by one decode call
+    assert max(len(s) for s in seqs) == 2
+    assert gens[2].started_at >= min(gens[0].finished_at, gens[1].finished_at)
+
+
+def test_stop_strings_are_held_back_and_cancel_frees_the_slot():
+    assert stop_prefix_len("<2><3>", ["3><4"]) == 2
+    engine = GenerationEngine(FakeBackend(delay=0.002), slots=1)
+
+    async def main():
+        stopped = engine.submit([1], stop=["3><4"], temperature=0)
+        chunks = [t async for t in stopped.tokens()]
+
+        long = engine.submit([1], max_tokens=100, temperature=0)
+        queued = engine.submit([30], max_tokens=2, temperature=0)
+        async for _ in long.tokens():
+            long.cancel()
+            break
+        return stopped, chunks, long, await queued.text()
+
+    stopped, chunks, long, text = run(engine, main())
+
+    assert "".join(chunks) == "<2><" and stopped.finish_reason == "stop"
+    assert long.finish_reason == "cancelled" and long.n_generated < 48
+    assert text == "<31><32>"
+
+
+def test_cached_prefix_is_copied_into_new_sequences():
+    backend = FakeBackend()
+    engine = GenerationEngine(backend, slots=2)
+    assert engine.cache_prefix([1, 2, 3]) == 3
+
+    async def main():
+        return await engine.submit([1, 2, 3, 4, 5], max_tokens=1, temperature=0).text()
+
+    assert run(engine, main()) == "<6>"
+    assert backend.copies == [(2, 1, 0, 3)]
+    # Only the uncached tokens were prefilled, at their real positions
+    assert [(t, pos) for t, pos, _, _ in backend.batches[1]] == [(4, 3), (5, 4)]
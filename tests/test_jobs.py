@@ -0,0 +1,96 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.jobs import JobStore  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_job_runs_in_background_and_reports_progress():
+    """A submitted job reports partial output while running, then its result."""
+
+    async def scenario():
+        store = JobStore(workers=1)
+        release = asyncio.Event()
+
+        async def run(job):
+            job.partial = "Spray"
+            await release.wait()
+            return "Spray copper."
+
+        job = store.submit(run, diagnosis="scab")
+        assert job.status == "queued"
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert store.get(job.id).as_dict()["partial"] == "Spray"
+
+        release.set()
+        await job.wait(1.0)
+        return store.get(job.id).as_dict()
+
+    body = asyncio.run(scenario())
+    assert body["status"] == "done"
+    assert body["result"] == "Spray copper." and body["diagnosis"] == "scab"
+
+
+def test_cancel_running_and_queued_jobs():
+    """Cancelling stops the running job's task and skips queued ones."""
+
+    async def scenario():
+        store = JobStore(workers=1)
+        stopped = []
+
+        async def run(job):
+            try:
+                await asyncio.sleep(60)
+            finally:
+                stopped.append(job.id)
+
+        running = store.submit(run)
+        queued = store.submit(run)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        store.cancel(queued.id)
+        store.cancel(running.id)
+        await running.wait(1.0)
+        await asyncio.sleep(0)
+        return running, queued, stopped
+
+    running, queued, stopped = asyncio.run(scenario())
+    assert running.status == "cancelled" and queued.status == "cancelled"
+    assert stopped == [running.id]
+
+
+def test_store_is_bounded_and_expires_finished_jobs():
+    """Finished jobs expire after the TTL; a store full of live jobs sheds load."""
+    clock = FakeClock()
+
+    async def scenario():
+        store = JobStore(maxsize=2, ttl=60, clock=clock)
+        done = store.completed("cached")
+        store.submit(lambda job: asyncio.sleep(60))
+        store.submit(lambda job: asyncio.sleep(60))  # evicts the finished job
+        assert store.get(done.id) is None
+        with pytest.raises(HTTPException) as excinfo:
+            store.submit(lambda job: asyncio.sleep(60))
+        assert excinfo.value.status_code == 429
+
+        later = JobStore(ttl=60, clock=clock)
+        job = later.completed("cached")
+        clock.now += 61
+        assert later.get(job.id) is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,50 @@
+import asyncio
+import os
+import sys
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.live import LatestFrame, StabilityTracker  # noqa: E402
+
+
+def test_latest_frame_wins():
+    """Frames not taken yet are replaced; close ends the stream once drained."""
+
+    async def main():
+        frames = LatestFrame()
+        for frame in (b"1", b"2", b"3"):
+            frames.put(frame)
+        first = await frames.get()
+        waiter = asyncio.ensure_future(frames.get())
+        await asyncio.sleep(0)
+        frames.put(b"4")
+        second = await waiter
+        frames.put(b"5")
+        frames.close()
+        return first, second, await frames.get(), await frames.get(), frames.dropped
+
+    assert asyncio.run(main()) == (b"3", b"4", b"5", None, 2)
+
+
+def test_stability_tracker_reports_each_stable_class_once():
+    tracker = StabilityTracker(frames=3, min_confidence=0.6)
+    seen = [
+        tracker.update(diagnosis, conf)
+        for diagnosis, conf in [
+            ("scab", 0.9),
+            ("scab", 0.9),
+            ("rust", 0.9),  # a glitch restarts the count
+            ("scab", 0.9),
+            ("scab", 0.4),  # so does an unsure frame
+            ("scab", 0.8),
+            ("scab", 0.8),
+            ("scab", 0.9),
+            ("scab", 0.9),  # still stable: not reported again
+            ("rust", 0.7),
+            ("rust", 0.7),
+            ("rust", 0.7),
+        ]
+    ]
+    assert [i for i, found in enumerate(seen) if found] == [7, 11]
+    assert seen[7] == "scab" and seen[11] == "rust"
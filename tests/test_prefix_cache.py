@@ -0,0 +1,54 @@
+import os
+import sys
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.prefix_cache import PrefixCache  # noqa: E402
+from backend.prompts import PROMPTS, PromptTemplate  # noqa: E402
+
+
+class FakeLlama:
+    """Character-level stand-in for llama_cpp.Llama's state API."""
+
+    def __init__(self):
+        self.evaluated = []
+        self.loaded = None
+
+    def tokenize(self, text, special=False):
+        return list(text)
+
+    def reset(self):
+        self.evaluated = []
+
+    def eval(self, tokens):
+        self.evaluated.extend(tokens)
+
+    def save_state(self):
+        return tuple(self.evaluated)
+
+    def load_state(self, state):
+        self.loaded = state
+
+
+def test_restore_loads_prefix_state_and_reports_savings():
+    """A prompt built from the template reuses every prefix token."""
+    llm = FakeLlama()
+    template = PROMPTS["flora_few_shot"]
+    cache = PrefixCache(llm)
+    n_prefix = cache.warm(template)
+
+    prompt = template.render(context="ctx", question="How do I treat it?")
+    assert cache.restore(template, prompt) == n_prefix
+    assert llm.loaded == tuple(template.prefix.encode("utf-8"))
+
+
+def test_restore_skips_prompts_that_do_not_share_the_prefix():
+    """No state is loaded if the prompt diverges inside the prefix."""
+    llm = FakeLlama()
+    template = PromptTemplate("t", "v1", "System: be brief.\n", "Q: {question}")
+    cache = PrefixCache(llm)
+    cache.warm(template)
+
+    assert cache.restore(template, "System: be verbose.\nQ: hi") == 0
+    assert llm.loaded is None
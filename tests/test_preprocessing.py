@@ -0,0 +1,54 @@
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.preprocessing import ImagePreprocessor  # noqa: E402
+
+
+def _photo(width=2000, height=1500, fmt="JPEG"):
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([x % 256, y % 256, (x + y) % 256], axis=-1).astype(np.uint8)
+    pixels[::7] = rng.integers(0, 255, pixels[::7].shape, dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format=fmt, quality=95)
+    return buf.getvalue()
+
+
+def test_batch_normalizes_into_reused_buffer():
+    """Rescale + normalize matches the textbook formula and reuses its buffer."""
+    pre = ImagePreprocessor(size=(4, 4), mean=(0.5, 0.5, 0.5), std=(0.25, 0.5, 1.0))
+    img = np.full((4, 4, 3), 255, dtype=np.uint8)
+
+    first = pre.batch([img, img])
+    expected = (1.0 - 0.5) / np.array([0.25, 0.5, 1.0], dtype=np.float32)
+    assert first.shape == (2, 3, 4, 4)
+    np.testing.assert_allclose(first[:, :, 0, 0], [expected, expected], rtol=1e-6)
+    assert pre.batch([img]).base is first.base
+
+
+def test_matches_hf_image_processor():
+    """Same pixel_values as the Hugging Face processor; draft decode stays close."""
+    from PIL import Image
+
+    transformers = pytest.importorskip("transformers")
+    ViTImageProcessor = transformers.ViTImageProcessor
+
+    processor = ViTImageProcessor(size={"height": 224, "width": 224}, resample=3)
+    data = _photo()
+    reference = processor(Image.open(io.BytesIO(data)).convert("RGB"))
+    reference = np.asarray(reference["pixel_values"])
+
+    exact = ImagePreprocessor.from_processor(processor, draft=False)
+    np.testing.assert_allclose(exact([data]), reference, atol=1e-4)
+
+    drafted = ImagePreprocessor.from_processor(processor)
+    assert np.abs(drafted([data]) - reference).mean() < 0.02
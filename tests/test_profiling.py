@@ -0,0 +1,63 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.profiling import ProfilerBusy, profile  # noqa: E402
+
+
+def busy_leaf_function(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profile_collects_collapsed_stacks_and_allocations():
+    """Stacks of a busy thread show up in collapsed format, thread name first."""
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_leaf_function, args=(stop,), name="busy")
+    worker.start()
+    keep = []
+
+    async def scenario():
+        async def allocate():
+            while True:
+                keep.append(bytearray(64 * 1024))
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(allocate())
+        try:
+            return await profile(0.2, interval=0.002)
+        finally:
+            task.cancel()
+
+    try:
+        result = asyncio.run(scenario())
+    finally:
+        stop.set()
+        worker.join()
+
+    assert result["samples"] > 0
+    lines = result["collapsed"].splitlines()
+    busy = [line for line in lines if line.startswith("busy;")]
+    assert busy and all("busy_leaf_function" in line for line in busy)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(a["file"] == __file__ for a in result["allocations"])
+
+
+def test_profiles_do_not_overlap():
+    async def scenario():
+        first = asyncio.create_task(profile(0.1))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ProfilerBusy):
+            await profile(0.1)
+        await first
+
+    start = time.perf_counter()
+    asyncio.run(scenario())
+    assert time.perf_counter() - start < 5
@@ -36,3 +36,13 @@ def test_meta_prompt_structure():
     assert "Dr. Flora" in prompt
     assert "RULES:" in prompt
     assert question in prompt
+
+
+def test_rendered_prompts_start_with_their_static_prefix():
+    """Every registered template keeps its variable fields after the prefix."""
+    from backend.prompts import PROMPTS
+
+    for template in PROMPTS.values():
+        prompt = template.render(question="Q?", context="Some_Class")
+        assert prompt.startswith(template.prefix)
+        assert "{" not in template.prefix
@@ -0,0 +1,46 @@
+import json
+import os
+import sys
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.quantization import (  # noqa: E402
+    QUANTIZED_FILE,
+    REPORT_FILE,
+    quantized_model_ok,
+    stratified_sample,
+)
+
+
+def test_stratified_sample_takes_each_class_and_excludes(tmp_path):
+    """Every class contributes up to per_class images; excluded paths are skipped."""
+    for label, count in (("healthy", 5), ("rust", 2)):
+        (tmp_path / label).mkdir()
+        for i in range(count):
+            (tmp_path / label / f"{i}.jpg").write_bytes(b"")
+    (tmp_path / "rust" / "notes.txt").write_text("not an image")
+
+    calibration = stratified_sample(str(tmp_path), per_class=3)
+    labels = [label for _, label in calibration]
+    assert labels.count("healthy") == 3 and labels.count("rust") == 2
+
+    held_out = stratified_sample(
+        str(tmp_path), per_class=3, exclude=[p for p, _ in calibration]
+    )
+    assert [label for _, label in held_out] == ["healthy", "healthy"]
+
+
+def test_quantized_model_gate(tmp_path):
+    """The INT8 model is used only when its report is within tolerance."""
+    assert not quantized_model_ok(str(tmp_path), 0.01)
+
+    (tmp_path / QUANTIZED_FILE).write_bytes(b"")
+    report = {"model_file": QUANTIZED_FILE, "accuracy_drop": 0.005, "speedup": 1.8}
+    (tmp_path / REPORT_FILE).write_text(json.dumps(report))
+    assert quantized_model_ok(str(tmp_path), 0.01)
+    assert not quantized_model_ok(str(tmp_path), 0.001)
+
+    report["speedup"] = 0.9
+    (tmp_path / REPORT_FILE).write_text(json.dumps(report))
+    assert not quantized_model_ok(str(tmp_path), 0.01)
@@ -0,0 +1,54 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.readiness import NotReady, Readiness  # noqa: E402
+
+
+def test_components_load_and_report_timings():
+    """Loaded components become ready and record load/warm-up time."""
+    readiness = Readiness()
+    readiness.register("cv")
+    warmed = []
+
+    with pytest.raises(NotReady):
+        readiness.require("cv")
+    asyncio.run(readiness.load("cv", lambda: None, lambda: warmed.append(True)))
+
+    readiness.require("cv")
+    snapshot = readiness.snapshot()["cv"]
+    assert snapshot["status"] == "ready" and warmed
+    assert snapshot["load_s"] is not None and snapshot["warmup_s"] is not None
+
+
+def test_partial_readiness_and_failed_dependencies():
+    """A failure only blocks the components (and endpoints) that need it."""
+    readiness = Readiness()
+    readiness.register("cv")
+    readiness.register("llm")
+    readiness.register("table", requires=("cv", "llm"))
+
+    def broken():
+        raise RuntimeError("GGUF missing")
+
+    async def load_all():
+        await asyncio.gather(
+            readiness.load("table", lambda: None),
+            readiness.load("cv", lambda: None),
+            readiness.load("llm", broken),
+        )
+
+    asyncio.run(load_all())
+
+    readiness.require("cv")
+    assert not readiness.ready
+    status = {name: c["status"] for name, c in readiness.snapshot().items()}
+    assert status == {"cv": "ready", "llm": "failed", "table": "failed"}
+    with pytest.raises(NotReady) as excinfo:
+        readiness.require("cv", "llm")
+    assert excinfo.value.status_code == 503
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import remote_llm  # noqa: E402
+from backend.remote_llm import (  # noqa: E402
+    LLMClient,
+    decode,
+    encode,
+    sweep_segments,
+)
+from backend.scheduler import Overloaded  # noqa: E402
+
+
+class FakeState:
+    """Shaped like llama_cpp.LlamaState: arrays plus the raw state bytes."""
+
+    def __init__(self, size):
+        self.input_ids = np.arange(size // 8, dtype=np.int64)
+        self.llama_state = b"k" * size
+        self.n_tokens = 3
+
+
+def test_large_buffers_travel_through_shared_memory(tmp_path):
+    """Big bytes and arrays leave the frame; the segment is gone once read."""
+    message = {"state": FakeState(100_000), "small": b"tiny"}
+    frame = encode(message, shm_dir=str(tmp_path), min_bytes=1024)
+    assert len(frame) < 2000 and len(os.listdir(tmp_path)) == 1
+
+    decoded = decode(frame[remote_llm.HEADER.size :])
+    state = decoded["state"]
+    assert isinstance(state, FakeState) and decoded["small"] == b"tiny"
+    assert state.llama_state == b"k" * 100_000 and state.n_tokens == 3
+    np.testing.assert_array_equal(state.input_ids, message["state"].input_ids)
+    assert os.listdir(tmp_path) == []
+
+    inline = encode(message, shm_dir=None)
+    assert len(inline) > 200_000 and os.listdir(tmp_path) == []
+
+
+def test_client_streams_from_a_worker_and_skips_dead_ones(tmp_path):
+    """Tokens stream back, returned state reaches on_state, errors map to 429."""
+    alive = str(tmp_path / "a.sock")
+    (tmp_path / "0-stale.sock").touch()  # sorts first, refuses connections
+
+    async def worker(reader, writer):
+        request = await remote_llm.recv(reader)
+        if request["prompt"] == "busy":
+            await remote_llm.send(writer, {"error": "full", "status": 429})
+        else:
+            for word in request["prompt"].split():
+                await remote_llm.send(writer, {"token": f" {word}"})
+            request["state"].n_tokens += 1
+            await remote_llm.send(
+                writer, {"done": True, "state": request["state"]}, str(tmp_path)
+            )
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_unix_server(worker, path=alive)
+        client = LLMClient(str(tmp_path), shm_dir=str(tmp_path), min_bytes=1024)
+        states = []
+        async with server:
+            generation = client.generate(
+                "spray copper", state=FakeState(5000), on_state=states.append
+            )
+            tokens = [t async for t in generation.tokens()]
+            with pytest.raises(Overloaded):
+                await client.generate("busy").text()
+        return tokens, states
+
+    tokens, states = asyncio.run(main())
+    assert tokens == [" spray", " copper"]
+    assert [s.n_tokens for s in states] == [4]
+    assert not [f for f in os.listdir(tmp_path) if f.startswith("flora-ipc")]
+
+
+def test_unread_segments_are_removed(tmp_path):
+    """A worker that dies before reading leaves nothing; old leftovers are swept."""
+    dead = str(tmp_path / "dead.sock")
+
+    async def worker(reader, writer):
+        writer.close()  # dies without reading the request
+
+    async def main():
+        server = await asyncio.start_unix_server(worker, path=dead)
+        client = LLMClient(dead, shm_dir=str(tmp_path), min_bytes=1024)
+        async with server:
+            with pytest.raises(Exception):
+                await client.generate("q", state=FakeState(50_000)).text()
+
+    asyncio.run(main())
+    assert not [f for f in os.listdir(tmp_path) if f.startswith("flora-ipc")]
+
+    old, fresh = tmp_path / "flora-ipc-1-old", tmp_path / "flora-ipc-1-new"
+    old.write_bytes(b"x")
+    fresh.write_bytes(b"x")
+    os.utime(old, (0, 0))
+    assert sweep_segments(str(tmp_path)) == 1
+    assert not old.exists() and fresh.exists()
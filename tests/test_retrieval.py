@@ -0,0 +1,72 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.retrieval import RetrievalTable  # noqa: E402
+
+
+class FakeVectorStore:
+    """Returns one chunk per disease; nothing for unknown diseases when filtered."""
+
+    def __init__(self):
+        self.queries = []
+
+    def similarity_search(self, query, k=2, filter=None):
+        self.queries.append((query, filter))
+        if filter is not None and filter["disease"] == "Unknown":
+            return []
+        return [SimpleNamespace(page_content=f"chunk for {query}")]
+
+
+def _make_index(tmp_path):
+    rag_dir = tmp_path / "flora_rag_db"
+    rag_dir.mkdir()
+    (rag_dir / "chroma.sqlite3").write_bytes(b"v1")
+    return str(rag_dir)
+
+
+def test_table_answers_without_querying_the_store(tmp_path):
+    """After the build, lookups never touch the vector store."""
+    store = FakeVectorStore()
+    table = RetrievalTable(_make_index(tmp_path))
+    table.build(store, ["Apple___Apple_scab", "Unknown"])
+    n_build_queries = len(store.queries)
+
+    assert table.get("Apple___Apple_scab") == ["chunk for Apple___Apple_scab treatment"]
+    # Empty filtered search falls back to the unfiltered one, as /predict did
+    assert table.get("Unknown") == ["chunk for Unknown treatment"]
+    assert len(store.queries) == n_build_queries
+
+
+def test_table_is_invalidated_when_the_index_changes(tmp_path):
+    """Rewriting the index on disk makes the table stop answering."""
+    rag_dir = _make_index(tmp_path)
+    table = RetrievalTable(rag_dir, check_interval_s=0)
+    table.build(FakeVectorStore(), ["Apple___Apple_scab"])
+    assert table.get("Apple___Apple_scab") is not None
+
+    with open(os.path.join(rag_dir, "chroma.sqlite3"), "wb") as f:
+        f.write(b"rebuilt index")
+
+    assert table.get("Apple___Apple_scab") is None
+    assert table.refresh(FakeVectorStore())
+    assert table.get("Apple___Apple_scab") is not None
+
+
+def test_saved_table_only_loads_for_the_same_index(tmp_path):
+    """A table written by ingest.py is ignored once the index is rebuilt."""
+    rag_dir = _make_index(tmp_path)
+    built = RetrievalTable(rag_dir)
+    built.build(FakeVectorStore(), ["Apple___Apple_scab"])
+    built.save()
+
+    loaded = RetrievalTable(rag_dir)
+    assert loaded.load()
+    assert loaded.labels == ["Apple___Apple_scab"]
+
+    with open(os.path.join(rag_dir, "chroma.sqlite3"), "wb") as f:
+        f.write(b"rebuilt index")
+    assert not RetrievalTable(rag_dir).load()
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.scheduler import (
+    InferenceScheduler,
+    Lane,
+    Overloaded,
+    Priority,
+)  # noqa: E402
+
+
+def test_chat_jobs_jump_queued_predict_jobs():
+    """While the single LLM worker is busy, queued chat work runs first."""
+    gate = threading.Event()
+    order = []
+    scheduler = InferenceScheduler(Lane("llm", workers=1, max_wait_s=1e9))
+
+    def blocker():
+        gate.wait(5)
+
+    def job(name):
+        order.append(name)
+
+    async def main():
+        first = scheduler.submit("llm", blocker)
+        await asyncio.sleep(0.05)  # let the worker pick up the blocker
+        queued = [
+            scheduler.submit("llm", job, "predict-1", priority=Priority.PREDICT),
+            scheduler.submit("llm", job, "predict-2", priority=Priority.PREDICT),
+            scheduler.submit("llm", job, "chat", priority=Priority.CHAT),
+        ]
+        gate.set()
+        await asyncio.gather(first, *queued)
+
+    asyncio.run(main())
+    assert order == ["chat", "predict-1", "predict-2"]
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    """Once max_queue jobs are waiting, admission fails with a 429."""
+    gate = threading.Event()
+    lane = Lane("llm", workers=1, max_queue=1, max_wait_s=1e9)
+
+    async def main():
+        running = lane.submit(gate.wait, 5)
+        await asyncio.sleep(0.05)
+        waiting = lane.submit(gate.wait, 5)
+        with pytest.raises(Overloaded) as exc:
+            lane.submit(gate.wait, 5)
+        gate.set()
+        await asyncio.gather(running, waiting)
+        return exc.value
+
+    err = asyncio.run(main())
+    assert err.status_code == 429
+    assert int(err.headers["Retry-After"]) >= 1
+
+
+def test_long_estimated_wait_is_rejected_with_503():
+    """A slow lane sheds load once the estimated wait passes max_wait_s."""
+    gate = threading.Event()
+    lane = Lane("llm", workers=1, max_wait_s=10, initial_service_s=30)
+
+    async def main():
+        running = lane.submit(gate.wait, 5)
+        await asyncio.sleep(0.05)
+        with pytest.raises(Overloaded) as exc:
+            lane.submit(gate.wait, 5)
+        gate.set()
+        await running
+        return exc.value
+
+    err = asyncio.run(main())
+    assert err.status_code == 503
+    assert err.headers["Retry-After"] == "30"
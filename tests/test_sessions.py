@@ -0,0 +1,88 @@
+import os
+import sys
+
+import numpy as np
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.prompts import PROMPTS  # noqa: E402
+from backend.sessions import SessionStore  # noqa: E402
+
+
+class FakeState:
+    def __init__(self, size):
+        self.llama_state_size = size
+
+
+class FakeLlamaState:
+    """Shaped like llama_cpp.LlamaState: small KV bytes, big logits."""
+
+    def __init__(self, n_tokens, n_vocab=32000):
+        self.llama_state = b"k" * 1000
+        self.llama_state_size = len(self.llama_state)
+        self.input_ids = np.zeros(n_tokens, dtype=np.intc)
+        self.scores = np.zeros((n_tokens, n_vocab), dtype=np.single)
+        self.n_tokens = n_tokens
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_states_are_evicted_least_recently_used_first():
+    """Over the memory budget, the oldest states go; their transcripts stay."""
+    store = SessionStore(max_state_bytes=250)
+    a, b, c = (store.create("Apple___Apple_scab", "ctx") for _ in range(3))
+    store.save_state(a, FakeState(100))
+    store.save_state(b, FakeState(100))
+    store.get(a.id)  # a is now more recent than b
+    store.save_state(c, FakeState(100))
+
+    assert b.state is None and a.state is not None and c.state is not None
+    assert store.state_bytes == 200
+    assert store.get(b.id) is b
+
+    store.save_state(c, FakeState(400))  # larger than the whole budget
+    assert c.state is None and store.state_bytes == 100
+
+
+def test_sessions_expire_and_are_capped():
+    clock = FakeClock()
+    store = SessionStore(max_sessions=2, ttl=60, clock=clock)
+    first = store.create("d", "ctx")
+    store.save_state(first, FakeState(10))
+    store.create("d", "ctx")
+    store.create("d", "ctx")
+    assert store.get(first.id) is None and store.state_bytes == 0
+    assert len(store) == 2
+
+    clock.now += 61
+    assert all(store.get(s) is None for s in list(store._sessions))
+
+
+def test_each_turn_extends_the_previous_prompt():
+    """Prompt reuse depends on turn N's prompt + answer prefixing turn N+1's."""
+    template = PROMPTS["flora_few_shot"]
+    first = template.render_conversation("ctx", [], "What is it?")
+    assert first == template.render(context="ctx", question="What is it?")
+
+    second = template.render_conversation("ctx", [("What is it?", "Scab.")], "Why?")
+    assert second.startswith(first + "Scab.")
+    assert second.endswith("Question: Why?\n<|assistant|>\n")
+
+
+def test_scores_and_input_ids_count_towards_the_budget():
+    """The logits array dominates a LlamaState; it must trigger eviction."""
+    state = FakeLlamaState(64)
+    store = SessionStore(max_state_bytes=int(1.5 * (64 * 32000 * 4)))
+    a, b = store.create("Apple___Apple_scab", "ctx"), store.create("x", "ctx")
+    store.save_state(a, state)
+    assert store.state_bytes == 1000 + state.input_ids.nbytes + state.scores.nbytes
+
+    store.save_state(b, FakeLlamaState(64))
+    assert a.state is None and b.state is not None
@@ -0,0 +1,41 @@
+import asyncio
+import os
+import sys
+import threading
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.streaming import TokenStream  # noqa: E402
+
+
+def test_closing_the_stream_cancels_generation():
+    """A client that stops reading frees the LLM worker at the next token."""
+    produced = []
+    finished = threading.Event()
+
+    def endless_llm(prompt, **kwargs):
+        try:
+            while True:
+                produced.append(1)
+                yield {"choices": [{"text": "tok "}]}
+        finally:
+            finished.set()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        stream = TokenStream(endless_llm, "prompt").start(
+            lambda fn: loop.run_in_executor(None, fn)
+        )
+        received = []
+        tokens = stream.tokens()
+        async for text in tokens:
+            received.append(text)
+            if len(received) == 3:
+                break
+        await tokens.aclose()
+        await loop.run_in_executor(None, finished.wait, 5)
+        return received
+
+    assert asyncio.run(main()) == ["tok "] * 3
+    assert finished.is_set()
@@ -0,0 +1,45 @@
+import os
+import sys
+
+from prometheus_client import REGISTRY
+
+# Add project root to sys.path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.telemetry import record_generation, rss_bytes, timed  # noqa: E402
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_timed_stage_observes_histogram():
+    """Each call of a @timed function lands in its stage's histogram."""
+
+    @timed("test_stage")
+    def work(x):
+        return x * 2
+
+    before = _sample("flora_inference_stage_seconds_count", stage="test_stage")
+    assert work(21) == 42
+    after = _sample("flora_inference_stage_seconds_count", stage="test_stage")
+    assert after == before + 1
+
+
+def test_record_generation_splits_prefill_and_decode():
+    """llama.cpp perf counters become prefill/decode stages and throughput."""
+    before = _sample("flora_inference_stage_seconds_count", stage="llm_prefill")
+    record_generation("test", perf=(0.5, 100, 2.0, 50))
+
+    assert _sample("flora_inference_stage_seconds_count", stage="llm_prefill") == (
+        before + 1
+    )
+    assert _sample("flora_llm_tokens_per_second", phase="prefill") == 200
+    assert _sample("flora_llm_tokens_per_second", phase="decode") == 25
+    assert _sample("flora_llm_prompt_tokens", endpoint="test") == 100
+    assert _sample("flora_llm_completion_tokens", endpoint="test") == 50
+
+    # Without perf counters, fall back to the completion usage
+    record_generation("test", usage={"prompt_tokens": 7, "completion_tokens": 3})
+    assert _sample("flora_llm_prompt_tokens", endpoint="test") == 7
+    assert rss_bytes() >= 0